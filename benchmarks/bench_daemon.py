@@ -0,0 +1,122 @@
+"""
+Per-call latency of a tag search run cold, as the headless command does, and through the daemon.
+
+A cold call opens the index, syncs it through the changes feed and answers
+the search, as `python -m drivelabels search` does on every run (credential
+loading and service discovery come on top of that and are not measured).
+A daemon call is a round trip to a DaemonService running in another process,
+over a Unix socket. Both run against the in-memory fake drive with a fixed
+request latency.
+
+Usage:
+    python benchmarks/bench_daemon.py [--files 10000] [--calls 20] [--latency 0.1]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_drive import FakeDrive
+from drivelabels.client import DaemonClient
+from drivelabels.core.drive_manager import DriveManager
+from drivelabels.core.response_cache import ResponseCache
+from drivelabels.core.tag_index import TagIndex
+from drivelabels.daemon import DaemonService, create_server
+from drivelabels.utils.rate_limit import RateLimiter
+
+QUERIES = ['contract', 'contract AND invoice AND archived']
+
+def unlimited() -> RateLimiter:
+    """A limiter that never waits, so the fake itself is measured."""
+    return RateLimiter(rate=1e9, burst=1e9, base_delay=0.01, max_delay=0.1)
+
+def timed(operation: Callable, repeat: int) -> List[float]:
+    """Run operation repeat times and return each duration in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+def fake_manager(drive: FakeDrive, tag_index: TagIndex, **kwargs) -> DriveManager:
+    """A manager on the fake drive's root folder without rate limiting."""
+    return DriveManager(drive, None, tag_index, rate_limiter=unlimited(), folder_ids=[FakeDrive.ROOT_ID], **kwargs)
+
+def run_daemon(files: int, latency: float, index_path: str, address: str):
+    """Daemon process: serve the same fake drive and index until terminated."""
+    drive = FakeDrive(latency=latency)
+    drive.populate(files)
+    tag_index = TagIndex(index_path)
+    cache = ResponseCache()
+    service = DaemonService(
+        lambda sync_interval=60.0: fake_manager(drive, tag_index, response_cache=cache, sync_interval=sync_interval),
+        tag_index
+    )
+    service.sync()
+    create_server(address, service).serve_forever()
+
+def connect(address: str, timeout: float = 30.0) -> DaemonClient:
+    """Wait for the daemon to listen and connect to it."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return DaemonClient(address)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.1, help="Seconds per request or batch")
+    args = parser.parse_args()
+
+    drive = FakeDrive(latency=args.latency)
+    drive.populate(args.files)
+    directory = tempfile.mkdtemp()
+    index_path = os.path.join(directory, 'index.sqlite3')
+    address = os.path.join(directory, 'daemon.sock')
+
+    # Fill the index once, as an earlier run of the command would have
+    index = TagIndex(index_path)
+    fake_manager(drive, index).sync()
+    index.close()
+
+    daemon = multiprocessing.Process(
+        target=run_daemon, args=(args.files, args.latency, index_path, address), daemon=True
+    )
+    daemon.start()
+    try:
+        with connect(address) as client:
+            for expr in QUERIES:
+                def cold_search():
+                    tag_index = TagIndex(index_path)
+                    try:
+                        return fake_manager(drive, tag_index).search_by_tag(expr) if ' ' not in expr \
+                            else list(fake_manager(drive, tag_index).query(expr))
+                    finally:
+                        tag_index.close()
+
+                matches = len(client.call('search', expr=expr))
+                cold = timed(cold_search, args.calls)
+                warm = timed(lambda: client.call('search', expr=expr), args.calls)
+                for name, durations in (('cold command', cold), ('daemon', warm)):
+                    print(
+                        f"{name:<13} {expr!r:<38} {matches:>6} matches  "
+                        f"p50 {statistics.median(durations):9.2f} ms  max {max(durations):9.2f} ms"
+                    )
+    finally:
+        daemon.terminate()
+        daemon.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Throughput and latency of DriveManager operations against the in-memory fake.
+
+Measures listing, tag search (folder scan, local index, boolean query) and
+single and bulk add_tag / remove_tag at several folder sizes, without
+network access. Use --latency to simulate round-trip time and --error-rate
+to inject 403/429 responses, and --backend labels to store the tags as
+native Drive labels instead of file properties.
+
+Usage:
+    python benchmarks/bench_drive.py [--sizes 1000 10000 100000] [--latency 0.0]
+                                     [--error-rate 0.0] [--samples 200]
+                                     [--backend properties|labels] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_drive import FakeDrive, FakeLabels
+from drivelabels.core.drive_manager import DriveManager
+from drivelabels.core.label_catalog import LabelCatalog
+from drivelabels.core.tag_backends import BACKEND_LABELS, BACKENDS, LabelsBackend, PropertiesBackend
+from drivelabels.core.tag_index import TagIndex
+from drivelabels.utils.rate_limit import RateLimiter
+
+TAGS = ['contract', 'invoice', 'archived', '2025', 'draft', 'signed']
+
+def unlimited() -> RateLimiter:
+    """A limiter that never waits, so the fake itself is measured."""
+    return RateLimiter(rate=1e9, burst=1e9, base_delay=0.01, max_delay=0.1)
+
+def timed(operation: Callable, repeat: int = 1) -> List[float]:
+    """Run operation repeat times and return each duration in seconds."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+def result(size: int, name: str, items: int, durations: List[float]) -> Dict:
+    """Summarize durations of an operation that handled items per run."""
+    total = sum(durations)
+    return {
+        'files': size,
+        'operation': name,
+        'items': items * len(durations),
+        'seconds': total,
+        'per_second': items * len(durations) / total if total > 0 else float('inf'),
+        'p50_ms': statistics.median(durations) * 1000,
+        'p95_ms': sorted(durations)[max(0, int(len(durations) * 0.95) - 1)] * 1000
+    }
+
+def run_size(size: int, latency: float, error_rate: float, samples: int, backend: str) -> List[Dict]:
+    """Run every benchmark against a fake folder of the given size."""
+    results = []
+    drive = FakeDrive(latency=latency, error_rate=error_rate)
+    file_ids = drive.populate(size, TAGS)
+    folder = [FakeDrive.ROOT_ID]
+    if backend == BACKEND_LABELS:
+        labels = FakeLabels(drive)
+        labels.adopt_property_tags()
+        tag_backend = LabelsBackend(LabelCatalog(labels, rate_limiter=unlimited()))
+    else:
+        labels, tag_backend = None, PropertiesBackend()
+
+    def manager(tag_index=None) -> DriveManager:
+        return DriveManager(
+            drive, labels, tag_index, rate_limiter=unlimited(), service_factory=lambda: drive,
+            folder_ids=folder, tag_backend=tag_backend
+        )
+
+    scanner = manager()
+    listed = []
+    results.append(result(size, 'list_files (scan)', size, timed(lambda: listed.append(scanner.list_files()))))
+    assert len(listed[0]) == size, f"listed {len(listed[0])} of {size} files"
+    results.append(result(size, 'search_by_tag (scan)', size, timed(lambda: scanner.search_by_tag('contract'))))
+
+    indexed = manager(TagIndex(':memory:'))
+    results.append(result(size, 'list_files (index, full sync)', size, timed(indexed.list_files)))
+    results.append(result(size, 'list_files (index, warm)', size, timed(indexed.list_files, 3)))
+    results.append(result(size, 'search_by_tag (index)', 1, timed(lambda: indexed.search_by_tag('contract'), 5)))
+    results.append(result(
+        size, 'query (bitmap)', 1,
+        timed(lambda: list(indexed.query('(contract OR invoice) AND NOT archived')), 5)
+    ))
+    indexed.close()
+
+    sample = file_ids[:min(samples, size)]
+    writer = manager()
+    add = timed_each(lambda file_id: writer.add_tag(file_id, 'benchmark'), sample)
+    results.append(result(size, 'add_tag', 1, add))
+    remove = timed_each(lambda file_id: writer.remove_tag(file_id, 'benchmark'), sample)
+    results.append(result(size, 'remove_tag', 1, remove))
+
+    bulk = file_ids[:min(size, 10000)]
+    results.append(result(size, 'add_tag_bulk', len(bulk), timed(lambda: writer.add_tag_bulk(bulk, ['bulk']))))
+    results.append(result(size, 'remove_tag_bulk', len(bulk), timed(lambda: writer.remove_tag_bulk(bulk, ['bulk']))))
+    return results
+
+def timed_each(operation: Callable[[str], object], file_ids: List[str]) -> List[float]:
+    """Time operation once per file ID."""
+    durations = []
+    for file_id in file_ids:
+        started = time.perf_counter()
+        operation(file_id)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds per request or batch")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests failing with 403/429")
+    parser.add_argument('--samples', type=int, default=200, help="Files timed for single add/remove")
+    parser.add_argument('--backend', choices=BACKENDS, default=BACKENDS[0], help="Tag storage backend")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for row in run_size(size, args.latency, args.error_rate, args.samples, args.backend):
+            if args.json:
+                print(json.dumps(row))
+            else:
+                print(
+                    f"{row['files']:>7}  {row['operation']:<30} {row['items']:>8} items "
+                    f"{row['seconds']:8.3f}s {row['per_second']:12.1f}/s "
+                    f"p50 {row['p50_ms']:8.3f} ms  p95 {row['p95_ms']:8.3f} ms"
+                )
+        sys.stdout.flush()
+
+if __name__ == '__main__':
+    main()
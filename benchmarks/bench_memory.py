@@ -0,0 +1,67 @@
+"""
+Memory per file of raw API dictionaries versus FileRecord objects.
+
+Usage:
+    python benchmarks/bench_memory.py [--files 200000] [--distinct-tags 500]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drivelabels.core.models import to_records
+
+MIME_TYPES = [
+    'application/pdf',
+    'application/vnd.google-apps.document',
+    'application/vnd.google-apps.spreadsheet',
+    'image/png'
+]
+
+def make_api_files(count: int, distinct_tags: int, seed: int = 0):
+    """Build API-shaped file dictionaries the way files().list returns them."""
+    rng = random.Random(seed)
+    vocabulary = [f'tag{index}' for index in range(distinct_tags)]
+    files = []
+    for index in range(count):
+        tags = rng.sample(vocabulary, rng.randint(0, 4))
+        files.append({
+            'id': f'{index:033d}',
+            'name': f'Document {index}.pdf',
+            # Decoded JSON never shares strings between responses
+            'mimeType': ''.join(rng.choice(MIME_TYPES)),
+            'properties': {'tags': ','.join(tags)}
+        })
+    return files
+
+def measure(build) -> int:
+    """Bytes still allocated by the object build() returns."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=200000)
+    parser.add_argument('--distinct-tags', type=int, default=500)
+    args = parser.parse_args()
+
+    dict_bytes = measure(lambda: make_api_files(args.files, args.distinct_tags))
+    # Only the records (and the strings they keep) survive the conversion
+    record_bytes = measure(lambda: to_records(make_api_files(args.files, args.distinct_tags)))
+
+    print(f"files:           {args.files}")
+    print(f"API dicts:       {dict_bytes / args.files:8.1f} bytes/file")
+    print(f"FileRecords:     {record_bytes / args.files:8.1f} bytes/file")
+    print(f"reduction:       {dict_bytes / record_bytes:8.1f}x")
+
+if __name__ == '__main__':
+    main()
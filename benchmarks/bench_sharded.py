@@ -0,0 +1,77 @@
+"""
+Throughput of sharded bulk tagging as credentials are added to the pool.
+
+Every worker process gets its own in-memory fake drive holding the same
+files, with a fixed request latency, and its own rate limiter sized to the
+per-credential quota. As long as the quota is the bottleneck, throughput
+should grow with the number of credentials.
+
+Usage:
+    python benchmarks/bench_sharded.py [--files 1000] [--credentials 1 2 4]
+                                       [--quota 6000] [--latency 0.05] [--json]
+"""
+import argparse
+import functools
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_drive import FakeDrive
+from drivelabels.jobs import Progress
+from drivelabels.sharding import ShardedJobRunner
+
+def fake_connect(files: int, latency: float, credential: str, subject: Optional[str] = None):
+    """Worker-side connect: a fake drive with the same deterministic files in every process."""
+    drive = FakeDrive(latency=latency)
+    drive.populate(files)
+    return (lambda: drive), None
+
+def run(files: int, credentials: int, quota: float, latency: float) -> Dict:
+    """Tag every file once with the given number of credentials."""
+    file_ids = [f'{index:033d}' for index in range(files)]
+    progress = Progress('bench', interval=0, stream=io.StringIO())
+    runner = ShardedJobRunner(
+        [f'credential-{index}' for index in range(credentials)],
+        'add',
+        quota_per_minute=quota,
+        connect=functools.partial(fake_connect, files, latency)
+    )
+    started = time.perf_counter()
+    runner.run(((file_id, ['bench']) for file_id in file_ids), lambda item: None, progress)
+    seconds = time.perf_counter() - started
+    return {
+        'credentials': credentials,
+        'files': progress.done,
+        'updated': progress.counts.get('updated', 0),
+        'seconds': seconds,
+        'per_second': progress.done / seconds,
+        'calls': sum(stats['calls'] for stats in runner.summary())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--credentials', type=int, nargs='+', default=[1, 2, 4], help="Pool sizes to measure")
+    parser.add_argument('--quota', type=float, default=6000, help="Requests per minute of each credential")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds per request or batch")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    for credentials in args.credentials:
+        row = run(args.files, credentials, args.quota, args.latency)
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(
+                f"{row['credentials']:>3} credentials  {row['files']:>7} files ({row['updated']} updated) "
+                f"{row['seconds']:8.2f}s {row['per_second']:10.1f} files/s {row['calls']:>8} calls"
+            )
+        sys.stdout.flush()
+
+if __name__ == '__main__':
+    main()
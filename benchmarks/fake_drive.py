@@ -0,0 +1,707 @@
+"""
+In-memory stand-in for the Drive v3 service object.
+
+FakeDrive implements the subset of the client library that drivelabels
+uses: files().list/get/update/modifyLabels (with the query syntax the
+application generates, pagination tokens, field masks, includeLabels and
+parent moves), changes().getStartPageToken and changes().list (whose tokens
+can be expired), and new_batch_http_request().
+FakeLabels stands in for the Drive Labels service. Requests can be given a
+fixed latency and fail with injected 403/429 errors, so the managers can be
+exercised and benchmarked without network access.
+
+Example:
+    drive = FakeDrive(latency=0.02, error_rate=0.01)
+    drive.populate(10000, tags=['contract', 'invoice', 'archived'])
+    manager = DriveManager(drive, None, folder_ids=[FakeDrive.ROOT_ID])
+
+    labels = FakeLabels(drive)
+    backend = LabelsBackend(LabelCatalog(labels))
+    manager = DriveManager(drive, labels, folder_ids=[FakeDrive.ROOT_ID], tag_backend=backend)
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 100
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+# Internal key of the label values applied to a stored file
+LABELS_KEY = '_labels'
+
+QUERY_TOKEN = re.compile(r"\s*('(?:[^'\\]|\\.)*'|!=|[=(){}]|labels/[\w.]+|[A-Za-z_]+)")
+
+def http_error(status: int, reason: str, message: str = '') -> HttpError:
+    """
+    Build an HttpError shaped like a real Drive error response.
+
+    Args:
+        status (int): HTTP status code
+        reason (str): Drive error reason, e.g. 'rateLimitExceeded'
+        message (str): Human-readable message
+
+    Returns:
+        HttpError: The error.
+    """
+    content = json.dumps({'error': {
+        'code': status,
+        'message': message or reason,
+        'errors': [{'reason': reason, 'message': message or reason}]
+    }}).encode()
+    return HttpError(httplib2.Response({'status': status}), content)
+
+class FakeRequest:
+    """Deferred call with the execute() interface of googleapiclient.http.HttpRequest."""
+
+    def __init__(self, drive: 'FakeDrive', method: str, call: Callable[[], Dict]):
+        self.drive = drive
+        self.method = method
+        self._call = call
+
+    def execute(self, num_retries: int = 0, http=None) -> Dict:
+        """
+        Run the request after the configured latency.
+
+        Raises:
+            HttpError: For missing files or an injected error.
+        """
+        self.drive._wait(self.drive.latency)
+        return self.drive._run(self.method, self._call)
+
+class FakeBatch:
+    """Batch with the add()/execute() interface of BatchHttpRequest."""
+
+    def __init__(self, drive: 'FakeDrive', callback: Optional[Callable] = None):
+        self.drive = drive
+        self.callback = callback
+        self._requests: List[Tuple[str, FakeRequest, Optional[Callable]]] = []
+        self._ids = itertools.count(1)
+
+    def add(self, request: FakeRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None):
+        """Queue a sub-request."""
+        if len(self._requests) >= MAX_BATCH_SIZE:
+            raise ValueError(f"A batch holds at most {MAX_BATCH_SIZE} requests")
+        self._requests.append((request_id or str(next(self._ids)), request, callback))
+
+    def execute(self, http=None):
+        """Run every sub-request in one round trip and call the callbacks."""
+        self.drive._wait(self.drive.latency)
+        self.drive._count('batch')
+        for request_id, request, callback in self._requests:
+            try:
+                response, exception = self.drive._run(request.method, request._call), None
+            except HttpError as error:
+                response, exception = None, error
+            for handler in (callback, self.callback):
+                if handler is not None:
+                    handler(request_id, response, exception)
+
+class _Files:
+    def __init__(self, drive: 'FakeDrive'):
+        self.drive = drive
+
+    def list(self, q: Optional[str] = None, pageSize: int = 100, pageToken: Optional[str] = None,
+             fields: Optional[str] = None, includeLabels: Optional[str] = None, **kwargs) -> FakeRequest:
+        return FakeRequest(
+            self.drive, 'files.list', lambda: self.drive._list(q, pageSize, pageToken, fields, includeLabels)
+        )
+
+    def get(self, fileId: str, fields: Optional[str] = None, includeLabels: Optional[str] = None,
+            **kwargs) -> FakeRequest:
+        return FakeRequest(self.drive, 'files.get', lambda: self.drive._get(fileId, fields, includeLabels))
+
+    def update(self, fileId: str, body: Optional[Dict] = None, fields: Optional[str] = None,
+               addParents: Optional[str] = None, removeParents: Optional[str] = None, **kwargs) -> FakeRequest:
+        return FakeRequest(
+            self.drive, 'files.update',
+            lambda: self.drive._update(fileId, body or {}, fields, addParents, removeParents)
+        )
+
+    def modifyLabels(self, fileId: str, body: Optional[Dict] = None, **kwargs) -> FakeRequest:
+        return FakeRequest(self.drive, 'files.modifyLabels', lambda: self.drive._modify_labels(fileId, body or {}))
+
+class _Changes:
+    def __init__(self, drive: 'FakeDrive'):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs) -> FakeRequest:
+        return FakeRequest(
+            self.drive, 'changes.getStartPageToken',
+            lambda: {'startPageToken': str(len(self.drive.change_log))}
+        )
+
+    def list(self, pageToken: str, pageSize: int = 100, fields: Optional[str] = None,
+             includeLabels: Optional[str] = None, **kwargs) -> FakeRequest:
+        return FakeRequest(
+            self.drive, 'changes.list', lambda: self.drive._changes(pageToken, pageSize, includeLabels)
+        )
+
+class FakeDrive:
+    """Thread-safe in-memory Drive service."""
+
+    ROOT_ID = 'root'
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Iterable[int] = (403, 429),
+        seed: int = 0
+    ):
+        """
+        Initialize an empty drive holding only the root folder.
+
+        Args:
+            latency (float): Seconds every request (or whole batch) takes
+            error_rate (float): Probability that a request fails with an injected error
+            error_statuses (Iterable[int]): Statuses to inject, 403 and/or 429
+            seed (int): Seed for error injection and populate()
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.files_by_id: Dict[str, Dict] = {}
+        self.change_log: List[Dict] = []
+        self.calls: Counter = Counter()
+        self._random = random.Random(seed)
+        self._forced_errors: List[int] = []
+        self._cursors: Dict[str, Tuple[List[str], int]] = {}
+        # Changes page tokens below this position are rejected as expired
+        self._oldest_change = 0
+        self._lock = threading.RLock()
+
+    def files(self) -> _Files:
+        return _Files(self)
+
+    def changes(self) -> _Changes:
+        return _Changes(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+    def add_file(
+        self,
+        name: str,
+        tags: Iterable[str] = (),
+        parents: Iterable[str] = (ROOT_ID,),
+        mime_type: str = 'application/pdf',
+        file_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Create a file, storing its tags in the joined 'tags' property.
+
+        Returns:
+            Dict: The stored file.
+        """
+        file = {
+            'id': file_id or uuid.uuid4().hex,
+            'name': name,
+            'mimeType': mime_type,
+            'parents': list(parents),
+            'trashed': False,
+            'properties': {'tags': ','.join(tags)} if tags else {}
+        }
+        with self._lock:
+            self.files_by_id[file['id']] = file
+            self._log_change(file['id'])
+        return dict(file)
+
+    def populate(self, count: int, tags: Iterable[str] = ('contract', 'invoice', 'archived', '2025'),
+                 max_tags: int = 3, parent: str = ROOT_ID) -> List[str]:
+        """
+        Add count files under a folder, each with up to max_tags random tags.
+
+        Returns:
+            List[str]: IDs of the new files.
+        """
+        vocabulary = list(tags)
+        ids = []
+        with self._lock:
+            for index in range(count):
+                file_id = f'{len(self.files_by_id):033d}'
+                chosen = self._random.sample(vocabulary, self._random.randint(0, min(max_tags, len(vocabulary))))
+                self.files_by_id[file_id] = {
+                    'id': file_id,
+                    'name': f'File {index}.pdf',
+                    'mimeType': 'application/pdf',
+                    'parents': [parent],
+                    'trashed': False,
+                    'properties': {'tags': ','.join(chosen)} if chosen else {}
+                }
+                ids.append(file_id)
+        return ids
+
+    def delete_file(self, file_id: str):
+        """Remove a file and record the removal in the changes feed."""
+        with self._lock:
+            self.files_by_id.pop(file_id, None)
+            self.change_log.append({'fileId': file_id, 'removed': True})
+
+    def expire_changes(self):
+        """Invalidate every changes page token handed out so far, as Drive does with old tokens."""
+        with self._lock:
+            self._oldest_change = len(self.change_log)
+
+    def fail_next(self, count: int = 1, status: int = 429):
+        """Make the next count requests fail with the given status."""
+        with self._lock:
+            self._forced_errors.extend([status] * count)
+
+    def _wait(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _count(self, method: str):
+        with self._lock:
+            self.calls[method] += 1
+
+    def _run(self, method: str, call: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            self.calls[method] += 1
+            status = self._forced_errors.pop(0) if self._forced_errors else None
+            if status is None and self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice(self.error_statuses)
+        if status is not None:
+            raise http_error(status, 'rateLimitExceeded', 'Rate Limit Exceeded')
+        return call()
+
+    def _log_change(self, file_id: str):
+        self.change_log.append({'fileId': file_id, 'removed': False})
+
+    def _list(self, q: Optional[str], page_size: int, page_token: Optional[str], fields: Optional[str],
+              include_labels: Optional[str] = None) -> Dict:
+        page_size = max(1, min(page_size or 100, MAX_PAGE_SIZE))
+        with self._lock:
+            if page_token:
+                if page_token not in self._cursors:
+                    raise http_error(400, 'invalid', 'Invalid page token')
+                ids, offset = self._cursors.pop(page_token)
+            else:
+                predicate = parse_drive_query(q) if q else (lambda file: True)
+                ids, offset = [file_id for file_id, file in self.files_by_id.items() if predicate(file)], 0
+            page = [self.files_by_id[file_id] for file_id in ids[offset:offset + page_size] if file_id in self.files_by_id]
+            response = {'files': [select_fields(file, fields, 'files', include_labels) for file in page]}
+            if offset + page_size < len(ids):
+                token = uuid.uuid4().hex
+                self._cursors[token] = (ids, offset + page_size)
+                response['nextPageToken'] = token
+        return response
+
+    def _get(self, file_id: str, fields: Optional[str], include_labels: Optional[str] = None) -> Dict:
+        with self._lock:
+            file = self.files_by_id.get(file_id)
+            if file is None:
+                raise http_error(404, 'notFound', f'File not found: {file_id}.')
+            return select_fields(file, fields, include_labels=include_labels)
+
+    def _modify_labels(self, file_id: str, body: Dict) -> Dict:
+        with self._lock:
+            file = self.files_by_id.get(file_id)
+            if file is None:
+                raise http_error(404, 'notFound', f'File not found: {file_id}.')
+            applied = file.setdefault(LABELS_KEY, {})
+            modified = []
+            for modification in body.get('labelModifications', []):
+                label_id = modification['labelId']
+                if modification.get('removeLabel'):
+                    applied.pop(label_id, None)
+                    continue
+                values = applied.setdefault(label_id, {})
+                for field in modification.get('fieldModifications', []):
+                    if field.get('unsetValues'):
+                        values.pop(field['fieldId'], None)
+                    elif 'setSelectionValues' in field:
+                        values[field['fieldId']] = list(field['setSelectionValues'])
+                modified.append(_label_info_entry(label_id, values))
+            self._log_change(file_id)
+            return {'kind': 'drive#modifyLabelsResponse', 'modifiedLabels': modified}
+
+    def _update(self, file_id: str, body: Dict, fields: Optional[str], add_parents: Optional[str] = None,
+                remove_parents: Optional[str] = None) -> Dict:
+        with self._lock:
+            file = self.files_by_id.get(file_id)
+            if file is None:
+                raise http_error(404, 'notFound', f'File not found: {file_id}.')
+            properties = dict(file.get('properties') or {})
+            for key, value in (body.get('properties') or {}).items():
+                if value is None:
+                    properties.pop(key, None)
+                else:
+                    properties[key] = value
+            file['properties'] = properties
+            for key in ('name', 'trashed'):
+                if key in body:
+                    file[key] = body[key]
+            removed = set((remove_parents or '').split(','))
+            parents = [parent for parent in file['parents'] if parent not in removed]
+            file['parents'] = parents + [
+                parent for parent in (add_parents or '').split(',') if parent and parent not in parents
+            ]
+            self._log_change(file_id)
+            return select_fields(file, fields)
+
+    def _changes(self, page_token: str, page_size: int, include_labels: Optional[str] = None) -> Dict:
+        start = int(page_token)
+        with self._lock:
+            if start < self._oldest_change:
+                raise http_error(404, 'notFound', f'Page token expired: {page_token}')
+            entries = self.change_log[start:start + page_size]
+            changes = []
+            for entry in entries:
+                file = self.files_by_id.get(entry['fileId'])
+                removed = entry['removed'] or file is None
+                changes.append({
+                    'fileId': entry['fileId'],
+                    'removed': removed,
+                    'file': None if removed else select_fields(file, None, include_labels=include_labels)
+                })
+            response = {'changes': changes}
+            if start + page_size < len(self.change_log):
+                response['nextPageToken'] = str(start + page_size)
+            else:
+                response['newStartPageToken'] = str(len(self.change_log))
+        return response
+
+class _Labels:
+    def __init__(self, service: 'FakeLabels'):
+        self.service = service
+
+    def list(self, view: str = 'LABEL_VIEW_BASIC', pageSize: int = 50, pageToken: Optional[str] = None,
+             publishedOnly: bool = False, **kwargs) -> FakeRequest:
+        return FakeRequest(
+            self.service.drive, 'labels.list',
+            lambda: self.service._list(view, pageSize, pageToken, publishedOnly)
+        )
+
+    def get(self, name: str, view: str = 'LABEL_VIEW_BASIC', **kwargs) -> FakeRequest:
+        return FakeRequest(self.service.drive, 'labels.get', lambda: self.service._get(name, view))
+
+    def create(self, body: Dict, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service.drive, 'labels.create', lambda: self.service._create(body))
+
+    def delta(self, name: str, body: Dict, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service.drive, 'labels.delta', lambda: self.service._delta(name, body))
+
+    def publish(self, name: str, body: Optional[Dict] = None, **kwargs) -> FakeRequest:
+        return FakeRequest(self.service.drive, 'labels.publish', lambda: self.service._publish(name))
+
+class FakeLabels:
+    """
+    In-memory stand-in for the Drive Labels v2 service.
+
+    Supports labels().list/get/create/delta/publish for selection fields.
+    Every change bumps the label's revisionId. Requests share the latency,
+    error injection and call counter of the FakeDrive they belong to.
+    """
+
+    def __init__(self, drive: FakeDrive):
+        self.drive = drive
+        self.labels_by_id: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+
+    def labels(self) -> _Labels:
+        return _Labels(self)
+
+    def add_label(self, title: str, field_name: str = 'Tags', choices: Iterable[str] = ()) -> Dict:
+        """
+        Create a published label with one multi-valued selection field.
+
+        Returns:
+            Dict: The stored label.
+        """
+        label = self._create({
+            'properties': {'title': title},
+            'fields': [{
+                'properties': {'displayName': field_name},
+                'selectionOptions': {
+                    'listOptions': {},
+                    'choices': [{'properties': {'displayName': choice}} for choice in choices]
+                }
+            }]
+        })
+        return self._publish(label['name'])
+
+    def adopt_property_tags(self, title: str = 'drivelabels', field_name: str = 'Tags') -> Dict:
+        """
+        Move the joined 'tags' property of every file into a new label.
+
+        Creates a published label whose selection field has one choice per
+        tag found, applies it to the tagged files and clears their properties,
+        e.g. to benchmark the labels backend on files from FakeDrive.populate().
+
+        Returns:
+            Dict: The stored label.
+        """
+        with self.drive._lock:
+            files = list(self.drive.files_by_id.values())
+            tags = dict.fromkeys(
+                tag for file in files
+                for tag in (file.get('properties') or {}).get('tags', '').split(',') if tag
+            )
+            label = self.add_label(title, field_name, tags)
+            field = label['fields'][0]
+            choice_ids = {
+                choice['properties']['displayName']: choice['id']
+                for choice in field['selectionOptions']['choices']
+            }
+            for file in files:
+                tags = [tag for tag in (file.get('properties') or {}).pop('tags', '').split(',') if tag]
+                if tags:
+                    file[LABELS_KEY] = {label['id']: {field['id']: [choice_ids[tag] for tag in tags]}}
+        return label
+
+    def _next_id(self, prefix: str) -> str:
+        return f'{prefix}{next(self._ids):06d}'
+
+    def _label(self, name: str) -> Dict:
+        label_id = name.split('/', 1)[-1].split('@', 1)[0]
+        label = self.labels_by_id.get(label_id)
+        if label is None:
+            raise http_error(404, 'notFound', f'Label not found: {name}.')
+        return label
+
+    def _view(self, label: Dict, view: str) -> Dict:
+        if view == 'LABEL_VIEW_FULL':
+            return json.loads(json.dumps(label))
+        return {key: label[key] for key in ('name', 'id', 'revisionId', 'labelType', 'properties')}
+
+    def _list(self, view: str, page_size: int, page_token: Optional[str], published_only: bool) -> Dict:
+        with self.drive._lock:
+            labels = [
+                label for label in self.labels_by_id.values()
+                if not published_only or label['lifecycle']['state'] == 'PUBLISHED'
+            ]
+            offset = int(page_token or 0)
+            response = {'labels': [self._view(label, view) for label in labels[offset:offset + page_size]]}
+            if offset + page_size < len(labels):
+                response['nextPageToken'] = str(offset + page_size)
+        return response
+
+    def _get(self, name: str, view: str) -> Dict:
+        with self.drive._lock:
+            return self._view(self._label(name), view)
+
+    def _create(self, body: Dict) -> Dict:
+        with self.drive._lock:
+            label_id = self._next_id('label')
+            label = {
+                'name': f'labels/{label_id}',
+                'id': label_id,
+                'revisionId': '1',
+                'labelType': body.get('labelType', 'SHARED'),
+                'properties': dict(body.get('properties') or {}),
+                'lifecycle': {'state': 'UNPUBLISHED_DRAFT'},
+                'fields': []
+            }
+            for field in body.get('fields', []):
+                field = json.loads(json.dumps(field))
+                field['id'] = self._next_id('field')
+                for choice in field.get('selectionOptions', {}).get('choices', []):
+                    choice['id'] = self._next_id('choice')
+                label['fields'].append(field)
+            self.labels_by_id[label_id] = label
+            return self._view(label, 'LABEL_VIEW_FULL')
+
+    def _delta(self, name: str, body: Dict) -> Dict:
+        with self.drive._lock:
+            label = self._label(name)
+            responses = []
+            for request in body.get('requests', []):
+                create = request.get('createSelectionChoice')
+                if create is None:
+                    raise http_error(400, 'invalid', f'Unsupported delta request: {request}')
+                field = next((field for field in label['fields'] if field['id'] == create['fieldId']), None)
+                if field is None:
+                    raise http_error(400, 'invalid', f"Unknown field: {create['fieldId']}")
+                choice = json.loads(json.dumps(create['choice']))
+                choice['id'] = self._next_id('choice')
+                field.setdefault('selectionOptions', {}).setdefault('choices', []).append(choice)
+                responses.append({'createSelectionChoice': {'fieldId': field['id'], 'id': choice['id']}})
+            label['revisionId'] = str(int(label['revisionId']) + 1)
+            return {'responses': responses}
+
+    def _publish(self, name: str) -> Dict:
+        with self.drive._lock:
+            label = self._label(name)
+            label['lifecycle'] = {'state': 'PUBLISHED'}
+            label['revisionId'] = str(int(label['revisionId']) + 1)
+            return self._view(label, 'LABEL_VIEW_FULL')
+
+def select_fields(
+    file: Dict,
+    fields: Optional[str],
+    collection: Optional[str] = None,
+    include_labels: Optional[str] = None
+) -> Dict:
+    """
+    Apply a (top-level) field mask to a stored file.
+
+    Args:
+        file (Dict): The stored file
+        fields (str): Mask such as 'id, properties' or 'nextPageToken, files(id, name)'
+        collection (str): For list masks, the collection whose sub-mask applies
+        include_labels (str): Comma-separated label IDs reported in labelInfo
+
+    Returns:
+        Dict: A copy holding only the requested fields.
+    """
+    if fields and collection:
+        match = re.search(rf'{collection}\((.*)\)', fields)
+        fields = match.group(1) if match else None
+    if not fields or fields.strip() == '*':
+        selected = {key: value for key, value in file.items() if key != LABELS_KEY}
+        names = ['labelInfo'] if include_labels else []
+    else:
+        # Keep top-level names only, e.g. shortcutDetails(targetId) -> shortcutDetails
+        nested = None
+        while nested != fields:
+            nested, fields = fields, re.sub(r'\([^()]*\)', '', fields)
+        names = [part.strip() for part in fields.split(',')]
+        selected = {name: file[name] for name in names if name in file and name != LABELS_KEY}
+    if 'labelInfo' in names:
+        wanted = [label_id for label_id in (include_labels or '').split(',') if label_id]
+        applied = file.get(LABELS_KEY) or {}
+        selected['labelInfo'] = {'labels': [
+            _label_info_entry(label_id, applied[label_id]) for label_id in wanted if label_id in applied
+        ]}
+    if 'properties' in selected:
+        selected['properties'] = dict(selected['properties'] or {})
+    if 'parents' in selected:
+        selected['parents'] = list(selected['parents'])
+    return selected
+
+def _label_info_entry(label_id: str, values: Dict[str, List[str]]) -> Dict:
+    return {
+        'kind': 'drive#label',
+        'id': label_id,
+        'revisionId': '1',
+        'fields': {
+            field_id: {'kind': 'drive#labelField', 'id': field_id, 'valueType': 'selection', 'selection': list(choices)}
+            for field_id, choices in values.items()
+        }
+    }
+
+def parse_drive_query(query: str) -> Callable[[Dict], bool]:
+    """
+    Compile the subset of the Drive query language the application emits.
+
+    Supported terms: `'id' in parents`, `trashed = true|false`,
+    `mimeType = / != 'x'`, `name = 'x'`, `name contains 'x'`,
+    `properties has { key='k' and value='v' }`, `'labels/L' in labels` and
+    `labels/L.F = 'choice'`, combined with and, or, not and parentheses.
+
+    Args:
+        query (str): The q parameter of files().list
+
+    Returns:
+        Callable[[Dict], bool]: Predicate over stored files.
+
+    Raises:
+        HttpError: 400 for unsupported or malformed queries.
+    """
+    tokens = [match.group(1) for match in QUERY_TOKEN.finditer(query)]
+    if ''.join(tokens) != re.sub(r'\s+', '', query):
+        raise http_error(400, 'invalid', f'Invalid query: {query}')
+    position = 0
+
+    def peek() -> str:
+        return tokens[position] if position < len(tokens) else ''
+
+    def take(expected: Optional[str] = None) -> str:
+        nonlocal position
+        token = peek()
+        if not token or (expected is not None and token.lower() != expected):
+            raise http_error(400, 'invalid', f'Invalid query: {query}')
+        position += 1
+        return token
+
+    def literal() -> str:
+        token = take()
+        if not token.startswith("'"):
+            raise http_error(400, 'invalid', f'Invalid query: {query}')
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+
+    def parse_or():
+        terms = [parse_and()]
+        while peek().lower() == 'or':
+            take()
+            terms.append(parse_and())
+        return terms[0] if len(terms) == 1 else (lambda file: any(term(file) for term in terms))
+
+    def parse_and():
+        terms = [parse_not()]
+        while peek().lower() == 'and':
+            take()
+            terms.append(parse_not())
+        return terms[0] if len(terms) == 1 else (lambda file: all(term(file) for term in terms))
+
+    def parse_not():
+        if peek().lower() == 'not':
+            take()
+            inner = parse_not()
+            return lambda file: not inner(file)
+        if peek() == '(':
+            take()
+            inner = parse_or()
+            take(')')
+            return inner
+        return parse_term()
+
+    def parse_term():
+        token = peek()
+        if token.startswith("'"):
+            value = literal()
+            take('in')
+            target = take().lower()
+            if target == 'labels':
+                label_id = value.split('/', 1)[-1]
+                return lambda file: label_id in (file.get(LABELS_KEY) or {})
+            if target != 'parents':
+                raise http_error(400, 'invalid', f'Invalid query: {query}')
+            return lambda file: value in file.get('parents', ())
+        field = take()
+        if field.startswith('labels/'):
+            label_id, _, field_id = field[len('labels/'):].partition('.')
+            take('=')
+            value = literal()
+            return lambda file: value in (file.get(LABELS_KEY) or {}).get(label_id, {}).get(field_id, ())
+        if field == 'properties':
+            take('has')
+            take('{')
+            take('key')
+            take('=')
+            key = literal()
+            take('and')
+            take('value')
+            take('=')
+            value = literal()
+            take('}')
+            return lambda file: (file.get('properties') or {}).get(key) == value
+        if field == 'trashed':
+            take('=')
+            expected = take().lower() == 'true'
+            return lambda file: bool(file.get('trashed')) == expected
+        if field in ('mimeType', 'name'):
+            operator = take()
+            value = literal()
+            if operator == '=':
+                return lambda file: file.get(field) == value
+            if operator == '!=':
+                return lambda file: file.get(field) != value
+            if operator.lower() == 'contains':
+                return lambda file: value in file.get(field, '')
+        raise http_error(400, 'invalid', f'Unsupported query term in: {query}')
+
+    predicate = parse_or()
+    if position != len(tokens):
+        raise http_error(400, 'invalid', f'Invalid query: {query}')
+    return predicate
@@ -0,0 +1,192 @@
+"""
+Local HTTP server speaking the Drive v3 REST protocol on top of FakeDrive.
+
+FakeDriveServer lets code that builds real client library services (and
+their httplib2 connections) run against the in-memory fake: files
+list/get/update/modifyLabels, changes getStartPageToken/list, and
+multipart batch requests. The drive's latency and injected errors apply
+as they do to the service stand-in.
+
+Example:
+    drive = FakeDrive()
+    drive.populate(1000)
+    with FakeDriveServer(drive) as server:
+        service = build_drive_service(Credentials(token='test'), api_endpoint=server.url)
+"""
+import email
+import json
+import re
+import threading
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_drive import FakeDrive, FakeRequest, http_error
+
+SERVICE_PATH = '/drive/v3/'
+BATCH_PATH = '/batch/drive/v3'
+
+# Query parameters the client library sends as strings that the fake takes typed
+INT_PARAMS = ('pageSize',)
+BOOL_VALUES = {'true': True, 'false': False}
+
+ROUTES = [
+    ('GET', re.compile(r'files'), lambda files, changes, body, params: files.list(**params)),
+    ('GET', re.compile(r'files/(?P<fileId>[^/]+)'), lambda files, changes, body, params: files.get(**params)),
+    ('PATCH', re.compile(r'files/(?P<fileId>[^/]+)'),
+     lambda files, changes, body, params: files.update(body=body, **params)),
+    ('POST', re.compile(r'files/(?P<fileId>[^/]+)/modifyLabels'),
+     lambda files, changes, body, params: files.modifyLabels(body=body, **params)),
+    ('GET', re.compile(r'changes/startPageToken'),
+     lambda files, changes, body, params: changes.getStartPageToken(**params)),
+    ('GET', re.compile(r'changes'), lambda files, changes, body, params: changes.list(**params)),
+]
+
+def parse_params(query: str) -> Dict:
+    """Decode a query string into keyword arguments for the fake's methods."""
+    params = {}
+    for key, value in urllib.parse.parse_qsl(query):
+        if key == 'alt':
+            continue
+        if key in INT_PARAMS:
+            value = int(value)
+        params[key] = BOOL_VALUES.get(value, value)
+    return params
+
+class FakeDriveServer:
+    """Drive REST endpoint on localhost, served from a background thread."""
+
+    def __init__(self, drive: FakeDrive, host: str = '127.0.0.1', port: int = 0):
+        """
+        Start serving a fake drive.
+
+        Args:
+            drive (FakeDrive): Drive the requests are answered from
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 for any free one
+        """
+        self.drive = drive
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-drive-http', daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        """Endpoint to pass to build_drive_service as api_endpoint."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{SERVICE_PATH}'
+
+    def close(self):
+        """Stop serving and close the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> 'FakeDriveServer':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, method: str, path: str, body: Optional[Dict]) -> FakeRequest:
+        """
+        Map one REST call onto the fake drive.
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path with its query string
+            body (Dict): Decoded JSON body, if any
+
+        Returns:
+            FakeRequest: The deferred call.
+
+        Raises:
+            HttpError: If no route matches.
+        """
+        parsed = urllib.parse.urlsplit(path)
+        params = parse_params(parsed.query)
+        if parsed.path.startswith(SERVICE_PATH):
+            resource = parsed.path[len(SERVICE_PATH):]
+            for route_method, pattern, call in ROUTES:
+                match = pattern.fullmatch(resource)
+                if route_method == method and match:
+                    params.update({key: urllib.parse.unquote(value) for key, value in match.groupdict().items()})
+                    return call(self.drive.files(), self.drive.changes(), body, params)
+        raise http_error(404, 'notFound', f'No route for {method} {parsed.path}')
+
+    def execute(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, bytes]:
+        """Run one REST call after the drive's latency and return its status and JSON body."""
+        try:
+            return 200, json.dumps(self.request(method, path, body).execute()).encode()
+        except HttpError as error:
+            return error.resp.status, error.content
+
+    def execute_batch(self, content_type: str, payload: bytes) -> Tuple[str, bytes]:
+        """
+        Run a multipart/mixed batch in one round trip, as FakeBatch does.
+
+        Returns:
+            Tuple[str, bytes]: Content type and body of the multipart response.
+        """
+        message = email.message_from_bytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + payload)
+        self.drive._wait(self.drive.latency)
+        self.drive._count('batch')
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            # The client folds long Content-IDs; the reply must echo them on one line
+            content_id = ' '.join(part['Content-ID'].split())
+            request_line, rest = part.get_payload().split('\n', 1)
+            method, path = request_line.split(' ')[:2]
+            inner = email.message_from_string(rest)
+            text = inner.get_payload().strip()
+            try:
+                request = self.request(method, path, json.loads(text) if text else None)
+                status, content = 200, json.dumps(self.drive._run(request.method, request._call)).encode()
+            except HttpError as error:
+                status, content = error.resp.status, error.content
+            parts.append(
+                f'--{boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id[1:]}\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+                f'{content.decode()}\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n')
+        return f'multipart/mixed; boundary={boundary}', ''.join(parts).encode()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        fake: FakeDriveServer = self.server.fake
+        payload = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.command == 'POST' and self.path.split('?')[0] == BATCH_PATH:
+            content_type, content = fake.execute_batch(self.headers['Content-Type'], payload)
+            status = 200
+        else:
+            status, content = fake.execute(self.command, self.path, json.loads(payload) if payload else None)
+            content_type = 'application/json; charset=UTF-8'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
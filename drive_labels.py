@@ -12,9 +12,16 @@ from rich.prompt import Prompt, Confirm
 from dotenv import load_dotenv
 import time
 
+from drivelabels.core.batch import execute_batched
+from drivelabels.core.drive_query import ALL_DRIVES_LIST_PARAMS, NOT_TRASHED
+from drivelabels.core.label_catalog import LabelCatalog
+
 # Load environment variables
 load_dotenv()
 
+# Files per page when searching, the Drive maximum
+SEARCH_PAGE_SIZE = 1000
+
 # If modifying these scopes, delete the file token.pickle.
 SCOPES = [
     'https://www.googleapis.com/auth/drive',
@@ -27,6 +34,7 @@ class DriveLabelManager:
         self.creds = None
         self.drive_service = None
         self.labels_service = None
+        self.catalog = None
         self.folder_id = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
         
     def authenticate(self):
@@ -48,14 +56,19 @@ class DriveLabelManager:
         
         self.drive_service = build('drive', 'v3', credentials=self.creds)
         self.labels_service = build('drivelabels', 'v2', credentials=self.creds)
+        # Label names are resolved from memory instead of listing labels per call
+        self.catalog = LabelCatalog(self.labels_service)
     
     def list_files(self) -> List[Dict]:
         """Lists all files in the specified folder with their metadata."""
         try:
+            # labelInfo only reports the labels named in includeLabels
             results = self.drive_service.files().list(
-                q=f"'{self.folder_id}' in parents",
+                q=f"'{self.folder_id}' in parents and {NOT_TRASHED}",
                 pageSize=100,
-                fields="nextPageToken, files(id, name, mimeType, labels)"
+                includeLabels=','.join(self.catalog.label_ids()) or None,
+                fields="nextPageToken, files(id, name, mimeType, labelInfo(labels(id)))",
+                **ALL_DRIVES_LIST_PARAMS
             ).execute()
             return results.get('files', [])
         except HttpError as error:
@@ -71,69 +84,109 @@ class DriveLabelManager:
             # Apply the label to the file
             self.drive_service.files().modifyLabels(
                 fileId=file_id,
-                body={
-                    'labelModifications': [{
-                        'labelId': label['id'],
-                        'fieldModifications': [{
-                            'fieldId': label['fields'][0]['id'],
-                            'setSelection': {
-                                'values': [label['fields'][0]['id']]
-                            }
-                        }]
-                    }]
-                }
+                body=self._label_modification(label, label_name)
             ).execute()
             
             self.console.print(f"[green]Label '{label_name}' added successfully![/green]")
                 
-        except HttpError as error:
+        except (HttpError, ValueError) as error:
             self.console.print(f"[red]An error occurred: {error}[/red]")
 
+    def add_label_bulk(self, file_ids: List[str], label_name: str) -> Dict[str, str]:
+        """Adds a label to many files with batched modifyLabels requests.
+
+        Returns the error message of every file that could not be labeled.
+        """
+        try:
+            label = self._get_or_create_label(label_name)
+            body = self._label_modification(label, label_name)
+        except (HttpError, ValueError) as error:
+            self.console.print(f"[red]An error occurred: {error}[/red]")
+            return {file_id: str(error) for file_id in file_ids}
+        
+        files = self.drive_service.files()
+        applied, errors = execute_batched(
+            self.drive_service,
+            {file_id: lambda file_id=file_id: files.modifyLabels(fileId=file_id, body=body)
+             for file_id in dict.fromkeys(file_ids)}
+        )
+        
+        failed = {file_id: str(error) for file_id, error in errors.items()}
+        for file_id, message in failed.items():
+            self.console.print(f"[red]{file_id}: {message}[/red]")
+        self.console.print(f"[green]Label '{label_name}' added to {len(applied)} files.[/green]")
+        return failed
+
+    def _label_modification(self, label: Dict, label_name: str) -> Dict:
+        """Builds the modifyLabels body that applies a single-choice label.
+
+        Raises ValueError if the label has no choice named label_name, as an
+        empty selection would clear the field instead of setting it.
+        """
+        field_id = self.catalog.field_id(label['id'])
+        option_id = self.catalog.choice_id(label['id'], field_id, label_name) if field_id else None
+        if option_id is None:
+            title = label.get('properties', {}).get('title', label['id'])
+            raise ValueError(f"Label '{title}' has no choice named '{label_name}'.")
+        return {
+            'labelModifications': [{
+                'labelId': label['id'],
+                'fieldModifications': [{
+                    'fieldId': field_id,
+                    'setSelectionValues': [option_id]
+                }]
+            }]
+        }
+
     def _get_or_create_label(self, label_name: str) -> Dict:
-        """Gets an existing label or creates a new one."""
+        """Gets an existing label or creates (and publishes) a new one."""
         try:
-            # Try to find existing label
-            labels = self.labels_service.labels().list().execute()
-            for label in labels.get('labels', []):
-                if label['name'] == label_name:
-                    return label
+            # Try to find existing label by title in the cached catalog
+            label = self.catalog.label(label_name)
+            if label is not None:
+                return label
             
             # Create new label if not found
-            label = self.labels_service.labels().create(
-                body={
-                    'name': label_name,
-                    'labelType': 'USER',
-                    'fields': [{
-                        'id': f'{label_name}_field',
-                        'type': 'SELECTION',
+            return self.catalog.create_label(label_name, [{
+                'properties': {
+                    'displayName': label_name
+                },
+                'selectionOptions': {
+                    'choices': [{
                         'properties': {
-                            'displayName': label_name,
-                            'selectionOptions': [{
-                                'id': f'{label_name}_option',
-                                'properties': {
-                                    'displayName': label_name
-                                }
-                            }]
+                            'displayName': label_name
                         }
                     }]
                 }
-            ).execute()
-            return label
+            }])
             
         except HttpError as error:
             self.console.print(f"[red]An error occurred: {error}[/red]")
             raise
 
     def search_by_label(self, label_name: str) -> List[Dict]:
-        """Searches for files with a specific label."""
+        """Searches for files with a specific label, following every page."""
         try:
-            label = self._get_or_create_label(label_name)
-            results = self.drive_service.files().list(
-                q=f"'{self.folder_id}' in parents and labels contains '{label['id']}'",
-                pageSize=100,
-                fields="nextPageToken, files(id, name, mimeType, labels)"
-            ).execute()
-            return results.get('files', [])
+            label = self.catalog.label(label_name)
+            if label is None:
+                return []
+            
+            # Drive filters by label; only the fields the table shows come back
+            files = []
+            page_token = None
+            while True:
+                results = self.drive_service.files().list(
+                    q=f"'{self.folder_id}' in parents and {NOT_TRASHED} and 'labels/{label['id']}' in labels",
+                    pageSize=SEARCH_PAGE_SIZE,
+                    pageToken=page_token,
+                    includeLabels=label['id'],
+                    fields="nextPageToken, files(id, name, mimeType, labelInfo(labels(id)))",
+                    **ALL_DRIVES_LIST_PARAMS
+                ).execute()
+                files.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    return files
         except HttpError as error:
             self.console.print(f"[red]An error occurred: {error}[/red]")
             return []
@@ -147,8 +200,8 @@ class DriveLabelManager:
         table.add_column("Labels", width=20)
         
         for file in files:
-            labels = file.get('labels', {})
-            label_names = [label for label in labels.keys() if labels[label]]
+            labels = [self.catalog.get_label(label['id']) for label in file.get('labelInfo', {}).get('labels', [])]
+            label_names = [label['properties']['title'] for label in labels if label]
             label_str = ', '.join(label_names) if label_names else 'No labels'
             table.add_row(
                 file['id'],
@@ -179,9 +232,13 @@ def main():
         elif choice == "2":
             files = manager.list_files()
             manager.display_files(files)
-            file_id = Prompt.ask("Enter the file ID to label")
+            file_ids = Prompt.ask("Enter the file ID(s) to label, comma-separated")
             label = Prompt.ask("Enter the label to add")
-            manager.add_label(file_id, label)
+            file_ids = [file_id.strip() for file_id in file_ids.split(',') if file_id.strip()]
+            if len(file_ids) == 1:
+                manager.add_label(file_ids[0], label)
+            else:
+                manager.add_label_bulk(file_ids, label)
             
         elif choice == "3":
             label = Prompt.ask("Enter the label to search for")
@@ -0,0 +1,273 @@
+"""
+Headless command-line interface.
+
+Usage:
+    python -m drivelabels tag [INPUT] [--tag TAG ...] [--credentials PATH,...]
+    python -m drivelabels untag [INPUT] [--tag TAG ...] [--all-spellings] [--credentials PATH,...]
+    python -m drivelabels search EXPR
+    python -m drivelabels ls
+    python -m drivelabels tags [--prefix TEXT] [--stats]
+    python -m drivelabels export [-o SNAPSHOT] [--format jsonl|csv]
+    python -m drivelabels import [SNAPSHOT] [--format jsonl|csv]
+    python -m drivelabels serve [--address SOCKET]
+
+tag/untag read file-ID/tag pairs from INPUT (default: stdin) as CSV lines
+(`file_id,tag[,tag...]`) or NDJSON objects (`{"id": ..., "tags": [...]}`),
+apply them in batches on several connections at once and write one NDJSON
+result per file to stdout. Input is streamed, so memory use does not grow
+with its length. Progress and throughput are reported on stderr. With
+--credentials (or DRIVELABELS_CREDENTIALS) the files are sharded across one
+worker process per credential, each with its own quota.
+
+export streams every file's ID, name and tags from the folder listing as
+JSON lines or CSV; import restores such a snapshot, writing only the files
+whose tags differ from it.
+
+serve runs a local daemon holding the services, index and caches, which
+drivelabels.client queries in milliseconds.
+"""
+import argparse
+import logging
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from drivelabels.config.settings import CLI_CONFIG, CREDENTIAL_POOL_CONFIG, DAEMON_CONFIG, INDEX_CONFIG
+from drivelabels.core.snapshot import FORMATS, detect_format, export_tags, read_snapshot
+from drivelabels.core.status import STATUS_FAILED
+from drivelabels.jobs import (
+    OPERATION_SET,
+    STATUS_INVALID,
+    ChangeRunner,
+    Progress,
+    change_operation,
+    line_writer,
+    open_input,
+    read_changes,
+    read_restores
+)
+
+logger = logging.getLogger(__name__)
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='drivelabels', description="Bulk tag Google Drive files without the interactive menu.")
+    parser.add_argument('-o', '--output', help="Write NDJSON results here instead of stdout")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Do not report progress on stderr")
+    parser.add_argument(
+        '--metrics', metavar='PATH',
+        help="Write API call metrics here on exit, as JSON if PATH ends in .json, else Prometheus text"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, verb in (('tag', 'Add'), ('untag', 'Remove')):
+        command = commands.add_parser(name, help=f"{verb} tags from CSV or NDJSON input")
+        command.add_argument('input', nargs='?', help="Input file, '-' or omitted for stdin")
+        command.add_argument('-t', '--tag', action='append', default=[], help="Tag applied to every input line (repeatable)")
+        command.add_argument('-j', '--jobs', type=int, default=CLI_CONFIG['jobs'], help="Batches in flight at once")
+        command.add_argument(
+            '--credentials', metavar='PATH[,PATH...]',
+            default=','.join(CREDENTIAL_POOL_CONFIG['paths']),
+            help="Service-account keys or tokens to shard the job across, one worker process each "
+                 "(default: DRIVELABELS_CREDENTIALS)"
+        )
+        if name == 'untag':
+            command.add_argument(
+                '--all-spellings', action='store_true',
+                help="Also remove the spellings treated as the same tag, e.g. 'marketing' for 'Marketing'"
+            )
+
+    search = commands.add_parser('search', help="List files matching a tag or boolean tag query")
+    search.add_argument('expr', nargs='+', help="Tag name or query such as 'contract AND NOT archived'")
+    search.add_argument('--refresh', action='store_true', help="Rescan the folder instead of syncing the index")
+
+    commands.add_parser('ls', help="List every file with its tags")
+
+    tags = commands.add_parser('tags', help="List the tags in use with their file counts")
+    tags.add_argument('-p', '--prefix', help="Only tags starting with this text, as autocomplete would offer them")
+    tags.add_argument('--stats', action='store_true', help="Print a vocabulary report instead of NDJSON")
+    tags.add_argument('--refresh', action='store_true', help="Rescan the folder instead of syncing the index")
+
+    export = commands.add_parser('export', help="Stream every file's ID, name and tags as a snapshot")
+    export.add_argument('-f', '--format', choices=FORMATS, help="Snapshot format, defaults to csv for .csv outputs, else jsonl")
+    export.add_argument('--tagged-only', action='store_true', help="Leave out files without tags")
+
+    restore = commands.add_parser('import', help="Restore the tags of a snapshot, writing only files that differ")
+    restore.add_argument('input', nargs='?', help="Snapshot file, '-' or omitted for stdin")
+    restore.add_argument('-f', '--format', choices=FORMATS, help="Snapshot format, defaults to csv for .csv inputs, else jsonl")
+    restore.add_argument('-j', '--jobs', type=int, default=CLI_CONFIG['jobs'], help="Batches in flight at once")
+
+    serve = commands.add_parser('serve', help="Run a daemon keeping services and caches warm for drivelabels.client")
+    serve.add_argument('--address', default=DAEMON_CONFIG['address'], help="Unix socket path, or host:port on localhost")
+    return parser
+
+def _run_sharded(args, credentials: List[str], output: TextIO, emit, progress: Progress) -> int:
+    from drivelabels.sharding import ShardedJobRunner
+    from drivelabels.utils.metrics import get_metrics
+
+    runner = ShardedJobRunner(
+        credentials,
+        change_operation(args),
+        jobs=max(1, args.jobs)
+    )
+    try:
+        with open_input(args.input) as lines:
+            runner.run(read_changes(lines, args.tag, progress, emit), emit, progress)
+    finally:
+        if args.metrics:
+            get_metrics().write(args.metrics)
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    if not args.quiet:
+        progress.finish()
+        runner.write_summary()
+    failed = progress.counts.get(STATUS_FAILED, 0) + progress.counts.get(STATUS_INVALID, 0)
+    return 1 if failed else 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command-line entry point.
+
+    Args:
+        argv (List[str]): Arguments, defaults to sys.argv[1:]
+
+    Returns:
+        int: Exit status, non-zero if any file failed.
+    """
+    args = _parser().parse_args(argv)
+    if args.command == 'search':
+        args.expr = ' '.join(args.expr)
+
+    from googleapiclient.errors import HttpError
+    from drivelabels.core.drive_manager import DriveManager
+    from drivelabels.core.models import FileRecord
+    from drivelabels.core.query import QuerySyntaxError, is_boolean_query
+    from drivelabels.core.tag_backends import create_tag_backend
+    from drivelabels.core.tag_index import TagIndex
+    from drivelabels.utils.auth import get_credentials, get_services, save_credentials
+    from drivelabels.utils.display import display_error, display_tag_stats, use_stderr
+    from drivelabels.utils.metrics import get_metrics
+    from drivelabels.utils.session_pool import SessionPool
+
+    # stdout carries the NDJSON results
+    use_stderr()
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    emit = line_writer(output)
+    progress = Progress(args.command, interval=0 if args.quiet else CLI_CONFIG['progress_interval'])
+
+    if args.command == 'serve':
+        from drivelabels.daemon import serve
+        try:
+            return serve(args.address)
+        except (RuntimeError, ValueError) as error:
+            display_error(str(error))
+            return 1
+
+    credentials = [path.strip() for path in getattr(args, 'credentials', '').split(',') if path.strip()]
+    if credentials:
+        return _run_sharded(args, credentials, output, emit, progress)
+
+    creds = get_credentials()
+    session_pool = SessionPool(creds, on_refresh=save_credentials).start()
+    try:
+        if args.command in ('tag', 'untag'):
+            # One backend (and label catalog) shared by every worker
+            tag_backend = create_tag_backend(labels_service=get_services(creds)[1])
+            runner = ChangeRunner(
+                lambda: DriveManager(session_pool.service(), None, tag_backend=tag_backend, cache_responses=False),
+                change_operation(args),
+                jobs=max(1, args.jobs)
+            )
+            with open_input(args.input) as lines:
+                runner.run(read_changes(lines, args.tag, progress, emit), emit, progress)
+        elif args.command == 'import':
+            tag_backend = create_tag_backend(labels_service=get_services(creds)[1])
+            # Files whose indexed tags already match the snapshot need no request
+            tag_index = TagIndex(INDEX_CONFIG['path'])
+            try:
+                DriveManager(
+                    session_pool.service(), None, tag_index, tag_backend=tag_backend, cache_responses=False
+                ).sync()
+                runner = ChangeRunner(
+                    lambda: DriveManager(
+                        session_pool.service(), None, tag_index, tag_backend=tag_backend, cache_responses=False
+                    ),
+                    OPERATION_SET,
+                    jobs=max(1, args.jobs)
+                )
+                with open_input(args.input) as lines:
+                    rows = read_snapshot(lines, args.format or detect_format(args.input))
+                    runner.run(read_restores(rows, progress, emit), emit, progress)
+            finally:
+                tag_index.close()
+        elif args.command == 'export':
+            manager = DriveManager(*get_services(creds), service_factory=session_pool.service, cache_responses=False)
+
+            def listed(files: Iterable[Dict]) -> Iterator[Dict]:
+                for file in files:
+                    progress.record('exported')
+                    yield file
+
+            # Pages go straight from the listing to the output, bypassing every cache
+            export_tags(
+                listed(manager.iter_files(use_cache=False)),
+                output,
+                args.format or detect_format(args.output),
+                args.tagged_only
+            )
+        else:
+            drive_service, labels_service = get_services(creds)
+            if args.command == 'tags':
+                manager = DriveManager(
+                    drive_service, labels_service, TagIndex(INDEX_CONFIG['path']), service_factory=session_pool.service
+                )
+                try:
+                    vocabulary = manager.tag_vocabulary(refresh=args.refresh)
+                    if args.stats:
+                        from rich.console import Console
+                        display_tag_stats(vocabulary.summary(), Console(file=output))
+                    elif args.prefix is not None:
+                        for tag, count in vocabulary.complete(args.prefix, limit=None):
+                            emit({'tag': tag, 'files': count})
+                    else:
+                        for entry in vocabulary.entries():
+                            emit(entry)
+                finally:
+                    manager.close()
+                return 0
+            if args.command == 'search':
+                manager = DriveManager(
+                    drive_service, labels_service, TagIndex(INDEX_CONFIG['path']), service_factory=session_pool.service
+                )
+                try:
+                    if is_boolean_query(args.expr):
+                        files = manager.query(args.expr, refresh=args.refresh)
+                    else:
+                        files = manager.search_by_tag(args.expr, refresh=args.refresh)
+                except QuerySyntaxError as error:
+                    display_error(f"Invalid query: {error}")
+                    return 2
+            else:
+                manager = DriveManager(drive_service, labels_service, service_factory=session_pool.service)
+                files = (FileRecord.from_api(file) for file in manager.iter_files())
+            try:
+                for record in files:
+                    emit(record.to_dict())
+                    progress.record('listed')
+            finally:
+                manager.close()
+    except HttpError as error:
+        display_error(f"An error occurred: {error}")
+        return 1
+    finally:
+        session_pool.stop()
+        if args.metrics:
+            get_metrics().write(args.metrics)
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    if not args.quiet:
+        progress.finish()
+    failed = progress.counts.get(STATUS_FAILED, 0) + progress.counts.get(STATUS_INVALID, 0)
+    return 1 if failed else 0
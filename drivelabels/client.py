@@ -0,0 +1,279 @@
+"""
+Thin client of the drivelabels daemon.
+
+Usage:
+    python -m drivelabels.client ls
+    python -m drivelabels.client search EXPR
+    python -m drivelabels.client tag [INPUT] [--tag TAG ...]
+    python -m drivelabels.client untag [INPUT] [--tag TAG ...] [--all-spellings]
+    python -m drivelabels.client status
+    python -m drivelabels.client stop
+
+The daemon (`python -m drivelabels serve`) holds the authenticated services,
+the tag index and the caches, so a call costs a local round trip instead
+of credential loading, service discovery and a folder listing. Requests and
+replies are JSON lines on a Unix socket (or a localhost TCP socket): a
+request is `{"method": ..., "params": {...}}`, and the reply is zero or more
+`{"item": ...}` lines followed by `{"ok": true, ...}` or
+`{"ok": false, "error": ...}`. Input and output formats match the headless
+command line.
+"""
+import argparse
+import json
+import logging
+import re
+import socket
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from drivelabels.config.settings import CLI_CONFIG, DAEMON_CONFIG
+from drivelabels.jobs import (
+    STATUS_FAILED,
+    STATUS_INVALID,
+    ChangeRunner,
+    Progress,
+    change_operation,
+    line_writer,
+    open_input,
+    read_changes
+)
+
+logger = logging.getLogger(__name__)
+
+TCP_ADDRESS = re.compile(r'^(?P<host>[\w.\-]+|\[[0-9a-fA-F:]+\]):(?P<port>\d+)$')
+
+class DaemonError(Exception):
+    """A request the daemon answered with an error."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """
+    Socket family and address of a daemon address setting.
+
+    Args:
+        address (str): Unix socket path, or host:port for TCP
+
+    Returns:
+        Tuple[int, Union[str, Tuple[str, int]]]: Address family and the
+        address in the form socket.connect() expects.
+    """
+    match = TCP_ADDRESS.match(address)
+    if match is None:
+        return socket.AF_UNIX, address
+    return socket.AF_INET, (match.group('host').strip('[]'), int(match.group('port')))
+
+def read_token(path: str = DAEMON_CONFIG['token_path']) -> Optional[str]:
+    """
+    Secret of a TCP daemon, None if it has not written one.
+
+    Args:
+        path (str): Token file written by the daemon
+
+    Returns:
+        Optional[str]: The token.
+    """
+    try:
+        with open(path, encoding='utf-8') as token_file:
+            return token_file.read().strip() or None
+    except OSError:
+        return None
+
+class DaemonClient:
+    """Connection to a running daemon; one request at a time."""
+
+    def __init__(self, address: str = DAEMON_CONFIG['address'], timeout: float = DAEMON_CONFIG['timeout']):
+        """
+        Connect to the daemon.
+
+        Args:
+            address (str): Unix socket path, or host:port for TCP
+            timeout (float): Seconds to wait for each reply line
+
+        Raises:
+            OSError: If no daemon is listening at the address.
+        """
+        family, target = parse_address(address)
+        self.address = address
+        self.token = read_token() if family != socket.AF_UNIX else None
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(target)
+        except OSError:
+            self._socket.close()
+            raise
+        self._reader = self._socket.makefile('rb')
+
+    def __enter__(self) -> 'DaemonClient':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Close the connection."""
+        self._reader.close()
+        self._socket.close()
+
+    def stream(self, method: str, **params) -> Iterator[Dict]:
+        """
+        Send a request and yield the items of its reply as they arrive.
+
+        The reply must be read to the end before the next request.
+
+        Args:
+            method (str): Daemon method, e.g. 'list' or 'search'
+            **params: Method parameters
+
+        Yields:
+            Dict: Reply items.
+
+        Raises:
+            DaemonError: If the daemon rejects the request.
+            ConnectionError: If the daemon closes the connection.
+        """
+        request = {'method': method, 'params': params}
+        if self.token:
+            request['token'] = self.token
+        self._socket.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        while True:
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError("The daemon closed the connection.")
+            reply = json.loads(line)
+            if 'item' in reply:
+                yield reply['item']
+            elif reply.get('ok'):
+                return
+            else:
+                raise DaemonError(reply.get('error', 'unknown error'), reply.get('code'))
+
+    def call(self, method: str, **params) -> List[Dict]:
+        """
+        Send a request and return every item of its reply.
+
+        Args:
+            method (str): Daemon method
+            **params: Method parameters
+
+        Returns:
+            List[Dict]: Reply items.
+
+        Raises:
+            DaemonError: If the daemon rejects the request.
+        """
+        return list(self.stream(method, **params))
+
+    def apply_tag_changes(self, changes: Dict[str, Dict[str, List[str]]]) -> Dict[str, Dict]:
+        """
+        Apply tag changes through the daemon, like DriveManager.apply_tag_changes.
+
+        Args:
+            changes (Dict[str, Dict[str, List[str]]]): {'add': [...]},
+                {'remove': [...]} and/or {'remove_spellings': [...]} keyed by file ID
+
+        Returns:
+            Dict[str, Dict]: Per-file results keyed by file ID.
+        """
+        return {
+            item.pop('id'): item
+            for item in self.stream('apply', changes=changes)
+        }
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='drivelabels.client', description="Query and tag files through a running drivelabels daemon."
+    )
+    parser.add_argument('--address', default=DAEMON_CONFIG['address'], help="Daemon socket path or host:port")
+    parser.add_argument('-o', '--output', help="Write NDJSON results here instead of stdout")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Do not report progress on stderr")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, verb in (('tag', 'Add'), ('untag', 'Remove')):
+        command = commands.add_parser(name, help=f"{verb} tags from CSV or NDJSON input")
+        command.add_argument('input', nargs='?', help="Input file, '-' or omitted for stdin")
+        command.add_argument('-t', '--tag', action='append', default=[], help="Tag applied to every input line (repeatable)")
+        command.add_argument('-j', '--jobs', type=int, default=CLI_CONFIG['jobs'], help="Requests in flight at once")
+        if name == 'untag':
+            command.add_argument(
+                '--all-spellings', action='store_true',
+                help="Also remove the spellings treated as the same tag, e.g. 'marketing' for 'Marketing'"
+            )
+
+    search = commands.add_parser('search', help="List files matching a tag or boolean tag query")
+    search.add_argument('expr', nargs='+', help="Tag name or query such as 'contract AND NOT archived'")
+    search.add_argument('--refresh', action='store_true', help="Have the daemon rescan the folder first")
+
+    commands.add_parser('ls', help="List every file with its tags")
+    commands.add_parser('status', help="Print the daemon's statistics")
+    commands.add_parser('stop', help="Shut the daemon down")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Client entry point.
+
+    Args:
+        argv (List[str]): Arguments, defaults to sys.argv[1:]
+
+    Returns:
+        int: Exit status: 1 if any file failed, 2 if the daemon is not
+        running or rejected the request.
+    """
+    args = _parser().parse_args(argv)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    emit = line_writer(output)
+    progress = Progress(args.command, interval=0 if args.quiet else CLI_CONFIG['progress_interval'])
+    try:
+        client = DaemonClient(args.address)
+    except OSError as error:
+        sys.stderr.write(
+            f"No drivelabels daemon at {args.address} ({error}); start one with `python -m drivelabels serve`.\n"
+        )
+        return 2
+
+    try:
+        if args.command in ('tag', 'untag'):
+            clients = [client]
+            # Each runner thread gets its own connection
+            runner = ChangeRunner(
+                lambda: clients.pop() if clients else DaemonClient(args.address),
+                change_operation(args),
+                jobs=max(1, args.jobs)
+            )
+            with open_input(args.input) as lines:
+                runner.run(read_changes(lines, args.tag, progress, emit), emit, progress)
+        elif args.command in ('ls', 'search'):
+            params = {'expr': ' '.join(args.expr), 'refresh': args.refresh} if args.command == 'search' else {}
+            for item in client.stream('list' if args.command == 'ls' else 'search', **params):
+                emit(item)
+                progress.record('listed')
+        elif args.command == 'status':
+            for item in client.stream('stats'):
+                emit(item)
+            return 0
+        else:
+            client.call('shutdown')
+            return 0
+    except DaemonError as error:
+        sys.stderr.write(f"Daemon error: {error}\n")
+        return 2
+    except (ConnectionError, socket.timeout) as error:
+        sys.stderr.write(f"Lost the connection to the daemon: {error}\n")
+        return 2
+    finally:
+        client.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    if not args.quiet:
+        progress.finish()
+    failed = progress.counts.get(STATUS_FAILED, 0) + progress.counts.get(STATUS_INVALID, 0)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,14 @@
 """
 Configuration settings for the Drive Labels application.
 """
+import hashlib
 import os
+import socket
 from dotenv import load_dotenv
 import logging
 
+from drivelabels.utils.log_handler import configure_logging
+
 # Load environment variables
 load_dotenv()
 
@@ -17,6 +21,15 @@ SCOPES = [
 # Google Drive folder ID to monitor
 FOLDER_ID = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
 
+# All folders managed together: FOLDER_ID plus any comma-separated IDs in
+# GOOGLE_DRIVE_FOLDER_IDS
+FOLDER_IDS = [
+    folder_id for folder_id in dict.fromkeys(
+        [FOLDER_ID] + [part.strip() for part in os.getenv('GOOGLE_DRIVE_FOLDER_IDS', '').split(',')]
+    )
+    if folder_id
+]
+
 # API configuration
 API_CONFIG = {
     'drive': {
@@ -29,21 +42,173 @@ API_CONFIG = {
     }
 }
 
+# File listing configuration
+LISTING_CONFIG = {
+    'page_size': 1000,  # Maximum pageSize accepted by files().list
+    'max_query_length': 4000,  # Folders are packed into OR clauses up to this query length
+    'prefetch': True,   # Fetch the next page in the background while the current one is consumed
+    # List the whole folder tree instead of only the folder's direct children
+    'recursive': os.getenv('DRIVELABELS_RECURSIVE', '0') == '1'
+}
+
+# Recursive crawl configuration
+CRAWL_CONFIG = {
+    'max_workers': 8,         # Folder pages fetched in parallel, one Drive client each
+    'max_depth': None,        # Deepest subfolder level to descend to, None for unlimited
+    'follow_shortcuts': True  # Descend into folders reached through shortcuts
+}
+
+# Rate limiting applied to every Drive API request
+RATE_LIMIT_CONFIG = {
+    'quota_per_minute': 12000,  # Drive API per-user query quota
+    'burst': 50,                # Requests that may be sent back to back
+    'min_rate': 1.0,            # Floor (requests/s) for adaptive slowdown
+    'recovery': 0.05,           # Fraction of the full rate regained per successful request
+    'max_retries': 5,           # Retries on 403 rate limit, 429 and 5xx responses
+    'base_delay': 1.0,          # First backoff delay in seconds
+    'max_delay': 32.0           # Longest single backoff delay in seconds
+}
+
+# Authorized HTTP session pool and background token refresh
+SESSION_CONFIG = {
+    # Renew the access token this many seconds before it expires; google-auth
+    # itself refreshes inline 225 s before expiry, so keep this above that
+    'refresh_margin': 300,
+    'retry_interval': 30,  # Seconds between attempts after a failed refresh
+    'max_idle': 16         # Keep-alive connections kept for reuse once their thread exits
+}
+
+# AsyncDriveManager configuration
+ASYNC_CONFIG = {
+    'max_concurrency': 32  # Requests in flight at once, one pooled connection each
+}
+
+# Batch HTTP configuration for bulk operations
+BATCH_CONFIG = {
+    'size': 100,   # Sub-requests per batch (Drive maximum is 100)
+    'retries': 3   # Retry rounds for rate-limited or transient sub-request failures
+}
+
+# Headless command-line interface (python -m drivelabels)
+CLI_CONFIG = {
+    'jobs': 4,                 # Batches applied in parallel, each on its own connection
+    'chunk_size': 100,         # Files per batch; a Drive batch holds at most 100 requests
+    'progress_interval': 1.0   # Seconds between progress reports on stderr
+}
+
+# Credential pool for sharded bulk jobs: one worker process per credential
+CREDENTIAL_POOL_CONFIG = {
+    # Comma-separated service-account key files or user tokens (.json or .pickle)
+    'paths': [path.strip() for path in os.getenv('DRIVELABELS_CREDENTIALS', '').split(',') if path.strip()],
+    # User the service accounts impersonate (domain-wide delegation), if any
+    'subject': os.getenv('DRIVELABELS_IMPERSONATE'),
+    'quota_per_minute': 12000,  # Rate limit of each credential (Drive per-user quota)
+    'jobs': 4,                  # Batches in flight per worker process
+    'queue_size': 8             # Batches queued per worker before the reader waits
+}
+
+# Tag storage configuration
+TAG_CONFIG = {
+    # 'joined': one comma-joined 'tags' property (original layout)
+    # 'migrating': write one 'drivelabels_tag_<name>' property per tag (joined
+    #   when they exceed Drive's property limits), read both layouts
+    # 'per_tag': like 'migrating', and searches filter server-side
+    'layout': os.getenv('DRIVELABELS_TAG_LAYOUT', 'joined'),
+    # 'properties': tags live in file properties (see 'layout')
+    # 'labels': tags are choices of a native Drive label (see LABELS_CONFIG)
+    'backend': os.getenv('DRIVELABELS_TAG_BACKEND', 'properties')
+}
+
+# Native Drive Labels backend configuration
+LABELS_CONFIG = {
+    'title': os.getenv('DRIVELABELS_LABEL_TITLE', 'drivelabels'),  # Label holding the tags
+    'field': 'Tags',        # Multi-valued selection field whose choices are the tags
+    'catalog_ttl': 600,     # Seconds before the label catalog is revalidated
+    'miss_interval': 10,    # Minimum seconds between revalidations caused by unknown IDs
+    'page_size': 200        # Labels per labels().list page (API maximum)
+}
+
+# Tag vocabulary, autocomplete and the tags --stats report
+VOCABULARY_CONFIG = {
+    # 'casefold': 'Marketing' and 'marketing' are one tag, and new tags are
+    #   written with the spelling already most used
+    # 'exact': tags that differ in any way are distinct
+    'normalization': os.getenv('DRIVELABELS_TAG_NORMALIZATION', 'casefold'),
+    'suggestions': 10,  # Completions offered for a prefix
+    'top': 20           # Most used tags listed by tags --stats
+}
+
+# Local cache directory for indexes and other persistent state
+CACHE_DIR = os.getenv(
+    'DRIVELABELS_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'drivelabels')
+)
+
+# Local tag index configuration, one index per folder set
+_INDEX_KEY = (
+    FOLDER_IDS[0] if len(FOLDER_IDS) == 1
+    else hashlib.sha1(','.join(sorted(FOLDER_IDS)).encode()).hexdigest()[:16]
+)
+INDEX_CONFIG = {
+    'path': os.path.join(CACHE_DIR, f'tag_index_{_INDEX_KEY}.sqlite3'),
+    'max_age': 86400,  # Seconds before a full rescan replaces incremental sync
+    # Shared drive whose changes feed keeps the index current, for folders
+    # that live in one; unset follows the user's own feed, which also covers
+    # the shared drives the user is a member of
+    'drive_id': os.getenv('DRIVELABELS_SHARED_DRIVE_ID')
+}
+
+# In-memory response cache for listings; tag edits always read files from Drive
+RESPONSE_CACHE_CONFIG = {
+    'enabled': os.getenv('DRIVELABELS_RESPONSE_CACHE', '1') == '1',
+    'ttl': 60.0,            # Seconds a cached response is served without asking Drive
+    'max_entries': 256      # Cached listing pages, LRU-evicted
+}
+
+# Local daemon keeping services, index and caches warm between invocations
+DAEMON_CONFIG = {
+    # Unix socket path, or host:port for a localhost TCP socket (the default
+    # where Unix sockets are unavailable)
+    'address': os.getenv(
+        'DRIVELABELS_DAEMON_ADDRESS',
+        os.path.join(CACHE_DIR, 'daemon.sock') if hasattr(socket, 'AF_UNIX') else '127.0.0.1:47613'
+    ),
+    # Secret a TCP client must send, as Unix sockets are restricted by file mode instead
+    'token_path': os.path.join(CACHE_DIR, 'daemon.token'),
+    'sync_interval': 10.0,   # Seconds between changes-feed syncs of the index
+    'max_concurrency': 16,   # Requests handled at once across all clients
+    'cached_replies': 64,    # Encoded list/search replies kept until the index changes
+    'timeout': 300.0         # Seconds a client waits for a reply
+}
+
+# Write-behind queue configuration
+WRITE_BEHIND_CONFIG = {
+    'enabled': os.getenv('DRIVELABELS_WRITE_BEHIND', '0') == '1',
+    'path': os.path.join(CACHE_DIR, 'write_journal.sqlite3'),
+    'max_pending': 500,     # Flush early once this many mutations are queued
+    'flush_interval': 5.0,  # Seconds between periodic flushes
+    'max_attempts': 5       # Failed flushes before a file's queued changes are dropped
+}
+
 # Table display configuration
 TABLE_CONFIG = {
     'id_width': 44,  # Google Drive IDs are 44 characters long
     'name_width': 30,
     'type_width': 30,
-    'labels_width': 20
+    'labels_width': 20,
+    'page_size': 50  # Rows rendered per table page and shown per pager screen
+}
+
+# API call instrumentation
+METRICS_CONFIG = {
+    'window': 60.0,  # Seconds covered by the recent-calls gauge (the quota window)
+    # Where main.py writes a metrics export on exit, JSON if it ends in '.json'
+    'export_path': os.getenv('DRIVELABELS_METRICS_PATH')
 }
 
-# Logging configuration
+# Logging configuration: JSON lines written from a background thread.
+# DEBUG additionally logs every API call with its latency and sizes.
 LOG_FILE = 'drivelabels.log'
-LOG_LEVEL = logging.INFO
-
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=LOG_LEVEL,
-    format='%(asctime)s %(levelname)s %(name)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-) 
\ No newline at end of file
+LOG_LEVEL = getattr(logging, os.getenv('DRIVELABELS_LOG_LEVEL', 'INFO').upper(), logging.INFO)
+
+configure_logging(LOG_FILE, LOG_LEVEL) 
\ No newline at end of file
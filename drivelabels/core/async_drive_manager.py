@@ -0,0 +1,240 @@
+"""
+Asyncio front-end for DriveManager with bounded concurrency.
+
+The Google API client is blocking and its httplib2 transport is not
+thread-safe, so requests run on a pool of worker threads. Each worker owns
+one Drive service (and therefore one keep-alive connection), built by the
+service factory on first use, and a semaphore caps how many requests are
+in flight. All workers share one rate limiter. Bulk tag changes are sent
+as batch requests, one chunk of files per worker.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, AsyncIterator, Callable, Optional
+
+from drivelabels.config.settings import ASYNC_CONFIG, BATCH_CONFIG, RESPONSE_CACHE_CONFIG
+from drivelabels.core.drive_manager import DriveManager
+from drivelabels.core.models import FileRecord
+from drivelabels.core.response_cache import ResponseCache
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.utils.rate_limit import RateLimiter, get_rate_limiter
+
+class AsyncDriveManager:
+    """Coroutine versions of the DriveManager operations."""
+
+    def __init__(
+        self,
+        service_factory: Callable[[], object],
+        max_concurrency: int = ASYNC_CONFIG['max_concurrency'],
+        rate_limiter: Optional[RateLimiter] = None,
+        tag_backend: Optional[PropertiesBackend] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
+        """
+        Initialize the async manager.
+
+        Args:
+            service_factory (Callable): Returns a new Drive service; called once per
+                worker thread, e.g. SessionPool(creds).service
+            max_concurrency (int): Maximum number of requests in flight
+            rate_limiter (RateLimiter): Limiter shared by all workers, defaults to the
+                process-wide one
+            tag_backend (PropertiesBackend): Tag storage backend shared by all workers,
+                defaults to the one named by TAG_CONFIG['backend']
+            response_cache (ResponseCache): Response cache shared by all workers, so
+                identical concurrent requests are sent once; defaults to a new
+                one unless RESPONSE_CACHE_CONFIG disables it
+        """
+        self.service_factory = service_factory
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.tag_backend = tag_backend
+        self.response_cache = response_cache or (ResponseCache() if RESPONSE_CACHE_CONFIG['enabled'] else None)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='drive-async')
+        self._local = threading.local()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'AsyncDriveManager':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Wait for in-flight requests and shut the worker pool down."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def list_files(self) -> List[FileRecord]:
+        """
+        List all files in the specified folder.
+
+        Returns:
+            List[FileRecord]: List of file records.
+        """
+        return await self._run(lambda manager: manager.list_files())
+
+    async def iter_files(self, query: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Stream every file matching a query, one page at a time.
+
+        The listing runs on a dedicated thread with a DriveManager of its own,
+        whose next page is prefetched on another client from the service
+        factory. Each page request counts towards max_concurrency.
+
+        Args:
+            query (str): Drive query string, defaults to the configured folder
+
+        Yields:
+            Dict: File metadata dictionary.
+
+        Raises:
+            HttpError: If any page request fails.
+        """
+        # A page generator must stay on one thread and one client, and so must
+        # the prefetch thread it starts, so each listing gets a worker of its own
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='drive-async-listing')
+        try:
+            pages = await loop.run_in_executor(
+                executor, lambda: self._new_manager(self.service_factory).iter_pages(query)
+            )
+            try:
+                while True:
+                    async with self._slots():
+                        page = await loop.run_in_executor(executor, next, pages, None)
+                    if page is None:
+                        return
+                    for file in page:
+                        yield file
+            finally:
+                await loop.run_in_executor(executor, pages.close)
+        finally:
+            executor.shutdown(wait=False)
+
+    async def search_by_tag(self, tag_name: str) -> List[FileRecord]:
+        """
+        Search for files with a specific tag.
+
+        Args:
+            tag_name (str): The name of the tag to search for
+
+        Returns:
+            List[FileRecord]: List of file records
+        """
+        return await self._run(lambda manager: manager.search_by_tag(tag_name))
+
+    async def add_tag(self, file_id: str, tag_name: str) -> bool:
+        """
+        Add a tag to a file.
+
+        Args:
+            file_id (str): The ID of the file to tag
+            tag_name (str): The name of the tag to add
+
+        Returns:
+            bool: True if tag was added successfully, False otherwise
+        """
+        return await self._run(lambda manager: manager.add_tag(file_id, tag_name))
+
+    async def remove_tag(self, file_id: str, tag_name: str) -> bool:
+        """
+        Remove a tag from a file.
+
+        Args:
+            file_id (str): The ID of the file to remove the tag from
+            tag_name (str): The name of the tag to remove
+
+        Returns:
+            bool: True if tag was removed successfully, False otherwise
+        """
+        return await self._run(lambda manager: manager.remove_tag(file_id, tag_name))
+
+    async def add_tag_bulk(self, file_ids: Iterable[str], tags: List[str]) -> Dict[str, Dict]:
+        """
+        Add tags to many files, in concurrent batches of BATCH_CONFIG['size'] files.
+
+        Args:
+            file_ids (Iterable[str]): IDs of the files to tag
+            tags (List[str]): Tags to add to every file
+
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        return await self.apply_tag_changes({file_id: {'add': tags} for file_id in file_ids})
+
+    async def remove_tag_bulk(
+        self, file_ids: Iterable[str], tags: List[str], all_spellings: bool = False
+    ) -> Dict[str, Dict]:
+        """
+        Remove tags from many files, in concurrent batches of BATCH_CONFIG['size'] files.
+
+        Args:
+            file_ids (Iterable[str]): IDs of the files to untag
+            tags (List[str]): Tags to remove from every file
+            all_spellings (bool): Also remove the spellings the normalization
+                policy treats as the same tag, not only the exact one
+
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        operation = 'remove_spellings' if all_spellings else 'remove'
+        return await self.apply_tag_changes({file_id: {operation: tags} for file_id in file_ids})
+
+    async def apply_tag_changes(self, changes: Dict[str, Dict[str, List[str]]]) -> Dict[str, Dict]:
+        """
+        Apply per-file tag changes in concurrent batches.
+
+        Files are split into chunks of BATCH_CONFIG['size'], and each chunk is
+        applied by one worker with DriveManager.apply_tag_changes: a batch
+        of gets and a batch of updates, instead of two requests per file.
+
+        Args:
+            changes (Dict[str, Dict[str, List[str]]]): Maps file IDs to a dict
+                with optional 'add', 'remove' and 'remove_spellings' tag lists,
+                as DriveManager.apply_tag_changes takes
+
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        items = list(changes.items())
+        size = BATCH_CONFIG['size']
+        chunks = [dict(items[start:start + size]) for start in range(0, len(items), size)]
+        results: Dict[str, Dict] = {}
+        for chunk_results in await asyncio.gather(*(
+            self._run(lambda manager, chunk=chunk: manager.apply_tag_changes(chunk)) for chunk in chunks
+        )):
+            results.update(chunk_results)
+        return {file_id: results[file_id] for file_id in changes}
+
+    async def _run(self, operation: Callable[[DriveManager], object]):
+        async with self._slots():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: operation(self._worker_manager())
+            )
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            # Created lazily so it binds to the loop the manager is used from
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _worker_manager(self) -> DriveManager:
+        manager = getattr(self._local, 'manager', None)
+        if manager is None:
+            manager = self._local.manager = self._new_manager()
+        return manager
+
+    def _new_manager(self, service_factory: Optional[Callable[[], object]] = None) -> DriveManager:
+        return DriveManager(
+            self.service_factory(),
+            None,
+            rate_limiter=self.rate_limiter,
+            service_factory=service_factory,
+            tag_backend=self.tag_backend,
+            response_cache=self.response_cache,
+            cache_responses=self.response_cache is not None
+        )
@@ -0,0 +1,107 @@
+"""
+Batched execution of Drive API requests.
+"""
+import logging
+import time
+from typing import Dict, Callable, Tuple, Optional
+
+from googleapiclient.errors import HttpError
+
+from drivelabels.core.status import STATUS_FAILED, STATUS_UNCHANGED, STATUS_UPDATED
+from drivelabels.utils.metrics import BATCH_METHOD, error_status, method_name, track_sizes
+from drivelabels.utils.rate_limit import RateLimiter, get_rate_limiter, is_retryable
+
+logger = logging.getLogger(__name__)
+
+# Drive rejects batches with more than 100 sub-requests
+MAX_BATCH_SIZE = 100
+
+def execute_batched(
+    drive_service,
+    requests: Dict[str, Callable],
+    batch_size: int = MAX_BATCH_SIZE,
+    retries: int = 3,
+    limiter: Optional[RateLimiter] = None
+) -> Tuple[Dict[str, Dict], Dict[str, HttpError]]:
+    """
+    Execute many independent requests through batch HTTP calls.
+
+    Every sub-request takes a token from the rate limiter. Sub-requests that
+    fail with a retryable error are collected and sent again in a new batch
+    after an exponential backoff, up to `retries` times.
+
+    Args:
+        drive_service: Google Drive API service instance
+        requests (Dict[str, Callable]): Request factories keyed by a unique ID;
+            each factory returns a fresh HttpRequest
+        batch_size (int): Sub-requests per batch, at most MAX_BATCH_SIZE
+        retries (int): Retry rounds for retryable failures
+        limiter (RateLimiter): Limiter to use, defaults to the shared one
+
+    Returns:
+        Tuple[Dict[str, Dict], Dict[str, HttpError]]: Responses and final errors, keyed by ID.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    limiter = limiter or get_rate_limiter()
+    responses: Dict[str, Dict] = {}
+    errors: Dict[str, HttpError] = {}
+    pending = list(requests)
+
+    for attempt in range(retries + 1):
+        retry = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            chunk_errors: Dict[str, HttpError] = {}
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    responses[request_id] = response
+                else:
+                    chunk_errors[request_id] = exception
+
+            batch = drive_service.new_batch_http_request(callback=callback)
+            tracked = {}
+            for request_id in chunk:
+                request = requests[request_id]()
+                tracked[request_id] = (method_name(request), track_sizes(request))
+                batch.add(request, request_id=request_id)
+            limiter.acquire(len(chunk))
+            started = time.perf_counter()
+            envelope_status = None
+            try:
+                batch.execute()
+            except HttpError as error:
+                # The batch envelope itself failed; every sub-request is unresolved
+                chunk_errors = {request_id: error for request_id in chunk if request_id not in responses}
+                envelope_status = error_status(error)
+            _record(limiter, tracked, chunk_errors, time.perf_counter() - started, envelope_status)
+
+            if any(error.resp.status in (403, 429) and is_retryable(error) for error in chunk_errors.values()):
+                limiter.on_throttle()
+            else:
+                limiter.on_success()
+
+            for request_id, error in chunk_errors.items():
+                if attempt < retries and is_retryable(error):
+                    retry.append(request_id)
+                    limiter.metrics.retry(tracked[request_id][0])
+                else:
+                    errors[request_id] = error
+
+        if not retry:
+            break
+        delay = limiter.backoff(attempt)
+        logger.warning(f"Retrying {len(retry)} failed sub-requests in {delay:.1f}s.")
+        time.sleep(delay)
+        pending = retry
+
+    return responses, errors
+
+def _record(limiter: RateLimiter, tracked: Dict[str, Tuple[str, list]], errors: Dict[str, HttpError],
+            seconds: float, envelope_status: Optional[int]):
+    # One round trip for the batch, and one call per sub-request sharing its latency
+    metrics = limiter.metrics
+    metrics.observe(BATCH_METHOD, seconds, envelope_status)
+    for request_id, (method, sizes) in tracked.items():
+        error = errors.get(request_id)
+        metrics.observe(method, seconds, error_status(error) if error is not None else None, sizes[0], sizes[1])
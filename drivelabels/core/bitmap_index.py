@@ -0,0 +1,171 @@
+"""
+In-memory bitmap index for boolean tag queries.
+
+Every file gets a dense position and every tag a Python big-int bitset
+with one bit per position, so AND / OR / NOT over whole folders are single
+integer operations. A query term matches every spelling the tag
+normalization policy treats as the same tag.
+"""
+from typing import Dict, List, Iterable, Iterator, Optional, Set
+
+from drivelabels.config.settings import VOCABULARY_CONFIG
+from drivelabels.core.models import FileRecord, TAGS
+from drivelabels.core.query import parse_query
+from drivelabels.core.tag_vocabulary import normalize_tag
+
+class BitmapIndex:
+    """Per-tag bitsets over a dense file index."""
+
+    def __init__(
+        self, records: Iterable[FileRecord] = (), normalization: str = VOCABULARY_CONFIG['normalization']
+    ):
+        """
+        Build the index.
+
+        Args:
+            records (Iterable[FileRecord]): Files to index
+            normalization (str): Policy deciding which spellings a query term matches
+        """
+        self.normalization = normalization
+        self._records: List[Optional[FileRecord]] = []
+        self._positions: Dict[str, int] = {}
+        self._bitmaps: Dict[int, int] = {}
+        # Normalized key -> IDs of the spellings seen for it
+        self._spellings: Dict[str, Set[int]] = {}
+        self._all = 0
+        for record in records:
+            self.upsert(record)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def upsert(self, record: FileRecord):
+        """
+        Add a file, or replace the tags of one already indexed.
+
+        Args:
+            record (FileRecord): The file record
+        """
+        position = self._positions.get(record.id)
+        if position is None:
+            position = len(self._records)
+            self._positions[record.id] = position
+            self._records.append(record)
+        else:
+            self._clear(position)
+            self._records[position] = record
+        bit = 1 << position
+        self._all |= bit
+        for tag_id in record.tag_ids:
+            if tag_id not in self._bitmaps:
+                self._spellings.setdefault(normalize_tag(TAGS.name(tag_id), self.normalization), set()).add(tag_id)
+            self._bitmaps[tag_id] = self._bitmaps.get(tag_id, 0) | bit
+
+    def remove(self, file_id: str):
+        """
+        Drop a file from the index; its position is left empty.
+
+        Args:
+            file_id (str): The ID of the file
+        """
+        position = self._positions.pop(file_id, None)
+        if position is not None:
+            self._clear(position)
+            self._records[position] = None
+            self._all &= ~(1 << position)
+
+    def bitmap(self, tag_name: str) -> int:
+        """
+        Bitset of the files carrying a tag in any of its spellings.
+
+        Args:
+            tag_name (str): The tag name
+
+        Returns:
+            int: Bitset with one bit per file position.
+        """
+        result = 0
+        for tag_id in self._spellings.get(normalize_tag(tag_name, self.normalization), ()):
+            result |= self._bitmaps[tag_id]
+        return result
+
+    def evaluate(self, node: tuple) -> int:
+        """
+        Evaluate a parsed query tree to a bitset.
+
+        Args:
+            node (tuple): Tree returned by parse_query
+
+        Returns:
+            int: Bitset of the matching file positions.
+        """
+        kind = node[0]
+        if kind == 'tag':
+            return self.bitmap(node[1])
+        if kind == 'not':
+            return self._all & ~self.evaluate(node[1])
+        if kind == 'and':
+            # Stop as soon as the intersection is empty
+            result = self._all
+            for child in node[1:]:
+                result &= self.evaluate(child)
+                if not result:
+                    break
+            return result
+        result = 0
+        for child in node[1:]:
+            result |= self.evaluate(child)
+        return result
+
+    def count(self, expr: str) -> int:
+        """
+        Count the files matching a query without materializing them.
+
+        Args:
+            expr (str): Query text
+
+        Returns:
+            int: Number of matches.
+        """
+        return self.evaluate(parse_query(expr)).bit_count()
+
+    def query(self, expr: str) -> Iterator[FileRecord]:
+        """
+        Lazily yield the files matching a query.
+
+        Args:
+            expr (str): Query text, e.g. 'contract AND 2025 AND NOT archived'
+
+        Yields:
+            FileRecord: Matching files in index order.
+
+        Raises:
+            QuerySyntaxError: If the query is malformed.
+        """
+        return self.iter_bitmap(self.evaluate(parse_query(expr)))
+
+    def iter_bitmap(self, bitmap: int) -> Iterator[FileRecord]:
+        """
+        Lazily yield the files whose positions are set in a bitset.
+
+        Args:
+            bitmap (int): Bitset of file positions
+
+        Yields:
+            FileRecord: Files in index order, skipping any removed meanwhile.
+        """
+        # One O(n) conversion, then a byte scan that skips empty regions
+        data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+        for offset, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                record = self._records[offset * 8 + low.bit_length() - 1]
+                if record is not None:
+                    yield record
+                byte ^= low
+
+    def _clear(self, position: int):
+        record = self._records[position]
+        mask = ~(1 << position)
+        for tag_id in record.tag_ids:
+            self._bitmaps[tag_id] &= mask
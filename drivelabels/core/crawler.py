@@ -0,0 +1,143 @@
+"""
+Parallel breadth-first crawl of a Drive folder tree.
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, Iterator, Callable, Optional, Set
+
+from drivelabels.core.drive_query import ALL_DRIVES_LIST_PARAMS, NOT_TRASHED
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.utils.rate_limit import RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+SHORTCUT_MIME_TYPE = 'application/vnd.google-apps.shortcut'
+CRAWL_FIELDS = (
+    "nextPageToken, "
+    "files(id, name, mimeType, {tag_fields}, parents, shortcutDetails(targetId, targetMimeType))"
+)
+
+class FolderCrawler:
+    """Lists a folder hierarchy breadth-first on a pool of worker threads."""
+
+    def __init__(
+        self,
+        service_factory: Callable[[], object],
+        max_workers: int = 8,
+        max_depth: Optional[int] = None,
+        follow_shortcuts: bool = True,
+        page_size: int = 1000,
+        rate_limiter: Optional[RateLimiter] = None,
+        tag_backend: Optional[PropertiesBackend] = None
+    ):
+        """
+        Initialize the crawler.
+
+        Args:
+            service_factory (Callable): Returns a new Drive service; called once per
+                worker thread because httplib2 connections are not thread-safe
+            max_workers (int): Folder pages fetched in parallel
+            max_depth (int): Deepest level to descend to (root folders are depth 0),
+                or None for no limit
+            follow_shortcuts (bool): Descend into folders reached through shortcuts
+            page_size (int): Page size for each folder listing
+            rate_limiter (RateLimiter): Limiter shared by all workers, defaults to the
+                process-wide one
+            tag_backend (PropertiesBackend): Tag storage backend whose fields are
+                requested and which normalizes every file, defaults to properties
+        """
+        self.service_factory = service_factory
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.follow_shortcuts = follow_shortcuts
+        self.page_size = page_size
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.tag_backend = tag_backend or PropertiesBackend()
+        self._local = threading.local()
+
+    def crawl(self, root_ids: Iterable[str], shortcut_targets: Optional[Set[str]] = None) -> Iterator[Dict]:
+        """
+        Stream every file below the root folders as pages arrive.
+
+        Each folder is visited once, so multi-parent folders and shortcut
+        loops cannot cause cycles. Folders and shortcuts are yielded too,
+        but not the folders shortcuts point to.
+
+        Args:
+            root_ids (Iterable[str]): IDs of the folders to start from
+            shortcut_targets (Set[str]): Filled with the IDs of the folders
+                entered through a shortcut, if given
+
+        Yields:
+            Dict: File metadata dictionary, including 'parents'.
+
+        Raises:
+            HttpError: If a folder listing fails.
+        """
+        visited = set()
+        # (folder_id, depth, page_token) tasks not yet submitted, in BFS order
+        queue = deque()
+        for folder_id in root_ids:
+            if folder_id not in visited:
+                visited.add(folder_id)
+                queue.append((folder_id, 0, None))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='drive-crawl') as executor:
+            running = {}
+            try:
+                while queue or running:
+                    # Keep a bounded number of pages in flight
+                    while queue and len(running) < self.max_workers:
+                        task = queue.popleft()
+                        running[executor.submit(self._fetch, *task)] = task
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        folder_id, depth, _ = running.pop(future)
+                        results = future.result()
+                        if results.get('nextPageToken'):
+                            queue.append((folder_id, depth, results['nextPageToken']))
+
+                        for file in results.get('files', []):
+                            child = self._child_folder(file)
+                            if child and child not in visited and self._may_descend(depth):
+                                visited.add(child)
+                                queue.append((child, depth + 1, None))
+                                if shortcut_targets is not None and child != file['id']:
+                                    shortcut_targets.add(child)
+                            yield file
+            finally:
+                for future in running:
+                    future.cancel()
+
+        logger.info(f"Crawled {len(visited)} folders.")
+
+    def _may_descend(self, depth: int) -> bool:
+        return self.max_depth is None or depth < self.max_depth
+
+    def _child_folder(self, file: Dict) -> Optional[str]:
+        if file.get('mimeType') == FOLDER_MIME_TYPE:
+            return file['id']
+        if self.follow_shortcuts and file.get('mimeType') == SHORTCUT_MIME_TYPE:
+            details = file.get('shortcutDetails') or {}
+            if details.get('targetMimeType') == FOLDER_MIME_TYPE:
+                return details.get('targetId')
+        return None
+
+    def _fetch(self, folder_id: str, depth: int, page_token: Optional[str]) -> Dict:
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+        results = self.rate_limiter.execute(service.files().list(
+            q=f"'{folder_id}' in parents and {NOT_TRASHED}",
+            pageSize=self.page_size,
+            pageToken=page_token,
+            fields=CRAWL_FIELDS.format(tag_fields=self.tag_backend.fields),
+            **ALL_DRIVES_LIST_PARAMS,
+            **self.tag_backend.list_params()
+        ))
+        results['files'] = [self.tag_backend.normalize(file) for file in results.get('files', [])]
+        return results
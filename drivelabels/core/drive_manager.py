@@ -1,47 +1,442 @@
 """
 Core Drive Manager class for handling Google Drive operations.
 """
-from typing import List, Dict
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Callable, Optional, Set, Union
 from googleapiclient.errors import HttpError
 
-from drivelabels.config.settings import FOLDER_ID
+from drivelabels.config.settings import (
+    FOLDER_IDS,
+    LISTING_CONFIG,
+    INDEX_CONFIG,
+    TAG_CONFIG,
+    BATCH_CONFIG,
+    WRITE_BEHIND_CONFIG,
+    CRAWL_CONFIG,
+    RESPONSE_CACHE_CONFIG
+)
+from drivelabels.core.batch import execute_batched, STATUS_UPDATED, STATUS_UNCHANGED, STATUS_FAILED
+from drivelabels.core.bitmap_index import BitmapIndex
+from drivelabels.core.crawler import FolderCrawler
+from drivelabels.core.drive_query import ALL_DRIVES_LIST_PARAMS, ALL_DRIVES_PARAMS, NOT_TRASHED, folder_queries
+from drivelabels.core.models import FileRecord, to_records
+from drivelabels.core.query import parse_query
+from drivelabels.core.response_cache import ResponseCache
+from drivelabels.core.sync import ChangeSync
+from drivelabels.core.tag_backends import BACKEND_PROPERTIES, NO_MATCH, PropertiesBackend, create_tag_backend
+from drivelabels.core.tag_index import TagIndex
+from drivelabels.core.tag_vocabulary import TagVocabulary, edit_tags, normalize_tag
+from drivelabels.core.tags import TagLimitError, parse_tags
+from drivelabels.core.write_queue import WriteBehindQueue, OP_ADD, OP_REMOVE
 from drivelabels.utils.display import display_error
+from drivelabels.utils.rate_limit import RateLimiter, get_rate_limiter
+
+FILE_FIELDS = "nextPageToken, files(id, name, mimeType, {tag_fields})"
+
+# Index metadata key recording which backend filled the index
+BACKEND_META_KEY = 'tag_backend'
+
+logger = logging.getLogger(__name__)
 
 class DriveManager:
     """Manages Google Drive operations including file listing and tag management."""
     
-    def __init__(self, drive_service, labels_service):
+    def __init__(
+        self,
+        drive_service,
+        labels_service,
+        tag_index: Optional[TagIndex] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        service_factory: Optional[Callable[[], object]] = None,
+        folder_ids: Optional[Iterable[str]] = None,
+        tag_backend: Optional[PropertiesBackend] = None,
+        response_cache: Optional[ResponseCache] = None,
+        cache_responses: bool = RESPONSE_CACHE_CONFIG['enabled'],
+        sync_interval: float = 0.0
+    ):
         """
         Initialize the Drive Manager.
         
         Args:
             drive_service: Google Drive API service instance
-            labels_service: Google Drive Labels API service instance (kept for future use)
+            labels_service: Google Drive Labels API service instance, used by the
+                native labels tag backend
+            tag_index (TagIndex): Optional local file/tag model kept current through
+                the changes feed and used to answer listings and tag searches
+            rate_limiter (RateLimiter): Limiter applied to every request, defaults
+                to the process-wide one so concurrent managers share a budget
+            service_factory (Callable): Builds an extra Drive service per worker thread
+                for parallel crawls and page prefetching; without it crawls run
+                on drive_service alone and listings are not prefetched
+            folder_ids (Iterable[str]): Folders to manage, defaults to FOLDER_IDS
+            tag_backend (PropertiesBackend): Where tags are stored, defaults to the
+                backend named by TAG_CONFIG['backend']
+            response_cache (ResponseCache): Short-lived cache of listing pages,
+                defaults to a new one
+            cache_responses (bool): Use a response cache at all; bulk jobs that
+                touch every file once turn it off so memory stays flat
+            sync_interval (float): Seconds after an index sync during which
+                listings and searches skip the changes feed
         """
         self.drive_service = drive_service
         self.labels_service = labels_service
+        self.tag_index = tag_index
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.service_factory = service_factory
+        self.folder_ids = list(dict.fromkeys(folder_ids or FOLDER_IDS))
+        self.tag_backend = tag_backend or create_tag_backend(TAG_CONFIG['backend'], labels_service)
+        self.file_fields = FILE_FIELDS.format(tag_fields=self.tag_backend.fields)
+        self.response_cache = (response_cache or ResponseCache()) if cache_responses else None
+        self.change_sync = (
+            ChangeSync(
+                drive_service,
+                tag_index,
+                self.folder_ids,
+                LISTING_CONFIG['page_size'],
+                self.rate_limiter,
+                LISTING_CONFIG['recursive'],
+                self.tag_backend,
+                sync_interval,
+                INDEX_CONFIG['drive_id']
+            )
+            if tag_index is not None else None
+        )
+        self.write_queue: Optional[WriteBehindQueue] = None
+        self._bitmap: Optional[BitmapIndex] = None
+        self._bitmap_version = -1
+        # Without a tag index, the vocabulary comes from a folder scan
+        self._vocabulary: Optional[TagVocabulary] = None
+
+    def _execute(self, request) -> Dict:
+        # Every Drive request goes through the shared rate limiter
+        return self.rate_limiter.execute(request)
+
+    def enable_write_behind(self, path: Optional[str] = None) -> WriteBehindQueue:
+        """
+        Queue tag edits in a local journal and flush them in the background.
+
+        add_tag and remove_tag then return as soon as the edit is journaled,
+        and edits to the same file are coalesced into one update per flush.
+        Flushes run on a Drive service from the service factory, as the
+        background worker must not share drive_service with the caller.
+
+        Args:
+            path (str): Journal path, defaults to WRITE_BEHIND_CONFIG['path']
+
+        Returns:
+            WriteBehindQueue: The started queue.
+
+        Raises:
+            ValueError: If the manager has no service factory.
+        """
+        if self.service_factory is None:
+            raise ValueError("Write-behind needs a service_factory to flush on a Drive service of its own.")
+        if self.write_queue is None:
+            self.write_queue = WriteBehindQueue(
+                path or WRITE_BEHIND_CONFIG['path'],
+                lambda changes: self.apply_tag_changes(changes, drive_service=self.service_factory()),
+                WRITE_BEHIND_CONFIG['max_pending'],
+                WRITE_BEHIND_CONFIG['flush_interval'],
+                WRITE_BEHIND_CONFIG['max_attempts']
+            )
+            self.write_queue.start()
+        return self.write_queue
+
+    def close(self):
+        """Flush queued tag edits and release local resources."""
+        if self.write_queue is not None:
+            self.write_queue.stop()
+            self.write_queue = None
+        if self.tag_index is not None:
+            self.tag_index.close()
     
-    def list_files(self) -> List[Dict]:
+    def folder_queries(self, extra: Optional[str] = None) -> List[str]:
+        """
+        Queries covering every untrashed file in the managed folders, packed
+        into as few OR clauses as fit.
+
+        Args:
+            extra (str): Clause ANDed to every query, e.g. a tag filter
+
+        Returns:
+            List[str]: Drive query strings.
+        """
+        extra = f"{NOT_TRASHED} and {extra}" if extra else NOT_TRASHED
+        return folder_queries(self.folder_ids, extra, LISTING_CONFIG['max_query_length'])
+
+    def iter_pages(
+        self,
+        query: Optional[Union[str, List[str]]] = None,
+        fields: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Iterator[List[Dict]]:
+        """
+        Walk every page of one or more files().list queries.
+
+        While the caller handles page N, page N+1 is already being fetched on
+        a single background thread with its own Drive service from the
+        service factory, so at most two pages are held in memory. Without a
+        service factory the pages are fetched one after the other.
+        When several queries are walked, files matched by more than one of
+        them (e.g. files in several folders) are only returned once. Pages
+        are served from the response cache while it holds them.
+
+        Args:
+            query (str or List[str]): Drive query string or strings, defaults to
+                the managed folders
+            fields (str): Partial response field mask, must include nextPageToken;
+                defaults to the basic fields plus those of the tag backend
+            use_cache (bool): Read and fill the response cache; pass False when
+                the listing must reflect Drive as it is now
+
+        Yields:
+            List[Dict]: One page of normalized file metadata dictionaries,
+            which callers must not modify.
+
+        Raises:
+            HttpError: If any page request fails.
+        """
+        if query is None:
+            queries = self.folder_queries()
+        elif isinstance(query, str):
+            queries = [query]
+        else:
+            queries = list(query)
+        fields = fields or self.file_fields
+
+        if len(queries) == 1:
+            yield from self._iter_query_pages(queries[0], fields, use_cache)
+            return
+
+        seen = set()
+        for single_query in queries:
+            for page in self._iter_query_pages(single_query, fields, use_cache):
+                page = [file for file in page if file['id'] not in seen]
+                seen.update(file['id'] for file in page)
+                yield page
+
+    def _iter_query_pages(self, query: str, fields: str, use_cache: bool = True) -> Iterator[List[Dict]]:
+        list_params = self.tag_backend.list_params()
+        # Every page of one listing shares a group so a write drops them together
+        group = (query, fields, tuple(sorted(list_params.items())), LISTING_CONFIG['page_size'])
+
+        def load(service, page_token: Optional[str]) -> Dict:
+            results = self._execute(service.files().list(
+                q=query,
+                pageSize=LISTING_CONFIG['page_size'],
+                pageToken=page_token,
+                fields=fields,
+                **ALL_DRIVES_LIST_PARAMS,
+                **list_params
+            ))
+            results['files'] = [self.tag_backend.normalize(file) for file in results.get('files', [])]
+            return results
+
+        def fetch(service_factory: Callable[[], object], page_token: Optional[str]) -> Dict:
+            if not use_cache or self.response_cache is None:
+                return load(service_factory(), page_token)
+            return self.response_cache.get_or_load(
+                ('list',) + group + (page_token,), lambda: load(service_factory(), page_token), group, query
+            )
+
+        # The caller may use drive_service between pages, e.g. to tag a listed
+        # file, and httplib2 clients are not thread-safe, so pages are only
+        # prefetched when the background thread can get a client of its own
+        if not LISTING_CONFIG['prefetch'] or self.service_factory is None:
+            page_token = None
+            while True:
+                results = fetch(lambda: self.drive_service, page_token)
+                page_token = results.get('nextPageToken')
+                yield results.get('files', [])
+                if not page_token:
+                    return
+
+        prefetch_services = []
+
+        def prefetch_service():
+            # Built on the prefetch thread on first use, then reused for every page
+            if not prefetch_services:
+                prefetch_services.append(self.service_factory())
+            return prefetch_services[0]
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='drive-prefetch') as executor:
+            future = executor.submit(fetch, prefetch_service, None)
+            try:
+                while future is not None:
+                    results = future.result()
+                    page_token = results.get('nextPageToken')
+                    future = executor.submit(fetch, prefetch_service, page_token) if page_token else None
+                    yield results.get('files', [])
+            finally:
+                # Don't start a page nobody will read if the caller stops early
+                if future is not None:
+                    future.cancel()
+
+    def iter_files(
+        self,
+        query: Optional[Union[str, List[str]]] = None,
+        fields: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Iterator[Dict]:
+        """
+        Stream every file matching a query, following all pages.
+
+        Without a query, the managed folders are listed, including their
+        whole subtrees when LISTING_CONFIG['recursive'] is set.
+
+        Args:
+            query (str or List[str]): Drive query string or strings, defaults to
+                the managed folders
+            fields (str): Partial response field mask, must include nextPageToken;
+                defaults to the basic fields plus those of the tag backend
+            use_cache (bool): Read and fill the response cache; recursive
+                crawls always list Drive directly
+
+        Yields:
+            Dict: Normalized file metadata dictionary.
+
+        Raises:
+            HttpError: If any page request fails.
+        """
+        if query is None and LISTING_CONFIG['recursive']:
+            yield from self.crawl(self.folder_ids)
+            return
+
+        for page in self.iter_pages(query, fields, use_cache):
+            yield from page
+
+    def crawl(
+        self,
+        root_ids: Iterable[str],
+        max_depth: Optional[int] = CRAWL_CONFIG['max_depth'],
+        shortcut_targets: Optional[Set[str]] = None
+    ) -> Iterator[Dict]:
+        """
+        Stream every file in the folder trees below root_ids.
+
+        Folders are listed breadth-first in parallel when a service factory
+        was given, with one Drive client per worker thread.
+
+        Args:
+            root_ids (Iterable[str]): IDs of the folders to start from
+            max_depth (int): Deepest subfolder level to descend to, None for unlimited
+            shortcut_targets (Set[str]): Filled with the IDs of the folders
+                entered through a shortcut, if given
+
+        Yields:
+            Dict: File metadata dictionary.
+
+        Raises:
+            HttpError: If a folder listing fails.
+        """
+        if self.service_factory is not None:
+            service_factory, max_workers = self.service_factory, CRAWL_CONFIG['max_workers']
+        else:
+            service_factory, max_workers = (lambda: self.drive_service), 1
+        crawler = FolderCrawler(
+            service_factory,
+            max_workers,
+            max_depth,
+            CRAWL_CONFIG['follow_shortcuts'],
+            LISTING_CONFIG['page_size'],
+            self.rate_limiter,
+            self.tag_backend
+        )
+        yield from crawler.crawl(root_ids, shortcut_targets)
+
+    def list_files(self) -> List[FileRecord]:
         """
         List all files in the specified folder.
+
+        With a tag index attached, the index is brought up to date through
+        the changes feed and served locally instead of relisting the folder.
         
         Returns:
-            List[Dict]: List of file metadata dictionaries.
+            List[FileRecord]: List of file records.
         """
         try:
-            results = self.drive_service.files().list(
-                q=f"'{FOLDER_ID}' in parents",
-                pageSize=100,
-                fields="nextPageToken, files(id, name, mimeType, properties)"
-            ).execute()
-            return results.get('files', [])
+            if self.tag_index is not None:
+                self.sync()
+                return to_records(self.tag_index.all_files())
+            return to_records(self.iter_files())
         except HttpError as error:
             display_error(f"An error occurred: {error}")
             return []
 
+    def iter_records(self) -> Iterator[FileRecord]:
+        """
+        Stream all files in the specified folder as records.
+
+        Unlike list_files, records are produced page by page as the listing
+        arrives, so callers can start rendering before it completes.
+
+        Yields:
+            FileRecord: File records; iteration stops early if a request fails.
+        """
+        try:
+            if self.tag_index is not None:
+                self.sync()
+                files = self.tag_index.all_files()
+            else:
+                files = self.iter_files()
+            for file in files:
+                yield FileRecord.from_api(file)
+        except HttpError as error:
+            display_error(f"An error occurred: {error}")
+
+    def sync(self, force: bool = False) -> int:
+        """
+        Apply pending Drive changes to the tag index.
+
+        A full rescan runs instead when no changes cursor is stored yet, the
+        last one is older than INDEX_CONFIG['max_age'] or the index was
+        filled through a different tag backend.
+
+        Args:
+            force (bool): Read the changes feed even within sync_interval of the last sync
+
+        Returns:
+            int: Number of changes applied, or files indexed on a full rescan.
+
+        Raises:
+            HttpError: If the changes feed or the fallback listing fails.
+        """
+        backend = self.tag_index.get_meta(BACKEND_META_KEY) or BACKEND_PROPERTIES
+        if backend != self.tag_backend.name or not self.tag_index.is_fresh(INDEX_CONFIG['max_age']):
+            return self.refresh_index()
+        return self.change_sync.sync(self._index_listing, force)
+
+    def refresh_index(self) -> int:
+        """
+        Rebuild the local tag index from a full folder listing.
+
+        Returns:
+            int: Number of files indexed.
+
+        Raises:
+            HttpError: If the listing fails; the previous index is kept.
+        """
+        count = self.change_sync.full_sync(self._index_listing)
+        self.tag_index.set_meta(BACKEND_META_KEY, self.tag_backend.name)
+        return count
+
+    def _index_listing(self) -> Iterator[Dict]:
+        # Full listing for an index rebuild, straight from Drive
+        if not LISTING_CONFIG['recursive']:
+            yield from self.iter_files(use_cache=False)
+            return
+        # Files inside folders reached through shortcuts have those folders as
+        # parents, which the index doesn't hold, so the sync must know them
+        shortcut_targets: Set[str] = set()
+        yield from self.crawl(self.folder_ids, shortcut_targets=shortcut_targets)
+        self.change_sync.set_shortcut_targets(shortcut_targets)
+
     def add_tag(self, file_id: str, tag_name: str) -> bool:
         """
-        Add a tag to a file using custom properties.
+        Add a tag to a file through the tag backend.
         
         Args:
             file_id (str): The ID of the file to tag
@@ -50,74 +445,151 @@ class DriveManager:
         Returns:
             bool: True if tag was added successfully, False otherwise
         """
+        vocabulary = self._known_vocabulary()
+        if vocabulary is not None:
+            tag_name = vocabulary.canonical(tag_name)
+        if self.write_queue is not None:
+            self.write_queue.enqueue(file_id, tag_name, OP_ADD)
+            self._invalidate([file_id], [tag_name])
+            self._apply_locally(file_id, add=[tag_name])
+            return True
+
         try:
-            # Get current properties
-            file = self.drive_service.files().get(
-                fileId=file_id,
-                fields='properties'
-            ).execute()
-            
-            # Get existing tags or initialize empty list
-            current_tags = file.get('properties', {}).get('tags', '').split(',')
-            current_tags = [tag.strip() for tag in current_tags if tag.strip()]
-            
-            # Add new tag if not already present
-            if tag_name not in current_tags:
-                current_tags.append(tag_name)
-                
-                # Update file properties
-                self.drive_service.files().update(
-                    fileId=file_id,
-                    body={
-                        'properties': {
-                            'tags': ','.join(current_tags)
-                        }
-                    },
-                    fields='properties'
-                ).execute()
-                
-                return True
-            return False
-                
-        except HttpError as error:
+            return self.modify_tags(file_id, add=[tag_name])
+        except (HttpError, TagLimitError) as error:
             display_error(f"An error occurred: {error}")
             return False
 
-    def search_by_tag(self, tag_name: str) -> List[Dict]:
+    def search_by_tag(self, tag_name: str, refresh: bool = False) -> List[FileRecord]:
         """
         Search for files with a specific tag.
+
+        When a tag index is attached, pending changes are synced and the
+        search is answered locally, matching every spelling the tag
+        normalization policy treats as the same tag. Without an index, the tag is filtered
+        server-side when the backend supports it (native labels or the
+        per-tag property layout), which matches the exact spelling only, and
+        by rescanning the folder for every spelling otherwise.
         
         Args:
             tag_name (str): The name of the tag to search for
+            refresh (bool): Force a rescan even if the index is fresh
             
         Returns:
-            List[Dict]: List of file metadata dictionaries
+            List[FileRecord]: List of file records
         """
         try:
-            # List all files and filter by tag
-            results = self.drive_service.files().list(
-                q=f"'{FOLDER_ID}' in parents",
-                pageSize=100,
-                fields="nextPageToken, files(id, name, mimeType, properties)"
-            ).execute()
-            
-            files = results.get('files', [])
-            tagged_files = []
-            
-            for file in files:
-                properties = file.get('properties', {})
-                tags = properties.get('tags', '').split(',')
-                tags = [tag.strip() for tag in tags if tag.strip()]
-                
-                if tag_name in tags:
-                    tagged_files.append(file)
-            
-            return tagged_files
+            if self.tag_index is not None:
+                if refresh:
+                    self.refresh_index()
+                else:
+                    self.sync()
+                spellings = self.tag_index.vocabulary().spellings(tag_name) or [tag_name]
+                files = {}
+                for spelling in spellings:
+                    for file in self.tag_index.search(spelling):
+                        files.setdefault(file['id'], file)
+                return to_records(files.values())
+
+            clause = self.tag_backend.search_clause(tag_name)
+            if clause == NO_MATCH:
+                return []
+            if clause is not None and not LISTING_CONFIG['recursive']:
+                return to_records(self.iter_files(self.folder_queries(clause), use_cache=not refresh))
+            key = normalize_tag(tag_name)
+            records = (FileRecord.from_api(file) for file in self.iter_files(use_cache=not refresh))
+            return [record for record in records if any(normalize_tag(tag) == key for tag in record.tags)]
             
         except HttpError as error:
             display_error(f"An error occurred: {error}")
             return []
 
+    def query(self, expr: str, refresh: bool = False) -> Iterator[FileRecord]:
+        """
+        Find files matching a boolean tag query.
+
+        Queries combine tags with AND, OR, NOT and parentheses, e.g.
+        'contract AND 2025 AND NOT archived'; each tag matches every spelling
+        the normalization policy treats as the same tag. They are answered
+        from an in-memory bitmap index, which takes in only the files written
+        to the tag index since the last query (and is rebuilt after a full rescan).
+
+        Args:
+            expr (str): The query text
+            refresh (bool): Force a rescan even if the index is fresh
+
+        Returns:
+            Iterator[FileRecord]: Lazily produced matching files.
+
+        Raises:
+            QuerySyntaxError: If the query is malformed.
+        """
+        node = parse_query(expr)
+        try:
+            if self.tag_index is not None:
+                if refresh:
+                    self.refresh_index()
+                else:
+                    self.sync()
+                self._update_bitmap()
+                bitmap = self._bitmap
+            else:
+                bitmap = BitmapIndex(FileRecord.from_api(file) for file in self.iter_files(use_cache=not refresh))
+        except HttpError as error:
+            display_error(f"An error occurred: {error}")
+            return iter(())
+        return bitmap.iter_bitmap(bitmap.evaluate(node))
+
+    def _update_bitmap(self):
+        # Apply the index writes made since the bitmap was built, or build it
+        # anew after a rebuild or more writes than the index remembers
+        version = self.tag_index.version
+        changed = self.tag_index.changed_since(self._bitmap_version) if self._bitmap is not None else None
+        if changed is None:
+            self._bitmap = BitmapIndex(
+                to_records(self.tag_index.all_files()), self.tag_index.vocabulary().normalization
+            )
+        else:
+            for file_id in dict.fromkeys(changed):
+                file = self.tag_index.get_file(file_id)
+                if file is None:
+                    self._bitmap.remove(file_id)
+                else:
+                    self._bitmap.upsert(FileRecord.from_api(file))
+        self._bitmap_version = version
+
+    def tag_vocabulary(self, sync: bool = True, refresh: bool = False) -> TagVocabulary:
+        """
+        Every tag in use with its file count, for autocomplete and statistics.
+
+        With a tag index the vocabulary is the index's own, kept current by
+        every indexed change. Without one it is built from a folder scan on
+        first use and then updated by this manager's tag writes.
+
+        Args:
+            sync (bool): Apply pending Drive changes to the index first; the
+                prompt skips this right after a listing has synced
+            refresh (bool): Rebuild from a full rescan
+
+        Returns:
+            TagVocabulary: The vocabulary, empty if the listing failed.
+        """
+        try:
+            if self.tag_index is not None:
+                if refresh:
+                    self.refresh_index()
+                elif sync:
+                    self.sync()
+                return self.tag_index.vocabulary()
+            if self._vocabulary is None or refresh:
+                vocabulary = TagVocabulary()
+                vocabulary.load(parse_tags(file) for file in self.iter_files(use_cache=not refresh))
+                self._vocabulary = vocabulary
+            return self._vocabulary
+        except HttpError as error:
+            display_error(f"An error occurred: {error}")
+            return self._known_vocabulary() or TagVocabulary()
+
     def remove_tag(self, file_id: str, tag_name: str) -> bool:
         """
         Remove a tag from a file.
@@ -129,35 +601,265 @@ class DriveManager:
         Returns:
             bool: True if tag was removed successfully, False otherwise
         """
+        if self.write_queue is not None:
+            self.write_queue.enqueue(file_id, tag_name, OP_REMOVE)
+            self._invalidate([file_id], [tag_name])
+            self._apply_locally(file_id, remove=[tag_name])
+            return True
+
         try:
-            # Get current properties
-            file = self.drive_service.files().get(
-                fileId=file_id,
-                fields='properties'
-            ).execute()
-            
-            # Get existing tags
-            current_tags = file.get('properties', {}).get('tags', '').split(',')
-            current_tags = [tag.strip() for tag in current_tags if tag.strip()]
+            return self.modify_tags(file_id, remove=[tag_name])
+        except (HttpError, TagLimitError) as error:
+            display_error(f"An error occurred: {error}")
+            return False
+
+    def modify_tags(
+        self, file_id: str, add: List[str] = (), remove: List[str] = (), remove_spellings: List[str] = ()
+    ) -> bool:
+        """
+        Add and remove tags on one file with a read-modify-write.
+        
+        Args:
+            file_id (str): The ID of the file
+            add (List[str]): Tags to add if not already present
+            remove (List[str]): Tags to remove if present in exactly this spelling
+            remove_spellings (List[str]): Tags to remove in every spelling
             
-            # Remove tag if present
-            if tag_name in current_tags:
-                current_tags.remove(tag_name)
-                
-                # Update file properties
-                self.drive_service.files().update(
-                    fileId=file_id,
-                    body={
-                        'properties': {
-                            'tags': ','.join(current_tags) if current_tags else ''
-                        }
-                    },
-                    fields='properties'
-                ).execute()
-                
-                return True
+        Returns:
+            bool: True if the file was updated, False if its tags were already as requested
+
+        Raises:
+            HttpError: If reading or updating the file fails.
+            TagLimitError: If the new tags exceed Drive's property limits.
+        """
+        # Get current tags from Drive, as a cached copy may miss concurrent edits
+        file = self._get_file(file_id)
+        
+        current_tags = parse_tags(file)
+        new_tags = edit_tags(
+            current_tags, add, remove, self._known_vocabulary(), remove_spellings=remove_spellings
+        )
+        if new_tags == current_tags:
             return False
-                
+        
+        # Store the new tag list
+        self.tag_backend.check(file, new_tags)
+        self.tag_backend.prepare(new_tags)
+        response = self._execute(self.tag_backend.update(self.drive_service, file_id, file, new_tags))
+        updated = self.tag_backend.updated_file(file_id, new_tags, response)
+        
+        self._invalidate([file_id], set(current_tags).symmetric_difference(new_tags))
+        self._record_tags(updated, current_tags, new_tags)
+        return True
+
+    def add_tag_bulk(self, file_ids: Iterable[str], tags: List[str]) -> Dict[str, Dict]:
+        """
+        Add tags to many files using batched requests.
+        
+        Args:
+            file_ids (Iterable[str]): IDs of the files to tag
+            tags (List[str]): Tags to add to every file
+            
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        return self.apply_tag_changes({file_id: {'add': tags} for file_id in file_ids})
+
+    def remove_tag_bulk(self, file_ids: Iterable[str], tags: List[str], all_spellings: bool = False) -> Dict[str, Dict]:
+        """
+        Remove tags from many files using batched requests.
+        
+        Args:
+            file_ids (Iterable[str]): IDs of the files to untag
+            tags (List[str]): Tags to remove from every file
+            all_spellings (bool): Also remove the spellings the normalization
+                policy treats as the same tag, not only the exact one
+            
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        operation = 'remove_spellings' if all_spellings else 'remove'
+        return self.apply_tag_changes({file_id: {operation: tags} for file_id in file_ids})
+
+    def apply_tag_changes(
+        self, changes: Dict[str, Dict[str, List[str]]], drive_service=None
+    ) -> Dict[str, Dict]:
+        """
+        Apply per-file tag changes using batched requests.
+        
+        Args:
+            changes (Dict[str, Dict[str, List[str]]]): Maps file IDs to a dict
+                with optional 'add', 'remove' (exact spellings) and
+                'remove_spellings' (every spelling) tag lists, or a 'set'
+                list holding the complete tags the file should carry
+            drive_service: Drive service to send the requests on, defaults to
+                drive_service; callers on another thread pass their own
+            
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        started = time.monotonic()
+        file_ids = list(changes)
+        results: Dict[str, Dict] = {}
+        drive_service = drive_service or self.drive_service
+        files = drive_service.files()
+
+        backend = self.tag_backend
+        list_params = backend.list_params()
+        vocabulary = self._known_vocabulary()
+
+        # Read the current tags of every file from Drive, in batches of gets;
+        # a cached copy may miss concurrent edits, which the write would undo
+        current = {}
+        fetched, errors = execute_batched(
+            drive_service,
+            {file_id: lambda file_id=file_id: files.get(
+                fileId=file_id, fields=backend.fields, **ALL_DRIVES_PARAMS, **list_params
+            ) for file_id in file_ids},
+            BATCH_CONFIG['size'],
+            BATCH_CONFIG['retries'],
+            self.rate_limiter
+        )
+        for file_id, file in fetched.items():
+            current[file_id] = backend.normalize(file)
+        for file_id, error in errors.items():
+            results[file_id] = {'status': STATUS_FAILED, 'error': str(error)}
+
+        # Only files whose tag set actually changes get an update
+        old_tag_lists, new_tag_lists, changed_tags = {}, {}, set()
+        for file_id, file in current.items():
+            old_tags = old_tag_lists[file_id] = parse_tags(file)
+            change = changes[file_id]
+            if 'set' in change:
+                # Restored tags keep their exact spelling; only the set matters
+                new_tags = list(dict.fromkeys(tag for tag in change['set'] if tag))
+                if set(new_tags) == set(old_tags):
+                    new_tags = old_tags
+            else:
+                new_tags = edit_tags(
+                    old_tags, change.get('add', []), change.get('remove', []), vocabulary,
+                    remove_spellings=change.get('remove_spellings', [])
+                )
+            if new_tags == old_tags:
+                results[file_id] = {'status': STATUS_UNCHANGED}
+                continue
+            try:
+                backend.check(file, new_tags)
+            except TagLimitError as error:
+                results[file_id] = {'status': STATUS_FAILED, 'error': str(error)}
+                continue
+            new_tag_lists[file_id] = new_tags
+            changed_tags.update(set(old_tags).symmetric_difference(new_tags))
+
+        updates = {}
+        try:
+            backend.prepare(tag for tags in new_tag_lists.values() for tag in tags)
         except HttpError as error:
-            display_error(f"An error occurred: {error}")
-            return False 
\ No newline at end of file
+            for file_id in new_tag_lists:
+                results[file_id] = {'status': STATUS_FAILED, 'error': str(error)}
+        else:
+            updates = {
+                file_id: lambda file_id=file_id, new_tags=new_tags: backend.update(
+                    drive_service, file_id, current[file_id], new_tags
+                )
+                for file_id, new_tags in new_tag_lists.items()
+            }
+
+        updated, errors = execute_batched(
+            drive_service, updates, BATCH_CONFIG['size'], BATCH_CONFIG['retries'], self.rate_limiter
+        )
+        for file_id, response in updated.items():
+            results[file_id] = {'status': STATUS_UPDATED}
+            updated_file = backend.updated_file(file_id, new_tag_lists[file_id], response)
+            self._record_tags(updated_file, old_tag_lists[file_id], new_tag_lists[file_id])
+        for file_id, error in errors.items():
+            results[file_id] = {'status': STATUS_FAILED, 'error': str(error)}
+        # Failed writes may still have landed, so they are invalidated too
+        self._invalidate(new_tag_lists, changed_tags)
+
+        elapsed = time.monotonic() - started
+        rate = len(file_ids) / elapsed if elapsed > 0 else float(len(file_ids))
+        counts = Counter(result['status'] for result in results.values())
+        logger.info(f"Bulk tag update of {len(file_ids)} files: {dict(counts)} ({rate:.1f} files/s).")
+        return {file_id: results[file_id] for file_id in file_ids}
+
+    def _get_file(self, file_id: str) -> Dict:
+        # Normalized tag fields of one file, read from Drive
+        file = self.tag_backend.normalize(self._execute(self.drive_service.files().get(
+            fileId=file_id,
+            fields=self.tag_backend.fields,
+            **ALL_DRIVES_PARAMS,
+            **self.tag_backend.list_params()
+        )))
+        return dict(file, id=file_id)
+
+    def _known_vocabulary(self) -> Optional[TagVocabulary]:
+        # The vocabulary used to spell new tags, without scanning the folder for one
+        if self.tag_index is not None:
+            return self.tag_index.vocabulary()
+        return self._vocabulary
+
+    def _record_tags(self, file: Dict, old_tags: List[str], new_tags: List[str]):
+        # Index a written file; the index updates its vocabulary itself
+        if self.tag_index is not None:
+            self.tag_index.upsert_file(file)
+        elif self._vocabulary is not None:
+            self._vocabulary.update(old_tags, new_tags)
+
+    def _invalidate(self, file_ids: Iterable[str], tags: Iterable[str]):
+        # Drop cached responses a tag write may have changed
+        if self.response_cache is not None:
+            self.response_cache.invalidate(file_ids, [self.tag_backend.search_clause(tag) for tag in tags])
+
+    def restore_tags(self, snapshot: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """
+        Make files carry exactly the given tags, writing only those that differ.
+
+        With a tag index attached, the index is first synced through the
+        changes feed, and files whose indexed tags then match are reported
+        unchanged without reading them. The others are read live in
+        batches, and only files whose tags really differ are updated.
+
+        Args:
+            snapshot (Dict[str, List[str]]): Maps file IDs to their complete tag lists
+
+        Returns:
+            Dict[str, Dict]: Per-file result with a 'status' of 'updated',
+                'unchanged' or 'failed', plus an 'error' message on failure
+        """
+        results: Dict[str, Dict] = {}
+        changes = {}
+        tag_index = self.tag_index
+        if tag_index is not None:
+            # Edits made elsewhere since the last sync must not be mistaken for matches
+            try:
+                self.sync(force=True)
+            except HttpError as error:
+                logger.warning(f"Index sync before restoring tags failed, reading every file: {error}")
+                tag_index = None
+        for file_id, tags in snapshot.items():
+            file = tag_index.get_file(file_id) if tag_index is not None else None
+            if file is not None and set(parse_tags(file)) == set(tags):
+                results[file_id] = {'status': STATUS_UNCHANGED}
+            else:
+                changes[file_id] = {'set': tags}
+        if changes:
+            results.update(self.apply_tag_changes(changes))
+        return {file_id: results[file_id] for file_id in snapshot}
+
+    def _apply_locally(self, file_id: str, add: List[str] = (), remove: List[str] = ()):
+        # Reflect a queued edit in the index so searches see it before the flush
+        if self.tag_index is None:
+            return
+        file = self.tag_index.get_file(file_id)
+        if file is None:
+            return
+        tags = edit_tags(parse_tags(file), add, remove, self.tag_index.vocabulary())
+        try:
+            self.tag_index.upsert_file(self.tag_backend.with_tags(file, tags))
+        except TagLimitError:
+            # The flush fails and reports it; the index keeps what Drive holds
+            pass
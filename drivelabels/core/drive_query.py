@@ -0,0 +1,54 @@
+"""
+Builders for Drive files().list query strings and request parameters.
+"""
+from typing import List, Iterable, Optional
+
+from drivelabels.core.tags import escape_query_value
+
+# Clause keeping trashed files out of every listing
+NOT_TRASHED = 'trashed = false'
+
+# Parameters that make files() and changes() requests reach shared drives too
+ALL_DRIVES_PARAMS = {'supportsAllDrives': True}
+ALL_DRIVES_LIST_PARAMS = {'supportsAllDrives': True, 'includeItemsFromAllDrives': True}
+
+def parents_clause(folder_ids: Iterable[str]) -> str:
+    """
+    Query clause matching files whose parent is any of the folders.
+
+    Args:
+        folder_ids (Iterable[str]): Folder IDs
+
+    Returns:
+        str: Clause such as "('a' in parents or 'b' in parents)".
+    """
+    terms = [f"'{escape_query_value(folder_id)}' in parents" for folder_id in folder_ids]
+    return terms[0] if len(terms) == 1 else f"({' or '.join(terms)})"
+
+def folder_queries(folder_ids: Iterable[str], extra: Optional[str] = None, max_length: int = 4000) -> List[str]:
+    """
+    Pack folders into as few queries as possible under a length limit.
+
+    Args:
+        folder_ids (Iterable[str]): Folder IDs to cover
+        extra (str): Clause ANDed to every query, e.g. a tag filter
+        max_length (int): Maximum length of one query string
+
+    Returns:
+        List[str]: Queries that together match every file in the folders.
+    """
+    suffix = f" and {extra}" if extra else ''
+    queries = []
+    chunk: List[str] = []
+    length = 0
+    for folder_id in dict.fromkeys(folder_ids):
+        term = len(f"'{escape_query_value(folder_id)}' in parents")
+        # Joined length: terms, ' or ' separators and the surrounding parentheses
+        if chunk and length + len(' or ') + term + 2 + len(suffix) > max_length:
+            queries.append(parents_clause(chunk) + suffix)
+            chunk, length = [], 0
+        length += term + (len(' or ') if chunk else 0)
+        chunk.append(folder_id)
+    if chunk:
+        queries.append(parents_clause(chunk) + suffix)
+    return queries
@@ -0,0 +1,386 @@
+"""
+In-memory catalog of Drive labels resolving names to label, field and choice IDs.
+
+Label schemas change rarely, so every published label is fetched once in
+full and then served from memory. When the catalog is older than its TTL it
+is revalidated with a basic listing, which only carries IDs and revision
+IDs, and only labels whose revision changed are fetched again.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from drivelabels.config.settings import LABELS_CONFIG
+from drivelabels.utils.rate_limit import RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+VIEW_BASIC = 'LABEL_VIEW_BASIC'
+VIEW_FULL = 'LABEL_VIEW_FULL'
+LABEL_TYPE_SHARED = 'SHARED'
+
+class LabelCatalog:
+    """Thread-safe cache of published label schemas."""
+
+    def __init__(
+        self,
+        labels_service,
+        ttl: float = LABELS_CONFIG['catalog_ttl'],
+        miss_interval: float = LABELS_CONFIG['miss_interval'],
+        page_size: int = LABELS_CONFIG['page_size'],
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Initialize an empty catalog; labels are loaded on first lookup.
+
+        Args:
+            labels_service: Google Drive Labels API service instance
+            ttl (float): Seconds a loaded catalog is trusted before revalidation
+            miss_interval (float): Minimum seconds between revalidations caused
+                by IDs the catalog does not know
+            page_size (int): Labels per list page
+            rate_limiter (RateLimiter): Limiter for label requests, defaults to the shared one
+        """
+        self.labels_service = labels_service
+        self.ttl = ttl
+        self.miss_interval = miss_interval
+        self.page_size = page_size
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._labels: Dict[str, Dict] = {}
+        self._by_title: Dict[str, str] = {}
+        # (label ID, field ID) -> {choice name: choice ID} and the reverse
+        self._choice_ids: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._choice_names: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._checked_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._stats = {'loads': 0, 'revalidations': 0, 'fetched': 0}
+
+    def label(self, title: str) -> Optional[Dict]:
+        """
+        Look up a published label by title.
+
+        Args:
+            title (str): Label title
+
+        Returns:
+            Optional[Dict]: Full label resource, or None if there is none.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            label_id = self._by_title.get(title)
+            return self._labels.get(label_id) if label_id else None
+
+    def get_label(self, label_id: str) -> Optional[Dict]:
+        """
+        Look up a published label by ID.
+
+        Args:
+            label_id (str): Label ID
+
+        Returns:
+            Optional[Dict]: Full label resource, or None if unknown.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return self._labels.get(label_id)
+
+    def label_ids(self) -> List[str]:
+        """
+        IDs of every published label, e.g. for a listing's includeLabels.
+
+        Returns:
+            List[str]: Label IDs.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return list(self._labels)
+
+    def field_id(self, label_id: str, display_name: Optional[str] = None) -> Optional[str]:
+        """
+        Find a selection field of a label.
+
+        Args:
+            label_id (str): Label ID
+            display_name (str): Field display name, defaults to the first selection field
+
+        Returns:
+            Optional[str]: Field ID, or None if the label has no such field.
+        """
+        label = self.get_label(label_id)
+        for field in (label or {}).get('fields', []):
+            if 'selectionOptions' not in field:
+                continue
+            if display_name is None or field.get('properties', {}).get('displayName') == display_name:
+                return field['id']
+        return None
+
+    def choice_id(self, label_id: str, field_id: str, name: str) -> Optional[str]:
+        """
+        Resolve a choice display name to its ID.
+
+        Args:
+            label_id (str): Label ID
+            field_id (str): Selection field ID
+            name (str): Choice display name
+
+        Returns:
+            Optional[str]: Choice ID, or None if the field has no such choice.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return self._choice_ids.get((label_id, field_id), {}).get(name)
+
+    def choice_name(self, label_id: str, field_id: str, choice_id: str) -> Optional[str]:
+        """
+        Resolve a choice ID to its display name.
+
+        An unknown ID usually means the label was changed elsewhere, so the
+        catalog is revalidated, at most once per miss_interval.
+
+        Args:
+            label_id (str): Label ID
+            field_id (str): Selection field ID
+            choice_id (str): Choice ID
+
+        Returns:
+            Optional[str]: Display name, or None if the choice is unknown.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            key = (label_id, field_id)
+            name = self._choice_names.get(key, {}).get(choice_id)
+            if name is None and time.monotonic() - self._checked_at >= self.miss_interval:
+                self.refresh()
+                name = self._choice_names.get(key, {}).get(choice_id)
+            return name
+
+    def choices(self, label_id: str, field_id: str) -> Dict[str, str]:
+        """
+        Every choice of a selection field.
+
+        Args:
+            label_id (str): Label ID
+            field_id (str): Selection field ID
+
+        Returns:
+            Dict[str, str]: Choice IDs keyed by display name.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return dict(self._choice_ids.get((label_id, field_id), {}))
+
+    def create_label(self, title: str, fields: List[Dict]) -> Dict:
+        """
+        Create and publish a shared label, and add it to the catalog.
+
+        Args:
+            title (str): Label title
+            fields (List[Dict]): Field definitions of the new label
+
+        Returns:
+            Dict: The published label resource.
+
+        Raises:
+            HttpError: If creating or publishing fails.
+        """
+        labels = self.labels_service.labels()
+        with self._lock:
+            draft = self.rate_limiter.execute(labels.create(body={
+                'labelType': LABEL_TYPE_SHARED,
+                'properties': {'title': title},
+                'fields': fields
+            }))
+            label = self._publish(draft['name'])
+            logger.info(f"Created label '{title}' ({label['id']}).")
+            return label
+
+    def add_choices(self, label_id: str, field_id: str, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Add choices to a selection field in one revision and publish it.
+
+        Names the catalog lacks are checked again after revalidating it, so
+        choices already added through another catalog are not created twice.
+
+        Args:
+            label_id (str): Label ID
+            field_id (str): Selection field ID
+            names (Iterable[str]): Display names of the new choices
+
+        Returns:
+            Dict[str, str]: IDs of the requested choices keyed by display name.
+
+        Raises:
+            HttpError: If updating or publishing the label fails.
+        """
+        names = list(dict.fromkeys(names))
+        with self._lock:
+            existing = self.choices(label_id, field_id)
+            missing = [name for name in names if name not in existing]
+            if missing:
+                # Another catalog (another daemon worker or sharded job) may
+                # have added them since this one was loaded
+                self.refresh()
+                existing = self.choices(label_id, field_id)
+                missing = [name for name in names if name not in existing]
+            if missing:
+                self.rate_limiter.execute(self.labels_service.labels().delta(
+                    name=f'labels/{label_id}',
+                    body={'requests': [
+                        {'createSelectionChoice': {
+                            'fieldId': field_id,
+                            'choice': {'properties': {'displayName': name}}
+                        }}
+                        for name in missing
+                    ]}
+                ))
+                self._publish(f'labels/{label_id}')
+                logger.info(f"Added {len(missing)} choices to label {label_id}.")
+            ids = self._choice_ids.get((label_id, field_id), {})
+            return {name: ids[name] for name in names if name in ids}
+
+    def refresh(self) -> int:
+        """
+        Bring the catalog up to date.
+
+        The first call loads every label in full. Later calls list labels in
+        the basic view and refetch only those whose revision ID changed.
+
+        Returns:
+            int: Number of labels fetched in full.
+
+        Raises:
+            HttpError: If a label request fails; the cached labels are kept.
+        """
+        with self._lock:
+            if self._checked_at is None:
+                labels = list(self._list(VIEW_FULL))
+                self._clear()
+                for label in labels:
+                    self._index(label)
+                self._stats['loads'] += 1
+                fetched = len(labels)
+            else:
+                revisions = {label['id']: label.get('revisionId') for label in self._list(VIEW_BASIC)}
+                for label_id in set(self._labels).difference(revisions):
+                    self._drop(label_id)
+                changed = [
+                    label_id for label_id, revision in revisions.items()
+                    if label_id not in self._labels or self._labels[label_id].get('revisionId') != revision
+                ]
+                for label_id in changed:
+                    self._index(self.rate_limiter.execute(self.labels_service.labels().get(
+                        name=f'labels/{label_id}@published',
+                        view=VIEW_FULL
+                    )))
+                self._stats['revalidations'] += 1
+                fetched = len(changed)
+            self._stats['fetched'] += fetched
+            self._checked_at = time.monotonic()
+        if fetched:
+            logger.info(f"Label catalog fetched {fetched} labels.")
+        return fetched
+
+    def invalidate(self):
+        """Revalidate the catalog on the next lookup."""
+        with self._lock:
+            if self._checked_at is not None:
+                self._checked_at = float('-inf')
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Catalog counters.
+
+        Returns:
+            Dict[str, int]: 'loads', 'revalidations', labels 'fetched' in
+            full and the number of cached 'labels'.
+        """
+        with self._lock:
+            return dict(self._stats, labels=len(self._labels))
+
+    def _ensure_fresh(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at > self.ttl:
+            self.refresh()
+
+    def _list(self, view: str) -> Iterator[Dict]:
+        page_token = None
+        while True:
+            results = self.rate_limiter.execute(self.labels_service.labels().list(
+                publishedOnly=True,
+                view=view,
+                pageSize=self.page_size,
+                pageToken=page_token
+            ))
+            yield from results.get('labels', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def _publish(self, name: str) -> Dict:
+        self.rate_limiter.execute(self.labels_service.labels().publish(name=name, body={}))
+        label = self.rate_limiter.execute(self.labels_service.labels().get(
+            name=f'{name}@published',
+            view=VIEW_FULL
+        ))
+        self._index(label)
+        return label
+
+    def _index(self, label: Dict):
+        label_id = label['id']
+        self._drop(label_id)
+        self._labels[label_id] = label
+        title = label.get('properties', {}).get('title')
+        if title:
+            self._by_title.setdefault(title, label_id)
+        for field in label.get('fields', []):
+            ids, names = {}, {}
+            for choice in field.get('selectionOptions', {}).get('choices', []):
+                name = choice.get('properties', {}).get('displayName')
+                if name:
+                    ids.setdefault(name, choice['id'])
+                    names[choice['id']] = name
+            if ids:
+                self._choice_ids[(label_id, field['id'])] = ids
+                self._choice_names[(label_id, field['id'])] = names
+
+    def _drop(self, label_id: str):
+        label = self._labels.pop(label_id, None)
+        if label is None:
+            return
+        title = label.get('properties', {}).get('title')
+        if self._by_title.get(title) == label_id:
+            del self._by_title[title]
+        for key in [key for key in self._choice_ids if key[0] == label_id]:
+            del self._choice_ids[key]
+            del self._choice_names[key]
+
+    def _clear(self):
+        self._labels.clear()
+        self._by_title.clear()
+        self._choice_ids.clear()
+        self._choice_names.clear()
+
+_default_catalog: Optional[LabelCatalog] = None
+_default_lock = threading.Lock()
+
+def get_label_catalog(labels_service=None) -> LabelCatalog:
+    """
+    Return the process-wide label catalog.
+
+    Args:
+        labels_service: Labels API service used to create the catalog on
+            first call; later calls may omit it
+
+    Returns:
+        LabelCatalog: The shared catalog.
+
+    Raises:
+        ValueError: If the catalog does not exist yet and no service was given.
+    """
+    global _default_catalog
+    with _default_lock:
+        if _default_catalog is None:
+            if labels_service is None:
+                raise ValueError("A Drive Labels service is required to load the label catalog.")
+            _default_catalog = LabelCatalog(labels_service)
+        return _default_catalog
@@ -0,0 +1,113 @@
+"""
+Bulk migration of file tags between storage layouts.
+
+Usage:
+    python -m drivelabels.core.migration [--layout per_tag|joined] [--dry-run]
+
+Run with DRIVELABELS_TAG_LAYOUT=migrating while the migration is in
+progress, then switch to per_tag once it reports no remaining files.
+"""
+import argparse
+import logging
+from typing import Dict
+
+from drivelabels.config.settings import BATCH_CONFIG
+from drivelabels.core.batch import execute_batched
+from drivelabels.core.drive_query import ALL_DRIVES_PARAMS
+from drivelabels.core.tags import (
+    LAYOUT_JOINED,
+    LAYOUT_PER_TAG,
+    TAGS_PROPERTY,
+    TAG_KEY_PREFIX,
+    TagLimitError,
+    parse_tags,
+    tag_properties
+)
+
+logger = logging.getLogger(__name__)
+
+def _needs_migration(file: Dict, layout: str) -> bool:
+    properties = file.get('properties') or {}
+    if layout == LAYOUT_JOINED:
+        return any(key.startswith(TAG_KEY_PREFIX) for key in properties)
+    return TAGS_PROPERTY in properties
+
+def migrate_tag_layout(manager, layout: str = LAYOUT_PER_TAG, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Rewrite every file in the folder so its tags use the target layout.
+
+    Each listing page is rewritten through batched updates. Files already in
+    the target layout are left untouched, so the migration can be
+    interrupted and re-run safely.
+
+    Args:
+        manager (DriveManager): Manager whose folder is migrated
+        layout (str): Target layout, LAYOUT_PER_TAG or LAYOUT_JOINED
+        dry_run (bool): Only count the files that would be rewritten
+
+    Returns:
+        Dict[str, int]: Counts of 'scanned', 'migrated', 'skipped' and 'failed' files.
+    """
+    counts = {'scanned': 0, 'migrated': 0, 'skipped': 0, 'failed': 0}
+    files = manager.drive_service.files()
+
+    for page in manager.iter_pages(use_cache=False):
+        counts['scanned'] += len(page)
+        pending = [file for file in page if _needs_migration(file, layout)]
+        counts['skipped'] += len(page) - len(pending)
+        if dry_run:
+            counts['migrated'] += len(pending)
+            continue
+
+        patches = {}
+        for file in pending:
+            try:
+                patches[file['id']] = tag_properties(file, parse_tags(file), layout)
+            except TagLimitError as error:
+                counts['failed'] += 1
+                logger.error(f"Cannot migrate tags of file '{file['id']}': {error}")
+
+        updated, errors = execute_batched(
+            manager.drive_service,
+            {file_id: lambda file_id=file_id, patch=patch: files.update(
+                fileId=file_id,
+                body={'properties': patch},
+                fields='id, name, mimeType, properties',
+                **ALL_DRIVES_PARAMS
+            ) for file_id, patch in patches.items()},
+            BATCH_CONFIG['size'],
+            BATCH_CONFIG['retries'],
+            manager.rate_limiter
+        )
+        counts['migrated'] += len(updated)
+        counts['failed'] += len(errors)
+        for file_id, error in errors.items():
+            logger.error(f"Failed to migrate tags of file '{file_id}': {error}")
+        if manager.tag_index is not None:
+            for file in updated.values():
+                manager.tag_index.upsert_file(file)
+
+    logger.info(f"Tag layout migration to '{layout}' finished: {counts}")
+    return counts
+
+def main():
+    """Command-line entry point for the layout migration."""
+    from drivelabels.core.drive_manager import DriveManager
+    from drivelabels.utils.auth import get_credentials, get_services
+    from drivelabels.utils.display import display_success, display_warning
+
+    parser = argparse.ArgumentParser(description="Migrate Drive file tags between storage layouts.")
+    parser.add_argument('--layout', choices=[LAYOUT_PER_TAG, LAYOUT_JOINED], default=LAYOUT_PER_TAG)
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would change")
+    args = parser.parse_args()
+
+    drive_service, labels_service = get_services(get_credentials())
+    counts = migrate_tag_layout(DriveManager(drive_service, labels_service), args.layout, args.dry_run)
+
+    verb = "Would migrate" if args.dry_run else "Migrated"
+    display_success(f"{verb} {counts['migrated']} of {counts['scanned']} files to the '{args.layout}' layout.")
+    if counts['failed']:
+        display_warning(f"{counts['failed']} files failed; re-run the migration to retry them.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Compact in-memory file model.
+
+API responses are converted to FileRecord objects once at ingest: the tag
+string is parsed a single time and each tag is stored as a small integer ID
+from a shared TagTable, so large working sets cost a fraction of the memory
+of the raw response dictionaries.
+"""
+import sys
+import threading
+from typing import List, Dict, Tuple, Iterable, Optional
+
+from drivelabels.core.tags import parse_tags
+
+class TagTable:
+    """Thread-safe interning table mapping tag names to dense integer IDs."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, tag_name: str) -> int:
+        """
+        Return the ID of a tag, assigning the next free ID on first sight.
+
+        Args:
+            tag_name (str): The tag name
+
+        Returns:
+            int: The tag ID.
+        """
+        tag_id = self._ids.get(tag_name)
+        if tag_id is None:
+            with self._lock:
+                tag_id = self._ids.get(tag_name)
+                if tag_id is None:
+                    tag_id = len(self._names)
+                    self._names.append(sys.intern(tag_name))
+                    self._ids[self._names[tag_id]] = tag_id
+        return tag_id
+
+    def lookup(self, tag_name: str) -> Optional[int]:
+        """
+        Return the ID of a known tag without assigning one.
+
+        Args:
+            tag_name (str): The tag name
+
+        Returns:
+            Optional[int]: The tag ID, or None if the tag was never interned.
+        """
+        return self._ids.get(tag_name)
+
+    def name(self, tag_id: int) -> str:
+        """
+        Return the name of a tag ID.
+
+        Args:
+            tag_id (int): The tag ID
+
+        Returns:
+            str: The tag name.
+        """
+        return self._names[tag_id]
+
+# Process-wide table shared by every record
+TAGS = TagTable()
+
+class FileRecord:
+    """A Drive file reduced to the fields the application uses."""
+
+    __slots__ = ('id', 'name', 'mime_type', 'tag_ids')
+
+    def __init__(self, id: str, name: str, mime_type: str, tag_ids: Tuple[int, ...] = ()):
+        """
+        Initialize a record.
+
+        Args:
+            id (str): Drive file ID
+            name (str): File name
+            mime_type (str): MIME type
+            tag_ids (Tuple[int, ...]): Interned tag IDs in stored order
+        """
+        self.id = id
+        self.name = name
+        self.mime_type = mime_type
+        self.tag_ids = tag_ids
+
+    @classmethod
+    def from_api(cls, file: Dict) -> 'FileRecord':
+        """
+        Build a record from a files().list/get response item.
+
+        Args:
+            file (Dict): File metadata dictionary
+
+        Returns:
+            FileRecord: The record.
+        """
+        return cls(
+            file['id'],
+            file.get('name', ''),
+            sys.intern(file.get('mimeType', '')),
+            tuple(TAGS.intern(tag) for tag in parse_tags(file))
+        )
+
+    @property
+    def tags(self) -> List[str]:
+        """Tag names in stored order."""
+        return [TAGS.name(tag_id) for tag_id in self.tag_ids]
+
+    def has_tag(self, tag_name: str) -> bool:
+        """
+        Check whether the file carries a tag.
+
+        Args:
+            tag_name (str): The tag name
+
+        Returns:
+            bool: True if tagged.
+        """
+        tag_id = TAGS.lookup(tag_name)
+        return tag_id is not None and tag_id in self.tag_ids
+
+    def to_dict(self) -> Dict:
+        """
+        Plain dictionary form, e.g. for JSON output.
+
+        Returns:
+            Dict: 'id', 'name', 'mimeType' and 'tags'.
+        """
+        return {'id': self.id, 'name': self.name, 'mimeType': self.mime_type, 'tags': self.tags}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FileRecord):
+            return NotImplemented
+        return (
+            self.id == other.id and self.name == other.name
+            and self.mime_type == other.mime_type and self.tag_ids == other.tag_ids
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"FileRecord(id={self.id!r}, name={self.name!r}, tags={self.tags!r})"
+
+def to_records(files: Iterable[Dict]) -> List[FileRecord]:
+    """
+    Convert API file dictionaries to records.
+
+    Args:
+        files (Iterable[Dict]): File metadata dictionaries
+
+    Returns:
+        List[FileRecord]: Records in the same order.
+    """
+    return [FileRecord.from_api(file) for file in files]
@@ -0,0 +1,143 @@
+"""
+Boolean tag query language.
+
+Grammar (keywords are upper case, tags may be double-quoted):
+
+    expr     := and_expr ('OR' and_expr)*
+    and_expr := not_expr (['AND'] not_expr)*
+    not_expr := 'NOT' not_expr | '(' expr ')' | TAG
+
+Example: contract AND 2025 AND NOT archived
+
+Queries parse to nested tuples: ('tag', name), ('not', node),
+('and', node, node, ...) and ('or', node, node, ...).
+"""
+import re
+from typing import List, Tuple
+
+KEYWORDS = ('AND', 'OR', 'NOT')
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+class QuerySyntaxError(ValueError):
+    """Raised when a tag query cannot be parsed."""
+
+def tokenize(expr: str) -> List[Tuple[str, str]]:
+    """
+    Split a query into (kind, value) tokens.
+
+    Args:
+        expr (str): The query text
+
+    Returns:
+        List[Tuple[str, str]]: Tokens of kind '(', ')', 'AND', 'OR', 'NOT' or 'TAG'.
+
+    Raises:
+        QuerySyntaxError: On an unterminated quote.
+    """
+    tokens = []
+    position = 0
+    expr = expr.rstrip()
+    while position < len(expr):
+        match = TOKEN_PATTERN.match(expr, position)
+        if match is None or match.end() == position:
+            raise QuerySyntaxError(f"Unexpected character at position {position}: {expr[position:]!r}")
+        opening, closing, quoted, word = match.groups()
+        if opening:
+            tokens.append(('(', opening))
+        elif closing:
+            tokens.append((')', closing))
+        elif quoted is not None:
+            tokens.append(('TAG', re.sub(r'\\(.)', r'\1', quoted)))
+        elif word in KEYWORDS:
+            tokens.append((word, word))
+        else:
+            tokens.append(('TAG', word))
+        position = match.end()
+    return tokens
+
+def is_boolean_query(expr: str) -> bool:
+    """
+    Check whether input uses query syntax rather than naming a single tag.
+
+    Plain input such as 'needs review' is a tag name, spaces included.
+
+    Args:
+        expr (str): The user input
+
+    Returns:
+        bool: True if the input contains keywords, parentheses or quotes.
+
+    Raises:
+        QuerySyntaxError: On an unterminated quote.
+    """
+    tokens = tokenize(expr)
+    return any(kind != 'TAG' for kind, _ in tokens) or '"' in expr
+
+def parse_query(expr: str) -> tuple:
+    """
+    Parse a boolean tag query.
+
+    Args:
+        expr (str): The query text, e.g. 'contract AND NOT archived'
+
+    Returns:
+        tuple: The query tree.
+
+    Raises:
+        QuerySyntaxError: If the query is empty or malformed.
+    """
+    tokens = tokenize(expr)
+    if not tokens:
+        raise QuerySyntaxError("Empty query")
+    parser = _Parser(tokens)
+    node = parser.parse_or()
+    if parser.position != len(tokens):
+        raise QuerySyntaxError(f"Unexpected {tokens[parser.position][1]!r}")
+    return node
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else ''
+
+    def take(self) -> Tuple[str, str]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse_or(self) -> tuple:
+        nodes = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', *nodes)
+
+    def parse_and(self) -> tuple:
+        nodes = [self.parse_not()]
+        while self.peek() in ('AND', 'NOT', 'TAG', '('):
+            if self.peek() == 'AND':
+                self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', *nodes)
+
+    def parse_not(self) -> tuple:
+        kind = self.peek()
+        if kind == 'NOT':
+            self.take()
+            return ('not', self.parse_not())
+        if kind == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QuerySyntaxError("Missing closing parenthesis")
+            self.take()
+            return node
+        if kind == 'TAG':
+            return ('tag', self.take()[1])
+        if not kind:
+            raise QuerySyntaxError("Query ends unexpectedly")
+        raise QuerySyntaxError(f"Unexpected {self.take()[1]!r}")
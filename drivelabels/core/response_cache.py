@@ -0,0 +1,181 @@
+"""
+Short-lived in-memory cache of Drive responses.
+
+Listing pages are cached for a few seconds under a key made of the query,
+the field mask and the request parameters, so repeated listings within an
+interactive session are served from memory. Identical requests issued
+concurrently share one API call (single-flight). Tag writes invalidate
+exactly the responses that can have changed: those containing the written
+file and those filtered on one of its changed tags. Tag writes themselves
+always read the file from Drive, never from this cache.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from drivelabels.config.settings import RESPONSE_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'group', 'query', 'file_ids')
+
+    def __init__(self, value: Dict, expires: float, group: Hashable, query: str, file_ids: frozenset):
+        self.value = value
+        self.expires = expires
+        self.group = group
+        self.query = query
+        self.file_ids = file_ids
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+class ResponseCache:
+    """Thread-safe TTL and LRU cache of API responses with single-flight loading."""
+
+    def __init__(
+        self,
+        ttl: float = RESPONSE_CACHE_CONFIG['ttl'],
+        max_entries: int = RESPONSE_CACHE_CONFIG['max_entries'],
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            ttl (float): Seconds a response is served from memory
+            max_entries (int): Responses kept, least recently used evicted first
+            clock (Callable): Monotonic time source
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'shared': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Dict],
+        group: Optional[Hashable] = None,
+        query: str = ''
+    ) -> Dict:
+        """
+        Return a cached response, or load it once for all concurrent callers.
+
+        Responses are files().list pages (a dict with 'files') or single
+        files (a dict with 'id'); the IDs of the files they contain are
+        kept for precise invalidation.
+
+        Args:
+            key (Hashable): Cache key, e.g. built from query, field mask and page
+            loader (Callable): Performs the request on a miss
+            group (Hashable): Entries invalidated together, e.g. every page of
+                one listing, defaults to the key itself
+            query (str): Drive query of the request, matched against the
+                clauses passed to invalidate()
+
+        Returns:
+            Dict: The response. Callers must not modify it.
+
+        Raises:
+            Exception: Whatever the loader raised; failures are not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > self.clock():
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry.value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+        except BaseException as error:
+            flight.error = error
+            raise
+        else:
+            flight.value = value
+            self._store(key, value, key if group is None else group, query)
+            return value
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def invalidate(self, file_ids: Iterable[str], clauses: Iterable[Optional[str]] = ()) -> int:
+        """
+        Drop every response a tag write to some files may have changed.
+
+        A listing is dropped as a whole when one of its pages contains a
+        written file or its query contains one of the clauses, typically the
+        search clauses of the tags that were added or removed.
+
+        Args:
+            file_ids (Iterable[str]): IDs of the written files
+            clauses (Iterable[str]): Query clauses whose results may have changed
+
+        Returns:
+            int: Number of responses dropped.
+        """
+        file_ids = set(file_ids)
+        clauses = [clause for clause in clauses if clause]
+        with self._lock:
+            groups = {
+                entry.group for entry in self._entries.values()
+                if not entry.file_ids.isdisjoint(file_ids)
+                or any(clause in entry.query for clause in clauses)
+            }
+            doomed = [key for key, entry in self._entries.items() if entry.group in groups]
+            for key in doomed:
+                del self._entries[key]
+            self._stats['invalidations'] += len(doomed)
+        return len(doomed)
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Cache counters.
+
+        Returns:
+            Dict[str, int]: 'hits', 'misses', requests 'shared' with an
+            in-flight load, LRU 'evictions', 'invalidations' and the current
+            number of 'entries'.
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    def _store(self, key: Hashable, value: Dict, group: Hashable, query: str):
+        files: List[Dict] = value.get('files', []) if 'files' in value else ([value] if 'id' in value else [])
+        expires = self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = _Entry(value, expires, group, query, frozenset(file['id'] for file in files))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
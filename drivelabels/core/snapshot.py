@@ -0,0 +1,120 @@
+"""
+Streaming snapshots of tag assignments for audit and restore.
+
+A snapshot holds one row per file with its ID, name and tags, as JSON lines
+(`{"id": ..., "name": ..., "tags": [...]}`) or CSV (`id,name,tag,tag,...`
+after an `id,name,tags` header). Rows are written as the listing pages
+arrive and read back one at a time, so neither direction holds more than
+a page of files in memory.
+"""
+import csv
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from drivelabels.core.tags import parse_tags
+
+logger = logging.getLogger(__name__)
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+FORMATS = (FORMAT_JSONL, FORMAT_CSV)
+
+CSV_HEADER = ('id', 'name', 'tags')
+
+def detect_format(path: Optional[str], default: str = FORMAT_JSONL) -> str:
+    """
+    Guess a snapshot format from a file name.
+
+    Args:
+        path (str): File path, or None/'-' for a standard stream
+        default (str): Format used when the extension says nothing
+
+    Returns:
+        str: One of FORMATS.
+    """
+    if path and path.lower().endswith('.csv'):
+        return FORMAT_CSV
+    return default
+
+def export_tags(files: Iterable[Dict], stream: TextIO, fmt: str = FORMAT_JSONL, tagged_only: bool = False) -> int:
+    """
+    Write one snapshot row per file as the files are produced.
+
+    Args:
+        files (Iterable[Dict]): File metadata dictionaries, e.g. a streaming listing
+        stream (TextIO): Where to write the snapshot
+        fmt (str): One of FORMATS
+        tagged_only (bool): Skip files without tags
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format '{fmt}', expected one of {', '.join(FORMATS)}.")
+    writer = csv.writer(stream, lineterminator='\n') if fmt == FORMAT_CSV else None
+    if writer is not None:
+        writer.writerow(CSV_HEADER)
+
+    rows = 0
+    for file in files:
+        tags = parse_tags(file)
+        if tagged_only and not tags:
+            continue
+        if writer is not None:
+            writer.writerow([file['id'], file.get('name', '')] + tags)
+        else:
+            stream.write(json.dumps({'id': file['id'], 'name': file.get('name', ''), 'tags': tags}, ensure_ascii=False))
+            stream.write('\n')
+        rows += 1
+    logger.info(f"Exported tags of {rows} files.")
+    return rows
+
+def read_snapshot(lines: Iterable[str], fmt: str = FORMAT_JSONL) -> Iterator[Tuple[int, Optional[str], List[str]]]:
+    """
+    Stream the rows of a snapshot.
+
+    Blank lines are skipped, as is the CSV header row. An empty tag list is
+    a valid row: restoring it removes every tag from the file.
+
+    Args:
+        lines (Iterable[str]): Snapshot lines
+        fmt (str): One of FORMATS
+
+    Yields:
+        Tuple[int, Optional[str], List[str]]: Line number, file ID (None if
+        the row is malformed) and the tags the file should carry.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format '{fmt}', expected one of {', '.join(FORMATS)}.")
+    if fmt == FORMAT_CSV:
+        # The csv reader follows quoted names across line breaks
+        reader = csv.reader(lines)
+        for cells in reader:
+            if not any(cell.strip() for cell in cells):
+                continue
+            if reader.line_num == 1 and tuple(cells[:3]) == CSV_HEADER:
+                continue
+            yield reader.line_num, cells[0].strip() or None, _clean(cells[2:])
+        return
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            file_id, tags = str(row.get('id') or '').strip(), row.get('tags') or []
+        except (ValueError, AttributeError):
+            yield number, None, []
+            continue
+        yield number, file_id or None, _clean(tags if isinstance(tags, list) else [tags])
+
+def _clean(tags: Iterable) -> List[str]:
+    tags = (str(tag).strip() for tag in tags)
+    return list(dict.fromkeys(tag for tag in tags if tag))
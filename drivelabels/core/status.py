@@ -0,0 +1,9 @@
+"""
+Per-file outcomes reported by bulk tag operations.
+
+Kept free of Google client imports so that thin callers such as
+drivelabels.client can use them.
+"""
+STATUS_UPDATED = 'updated'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_FAILED = 'failed'
@@ -0,0 +1,209 @@
+"""
+Incremental synchronization of the local tag index through the Drive changes feed.
+"""
+import json
+import logging
+import time
+from typing import Dict, Callable, Iterable, Optional, Set
+
+from googleapiclient.errors import HttpError
+
+from drivelabels.core.drive_query import ALL_DRIVES_LIST_PARAMS, ALL_DRIVES_PARAMS
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.core.tag_index import TagIndex
+from drivelabels.utils.rate_limit import RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    "changes(fileId, removed, file(id, name, mimeType, parents, trashed, {tag_fields}))"
+)
+
+# Cursor errors that mean the stored page token can no longer be replayed
+EXPIRED_CURSOR_STATUSES = (400, 404, 410)
+
+class ChangeSync:
+    """Keeps a TagIndex current by replaying changes.list deltas."""
+
+    CURSOR_KEY = 'changes_cursor'
+    SYNCED_AT_KEY = 'synced_at'
+    # Shared drive whose feed the cursor belongs to, '' for the user's feed
+    FEED_KEY = 'changes_drive_id'
+    SHORTCUT_TARGETS_KEY = 'shortcut_targets'
+
+    def __init__(
+        self,
+        drive_service,
+        tag_index: TagIndex,
+        folder_ids: Iterable[str],
+        page_size: int = 1000,
+        rate_limiter: Optional[RateLimiter] = None,
+        recursive: bool = False,
+        tag_backend: Optional[PropertiesBackend] = None,
+        min_interval: float = 0.0,
+        drive_id: Optional[str] = None
+    ):
+        """
+        Initialize the sync engine.
+
+        Args:
+            drive_service: Google Drive API service instance
+            tag_index (TagIndex): Index that holds the local file/tag model
+            folder_ids (Iterable[str]): Only changes for files under these folders are applied
+            page_size (int): Page size used when reading the changes feed
+            rate_limiter (RateLimiter): Limiter for feed requests, defaults to the shared one
+            recursive (bool): Also apply changes for files in any indexed subfolder
+            tag_backend (PropertiesBackend): Tag storage backend whose fields are
+                requested and which normalizes changed files, defaults to properties
+            min_interval (float): Seconds after an incremental sync during which
+                further syncs return at once, e.g. for a long-running daemon
+                that syncs in the background
+            drive_id (str): Shared drive whose changes feed is followed, instead
+                of the user's feed
+        """
+        self.drive_service = drive_service
+        self.tag_index = tag_index
+        self.folder_ids = set(folder_ids)
+        self.page_size = page_size
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.recursive = recursive
+        self.tag_backend = tag_backend or PropertiesBackend()
+        self.min_interval = min_interval
+        self.drive_id = drive_id
+        self._shortcut_targets: Set[str] = set()
+
+    @property
+    def cursor(self):
+        """The stored changes page token, or None before the first full sync."""
+        return self.tag_index.get_meta(self.CURSOR_KEY)
+
+    def set_shortcut_targets(self, folder_ids: Iterable[str]):
+        """
+        Record the folders a recursive listing entered through shortcuts.
+
+        Files in those folders are in scope although the folders themselves
+        are not indexed (their shortcuts are).
+
+        Args:
+            folder_ids (Iterable[str]): IDs of the shortcut target folders
+        """
+        self.tag_index.set_meta(self.SHORTCUT_TARGETS_KEY, json.dumps(sorted(folder_ids)))
+
+    def full_sync(self, list_files: Callable[[], Iterable[Dict]]) -> int:
+        """
+        Rebuild the index from a full listing and start tracking changes.
+
+        The start page token is taken before listing, so edits made while the
+        listing runs are replayed by the next incremental sync.
+
+        Args:
+            list_files (Callable): Returns an iterable over every file in the folder
+
+        Returns:
+            int: Number of files indexed.
+        """
+        start_token = self.rate_limiter.execute(
+            self.drive_service.changes().getStartPageToken(**self._feed_params(ALL_DRIVES_PARAMS))
+        )['startPageToken']
+        count = self.tag_index.rebuild(list_files())
+        self.tag_index.set_meta(self.CURSOR_KEY, start_token)
+        self.tag_index.set_meta(self.FEED_KEY, self.drive_id or '')
+        self.tag_index.set_meta(self.SYNCED_AT_KEY, repr(time.time()))
+        return count
+
+    def sync(self, list_files: Callable[[], Iterable[Dict]], force: bool = False) -> int:
+        """
+        Bring the index up to date, incrementally when a cursor is stored.
+
+        Args:
+            list_files (Callable): Fallback full listing used when no usable cursor exists
+            force (bool): Read the changes feed even within min_interval of the last sync
+
+        Returns:
+            int: Number of changes applied, or files indexed on a full sync.
+        """
+        cursor = self.cursor
+        if cursor is None or self.tag_index.refreshed_at is None:
+            return self.full_sync(list_files)
+        if (self.tag_index.get_meta(self.FEED_KEY) or '') != (self.drive_id or ''):
+            # The cursor belongs to another drive's feed
+            logger.info("Changes feed changed, running full sync.")
+            return self.full_sync(list_files)
+        if self.min_interval and not force:
+            synced_at = self.tag_index.get_meta(self.SYNCED_AT_KEY)
+            if synced_at is not None and time.time() - float(synced_at) < self.min_interval:
+                return 0
+
+        try:
+            return self._apply_changes(cursor)
+        except HttpError as error:
+            if error.resp.status not in EXPIRED_CURSOR_STATUSES:
+                raise
+            logger.warning(f"Changes cursor rejected ({error.resp.status}), running full sync.")
+            return self.full_sync(list_files)
+
+    def _feed_params(self, params: Dict) -> Dict:
+        # Shared drive parameters, plus the drive to follow if one is set
+        return dict(params, driveId=self.drive_id) if self.drive_id else dict(params)
+
+    def _apply_changes(self, cursor: str) -> int:
+        applied = 0
+        page_token = cursor
+        targets = self.tag_index.get_meta(self.SHORTCUT_TARGETS_KEY) if self.recursive else None
+        self._shortcut_targets = set(json.loads(targets)) if targets else set()
+        while page_token:
+            results = self.rate_limiter.execute(self.drive_service.changes().list(
+                pageToken=page_token,
+                pageSize=self.page_size,
+                spaces='drive',
+                fields=CHANGE_FIELDS.format(tag_fields=self.tag_backend.fields),
+                **self._feed_params(ALL_DRIVES_LIST_PARAMS),
+                **self.tag_backend.list_params()
+            ))
+
+            for change in results.get('changes', []):
+                if self._apply(change):
+                    applied += 1
+
+            if 'newStartPageToken' in results:
+                # Persist the cursor only once the whole delta has been applied
+                self.tag_index.set_meta(self.CURSOR_KEY, results['newStartPageToken'])
+                break
+            page_token = results.get('nextPageToken')
+
+        self.tag_index.set_meta(self.SYNCED_AT_KEY, repr(time.time()))
+        if applied:
+            logger.info(f"Applied {applied} changes to the tag index.")
+        return applied
+
+    def _apply(self, change: Dict) -> bool:
+        file_id = change.get('fileId')
+        file = change.get('file')
+        if not file_id:
+            return False
+
+        in_folder = (
+            file is not None
+            and not change.get('removed')
+            and not file.get('trashed')
+            and self._in_scope(file.get('parents', []))
+        )
+        if in_folder:
+            self.tag_index.upsert_file(self.tag_backend.normalize(file))
+            return True
+
+        # Deleted, trashed or moved out of the folder
+        if self.tag_index.get_file(file_id) is not None:
+            self.tag_index.remove_file(file_id)
+            return True
+        return False
+
+    def _in_scope(self, parents) -> bool:
+        if not self.folder_ids.isdisjoint(parents):
+            return True
+        # In recursive mode the index holds every crawled folder, so a parent
+        # found there (or entered through a shortcut) is a folder inside the tree
+        return self.recursive and any(
+            parent in self._shortcut_targets or self.tag_index.get_file(parent) is not None for parent in parents
+        )
@@ -0,0 +1,342 @@
+"""
+Pluggable storage of tags on Drive files.
+
+A backend decides which file fields hold the tags, how they are read from
+API responses and how a new tag list is written back:
+
+- properties: tags in custom file properties, in one of the layouts of
+  drivelabels.core.tags (the original storage)
+- labels: tags as choices of one multi-valued selection field of a native
+  Drive label, resolved through the in-memory LabelCatalog
+
+Backends normalize every file they read so that parse_tags works on it,
+which keeps the index, records and queries independent of the storage.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from drivelabels.config.settings import TAG_CONFIG, LABELS_CONFIG
+from drivelabels.core.drive_query import ALL_DRIVES_PARAMS
+from drivelabels.core.label_catalog import LabelCatalog, get_label_catalog
+from drivelabels.core.tags import LAYOUT_PER_TAG, TAGS_KEY, escape_query_value, tag_properties, tag_query
+
+BACKEND_PROPERTIES = 'properties'
+BACKEND_LABELS = 'labels'
+BACKENDS = (BACKEND_PROPERTIES, BACKEND_LABELS)
+
+# search_clause() result for tags no file can carry, e.g. labels without a choice
+NO_MATCH = ''
+
+class PropertiesBackend:
+    """Stores tags in custom file properties."""
+
+    name = BACKEND_PROPERTIES
+    fields = 'properties'
+
+    def __init__(self, layout: str = TAG_CONFIG['layout']):
+        """
+        Initialize the backend.
+
+        Args:
+            layout (str): Property layout written on updates, one of tags.LAYOUTS
+        """
+        self.layout = layout
+
+    def list_params(self) -> Dict:
+        """
+        Extra parameters for files().list, files().get and changes().list.
+
+        Returns:
+            Dict: Keyword arguments, none for properties.
+        """
+        return {}
+
+    def normalize(self, file: Dict) -> Dict:
+        """
+        Make a file from an API response readable by parse_tags.
+
+        Args:
+            file (Dict): File metadata dictionary
+
+        Returns:
+            Dict: The same dictionary; properties are read as they are.
+        """
+        return file
+
+    def prepare(self, tags: Iterable[str]):
+        """
+        Make sure tags can be written; properties need no setup.
+
+        Args:
+            tags (Iterable[str]): Tags about to be written
+        """
+
+    def check(self, file: Dict, tags: List[str]):
+        """
+        Make sure a tag list can be stored on a file, before any request is sent.
+
+        Args:
+            file (Dict): Current normalized file metadata
+            tags (List[str]): Tags the file should carry
+
+        Raises:
+            TagLimitError: If the tags exceed Drive's property limits.
+        """
+        tag_properties(file, tags, self.layout)
+
+    def update(self, drive_service, file_id: str, file: Dict, tags: List[str]):
+        """
+        Build the request that stores a complete tag list on a file.
+
+        Args:
+            drive_service: Google Drive API service instance
+            file_id (str): The ID of the file
+            file (Dict): Current normalized file metadata
+            tags (List[str]): Tags the file should carry
+
+        Returns:
+            HttpRequest: The unexecuted update request.
+
+        Raises:
+            TagLimitError: If the tags exceed Drive's property limits.
+        """
+        return drive_service.files().update(
+            fileId=file_id,
+            body={'properties': tag_properties(file, tags, self.layout)},
+            fields=f'id, name, mimeType, {self.fields}',
+            **ALL_DRIVES_PARAMS
+        )
+
+    def updated_file(self, file_id: str, tags: List[str], response: Dict) -> Dict:
+        """
+        File metadata to index after an update succeeded.
+
+        Args:
+            file_id (str): The ID of the file
+            tags (List[str]): Tags that were written
+            response (Dict): Response of the update request
+
+        Returns:
+            Dict: Normalized file metadata dictionary.
+        """
+        return self.normalize(response)
+
+    def with_tags(self, file: Dict, tags: List[str]) -> Dict:
+        """
+        Local copy of a file carrying a different tag list, without any request.
+
+        Args:
+            file (Dict): Normalized file metadata
+            tags (List[str]): Tags the copy should carry
+
+        Returns:
+            Dict: Updated copy of the file.
+        """
+        properties = dict(file.get('properties') or {})
+        for key, value in tag_properties(file, tags, self.layout).items():
+            if value is None:
+                properties.pop(key, None)
+            else:
+                properties[key] = value
+        return dict(file, properties=properties)
+
+    def search_clause(self, tag_name: str) -> Optional[str]:
+        """
+        Drive query clause matching files that carry a tag.
+
+        Args:
+            tag_name (str): The tag to match
+
+        Returns:
+            Optional[str]: Query clause, None if the tag cannot be filtered
+            server-side and the folder has to be scanned, or NO_MATCH if no
+            file can carry the tag.
+        """
+        return tag_query(tag_name) if self.layout == LAYOUT_PER_TAG else None
+
+class LabelsBackend(PropertiesBackend):
+    """Stores tags as choices of a multi-valued selection field of a Drive label."""
+
+    name = BACKEND_LABELS
+    # Only the applied label IDs and field values; includeLabels limits it to the tag label
+    fields = 'labelInfo(labels(id, fields))'
+
+    def __init__(
+        self,
+        catalog: LabelCatalog,
+        title: str = LABELS_CONFIG['title'],
+        field_name: str = LABELS_CONFIG['field']
+    ):
+        """
+        Initialize the backend.
+
+        Args:
+            catalog (LabelCatalog): Catalog resolving tag names to choice IDs
+            title (str): Title of the label holding the tags; it is created on
+                the first write if it does not exist
+            field_name (str): Display name of the selection field holding the tags
+        """
+        super().__init__()
+        self.catalog = catalog
+        self.title = title
+        self.field_name = field_name
+        self._create_lock = threading.Lock()
+
+    def tag_field(self) -> Optional[Tuple[str, str]]:
+        """
+        IDs of the tag label and its selection field.
+
+        Returns:
+            Optional[Tuple[str, str]]: (label ID, field ID), or None while the
+            label does not exist.
+        """
+        label = self.catalog.label(self.title)
+        if label is None:
+            return None
+        field_id = self.catalog.field_id(label['id'], self.field_name)
+        return (label['id'], field_id) if field_id else None
+
+    def list_params(self) -> Dict:
+        ids = self.tag_field()
+        return {'includeLabels': ids[0]} if ids else {}
+
+    def normalize(self, file: Dict) -> Dict:
+        """
+        Replace the labelInfo of a file with its tag names.
+
+        Args:
+            file (Dict): File metadata dictionary, with labelInfo when the
+                request asked for the tag label
+
+        Returns:
+            Dict: Copy of the file with a 'tags' list instead of labelInfo.
+        """
+        label_info = file.get('labelInfo')
+        file = {key: value for key, value in file.items() if key != 'labelInfo'}
+        file[TAGS_KEY] = []
+        ids = self.tag_field() if label_info else None
+        if ids is None:
+            return file
+        label_id, field_id = ids
+        for label in label_info.get('labels', []):
+            if label.get('id') != label_id:
+                continue
+            value = label.get('fields', {}).get(field_id, {})
+            for choice_id in value.get('selection', []):
+                name = self.catalog.choice_name(label_id, field_id, choice_id)
+                if name is not None:
+                    file[TAGS_KEY].append(name)
+        return file
+
+    def prepare(self, tags: Iterable[str]):
+        """
+        Create the tag label and any missing choices.
+
+        The catalog is revalidated before anything is created, so processes
+        writing tags at the same time see each other's label and choices.
+
+        Args:
+            tags (Iterable[str]): Tags about to be written
+
+        Raises:
+            HttpError: If the label cannot be created or extended.
+        """
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return
+        with self._create_lock:
+            ids = self.tag_field()
+            if ids is None or any(self.catalog.choice_id(*ids, tag) is None for tag in tags):
+                # Another process sharing the label may have created it meanwhile
+                self.catalog.refresh()
+                ids = self.tag_field()
+            if ids is None:
+                self.catalog.create_label(self.title, [{
+                    'properties': {'displayName': self.field_name},
+                    'selectionOptions': {
+                        'listOptions': {},
+                        'choices': [{'properties': {'displayName': tag}} for tag in tags]
+                    }
+                }])
+                return
+            if any(self.catalog.choice_id(*ids, tag) is None for tag in tags):
+                self.catalog.add_choices(*ids, tags)
+
+    def check(self, file: Dict, tags: List[str]):
+        """Label choices have no per-file limits a tag list could exceed."""
+
+    def update(self, drive_service, file_id: str, file: Dict, tags: List[str]):
+        """
+        Build the modifyLabels request that stores a complete tag list.
+
+        prepare() must have been called for the tags first.
+
+        Args:
+            drive_service: Google Drive API service instance
+            file_id (str): The ID of the file
+            file (Dict): Current normalized file metadata
+            tags (List[str]): Tags the file should carry; an empty list
+                removes the label from the file
+
+        Returns:
+            HttpRequest: The unexecuted modifyLabels request.
+
+        Raises:
+            KeyError: If a tag has no choice in the label yet.
+        """
+        label_id, field_id = self.tag_field()
+        if tags:
+            modification = {
+                'labelId': label_id,
+                'fieldModifications': [{
+                    'fieldId': field_id,
+                    'setSelectionValues': [self._choice(label_id, field_id, tag) for tag in tags]
+                }]
+            }
+        else:
+            modification = {'labelId': label_id, 'removeLabel': True}
+        return drive_service.files().modifyLabels(
+            fileId=file_id,
+            body={'labelModifications': [modification]}
+        )
+
+    def updated_file(self, file_id: str, tags: List[str], response: Dict) -> Dict:
+        return {'id': file_id, TAGS_KEY: list(tags)}
+
+    def with_tags(self, file: Dict, tags: List[str]) -> Dict:
+        return dict(file, **{TAGS_KEY: list(tags)})
+
+    def search_clause(self, tag_name: str) -> Optional[str]:
+        ids = self.tag_field()
+        choice_id = self.catalog.choice_id(*ids, tag_name) if ids else None
+        if choice_id is None:
+            return NO_MATCH
+        label_id, field_id = ids
+        return f"labels/{label_id}.{field_id} = '{escape_query_value(choice_id)}'"
+
+    def _choice(self, label_id: str, field_id: str, tag: str) -> str:
+        choice_id = self.catalog.choice_id(label_id, field_id, tag)
+        if choice_id is None:
+            raise KeyError(f"Tag '{tag}' has no choice in label '{self.title}'.")
+        return choice_id
+
+def create_tag_backend(name: str = TAG_CONFIG['backend'], labels_service=None) -> PropertiesBackend:
+    """
+    Build a tag storage backend by name.
+
+    Args:
+        name (str): One of BACKENDS
+        labels_service: Drive Labels API service, needed by the labels backend
+            unless the shared label catalog already exists
+
+    Returns:
+        PropertiesBackend: The backend.
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name == BACKEND_PROPERTIES:
+        return PropertiesBackend()
+    if name == BACKEND_LABELS:
+        return LabelsBackend(get_label_catalog(labels_service))
+    raise ValueError(f"Unknown tag backend '{name}', expected one of {', '.join(BACKENDS)}.")
@@ -0,0 +1,368 @@
+"""
+Persistent local tag index backed by SQLite.
+
+The index keeps an inverted mapping of tag -> file IDs plus the metadata of
+every file seen in the last listing, so tag searches can be answered locally
+instead of rescanning the folder. Its tag vocabulary is loaded on first use
+and kept current by every later write.
+"""
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from operator import itemgetter
+from typing import List, Dict, Iterable, Optional
+
+from drivelabels.core.tag_vocabulary import TagVocabulary
+from drivelabels.core.tags import TAGS_KEY, parse_tags
+
+logger = logging.getLogger(__name__)
+
+# Writes remembered by file ID, so in-memory views can catch up without a reload
+CHANGE_LOG_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    mime_type TEXT,
+    properties TEXT,
+    tags TEXT
+);
+CREATE TABLE IF NOT EXISTS file_tags (
+    tag TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    PRIMARY KEY (tag, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_tags_by_file ON file_tags (file_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class TagIndex:
+    """Inverted tag index persisted in a local SQLite database."""
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the index database.
+
+        Args:
+            path (str): Path of the SQLite file, or ':memory:' for a throwaway index
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Bumped on every write so in-memory views know when to rebuild
+        self.version = 0
+        # (version, file_id) of the latest single-file writes since the last rebuild
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self._vocabulary: Optional[TagVocabulary] = None
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(files)')}
+        if 'tags' not in columns:
+            # Indexes created before tag storage backends existed
+            self._conn.execute('ALTER TABLE files ADD COLUMN tags TEXT')
+
+    @property
+    def refreshed_at(self) -> Optional[float]:
+        """Unix timestamp of the last full rebuild, or None if never filled."""
+        value = self.get_meta('refreshed_at')
+        return float(value) if value is not None else None
+
+    def age(self) -> Optional[float]:
+        """
+        Seconds since the last full rebuild.
+
+        Returns:
+            Optional[float]: Age in seconds, or None if the index was never filled.
+        """
+        refreshed_at = self.refreshed_at
+        return None if refreshed_at is None else time.time() - refreshed_at
+
+    def is_fresh(self, max_age: float) -> bool:
+        """
+        Check whether the index was rebuilt within the last max_age seconds.
+
+        Args:
+            max_age (float): Maximum acceptable age in seconds
+
+        Returns:
+            bool: True if the index can be used without a rescan.
+        """
+        age = self.age()
+        return age is not None and age <= max_age
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """
+        Read a value from the index metadata table.
+
+        Args:
+            key (str): Metadata key
+
+        Returns:
+            Optional[str]: Stored value, or None if unset.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]):
+        """
+        Store (or clear, when value is None) a metadata value.
+
+        Args:
+            key (str): Metadata key
+            value (Optional[str]): Value to store
+        """
+        with self._lock, self._conn:
+            if value is None:
+                self._conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+            else:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value)
+                )
+
+    def rebuild(self, files: Iterable[Dict]) -> int:
+        """
+        Replace the index contents with a fresh listing.
+
+        The iterable is consumed into a staging database next to the index
+        without holding the index lock, so a streaming listing is neither
+        held in memory nor blocks searches and writes while it runs. The new
+        contents are then swapped in with one short transaction. Writes made
+        to the index meanwhile are replaced as well; the changes feed
+        replays them on the next sync.
+
+        Args:
+            files (Iterable[Dict]): File metadata dictionaries from a listing
+
+        Returns:
+            int: Number of files indexed.
+        """
+        directory = None if self.path == ':memory:' else os.path.dirname(os.path.abspath(self.path))
+        handle, staging_path = tempfile.mkstemp(prefix='tag_index_', suffix='.staging', dir=directory)
+        os.close(handle)
+        try:
+            count = self._stage(files, staging_path)
+            with self._lock:
+                # ATTACH cannot run inside a transaction, so it wraps the swap
+                self._conn.execute('ATTACH DATABASE ? AS staging', (staging_path,))
+                try:
+                    with self._conn:
+                        self._conn.execute('DELETE FROM file_tags')
+                        self._conn.execute('DELETE FROM files')
+                        self._conn.execute(
+                            'INSERT INTO files (id, name, mime_type, properties, tags) '
+                            'SELECT id, name, mime_type, properties, tags FROM staging.files ORDER BY rowid'
+                        )
+                        self._conn.execute(
+                            'INSERT INTO file_tags (tag, file_id) SELECT tag, file_id FROM staging.file_tags'
+                        )
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', ?)",
+                            (repr(time.time()),)
+                        )
+                        # Reloaded from the new contents on next use
+                        self._vocabulary = None
+                        self.version += 1
+                        self._changes.clear()
+                finally:
+                    self._conn.execute('DETACH DATABASE staging')
+        finally:
+            os.remove(staging_path)
+        logger.info(f"Rebuilt tag index with {count} files.")
+        return count
+
+    def upsert_file(self, file: Dict):
+        """
+        Insert or update a single file and its tags.
+
+        Args:
+            file (Dict): File metadata dictionary with at least an 'id'
+        """
+        with self._lock, self._conn:
+            self._upsert(file)
+            self._changed(file['id'])
+
+    def remove_file(self, file_id: str):
+        """
+        Drop a file and its tags from the index.
+
+        Args:
+            file_id (str): The ID of the file to remove
+        """
+        with self._lock, self._conn:
+            if self._vocabulary is not None:
+                self._vocabulary.update(self._file_tags(file_id), [])
+            self._conn.execute('DELETE FROM file_tags WHERE file_id = ?', (file_id,))
+            self._conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+            self._changed(file_id)
+
+    def changed_since(self, version: int) -> Optional[List[str]]:
+        """
+        IDs of the files upserted or removed after a version.
+
+        Args:
+            version (int): A value of `version` read earlier
+
+        Returns:
+            Optional[List[str]]: Changed file IDs, oldest first and possibly
+            repeated, or None if the index was rebuilt since or more writes
+            were made than are remembered.
+        """
+        with self._lock:
+            if version == self.version:
+                return []
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            return [file_id for changed, file_id in self._changes if changed > version]
+
+    def vocabulary(self) -> TagVocabulary:
+        """
+        Every indexed tag with its file count.
+
+        The first call reads every file's tags in one query; afterwards the
+        vocabulary is updated incrementally by each upsert and removal.
+
+        Returns:
+            TagVocabulary: The live vocabulary of the index.
+        """
+        with self._lock:
+            if self._vocabulary is None:
+                rows = self._conn.execute('SELECT file_id, tag FROM file_tags ORDER BY file_id')
+                vocabulary = TagVocabulary()
+                vocabulary.load(
+                    [tag for _, tag in group] for _, group in itertools.groupby(rows, key=itemgetter(0))
+                )
+                self._vocabulary = vocabulary
+            return self._vocabulary
+
+    def search(self, tag_name: str) -> List[Dict]:
+        """
+        Find indexed files carrying a tag.
+
+        Args:
+            tag_name (str): The name of the tag to search for
+
+        Returns:
+            List[Dict]: File metadata dictionaries shaped like API results.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT f.id, f.name, f.mime_type, f.properties, f.tags FROM file_tags t '
+                'JOIN files f ON f.id = t.file_id WHERE t.tag = ? ORDER BY f.rowid',
+                (tag_name,)
+            ).fetchall()
+        return [self._row_to_file(row) for row in rows]
+
+    def all_files(self) -> List[Dict]:
+        """
+        Return every indexed file in listing order.
+
+        Returns:
+            List[Dict]: File metadata dictionaries shaped like API results.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, name, mime_type, properties, tags FROM files ORDER BY rowid'
+            ).fetchall()
+        return [self._row_to_file(row) for row in rows]
+
+    def get_file(self, file_id: str) -> Optional[Dict]:
+        """
+        Look up a single indexed file.
+
+        Args:
+            file_id (str): The ID of the file
+
+        Returns:
+            Optional[Dict]: File metadata dictionary, or None if not indexed.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, name, mime_type, properties, tags FROM files WHERE id = ?',
+                (file_id,)
+            ).fetchone()
+        return self._row_to_file(row) if row else None
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _changed(self, file_id: str):
+        self.version += 1
+        self._changes.append((self.version, file_id))
+
+    def _upsert(self, file: Dict):
+        new_tags = parse_tags(file)
+        if self._vocabulary is not None:
+            self._vocabulary.update(self._file_tags(file['id']), new_tags)
+        _write_file(self._conn, file, new_tags)
+
+    @staticmethod
+    def _stage(files: Iterable[Dict], path: str) -> int:
+        # Throwaway database, so durability is not worth any fsync
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(SCHEMA)
+            count = 0
+            with conn:
+                for file in files:
+                    _write_file(conn, file, parse_tags(file))
+                    count += 1
+            return count
+        finally:
+            conn.close()
+
+    def _file_tags(self, file_id: str) -> List[str]:
+        return [row[0] for row in self._conn.execute(
+            'SELECT tag FROM file_tags WHERE file_id = ?', (file_id,)
+        )]
+
+    @staticmethod
+    def _row_to_file(row) -> Dict:
+        file_id, name, mime_type, properties, tags = row
+        file = {
+            'id': file_id,
+            'name': name,
+            'mimeType': mime_type,
+            'properties': json.loads(properties) if properties else {}
+        }
+        if tags is not None:
+            file[TAGS_KEY] = json.loads(tags)
+        return file
+
+def _write_file(conn: sqlite3.Connection, file: Dict, tags: List[str]):
+    # Insert or update a file row and replace its tag rows
+    file_id = file['id']
+    properties = file.get('properties') or {}
+    # Tags normalized by a non-properties backend are stored as they are
+    stored_tags = json.dumps(file[TAGS_KEY]) if TAGS_KEY in file else None
+    conn.execute(
+        'INSERT INTO files (id, name, mime_type, properties, tags) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT(id) DO UPDATE SET '
+        'name = COALESCE(excluded.name, name), '
+        'mime_type = COALESCE(excluded.mime_type, mime_type), '
+        'properties = excluded.properties, '
+        'tags = excluded.tags',
+        (file_id, file.get('name'), file.get('mimeType'), json.dumps(properties), stored_tags)
+    )
+    conn.execute('DELETE FROM file_tags WHERE file_id = ?', (file_id,))
+    conn.executemany(
+        'INSERT OR IGNORE INTO file_tags (tag, file_id) VALUES (?, ?)',
+        [(tag, file_id) for tag in tags]
+    )
@@ -0,0 +1,319 @@
+"""
+Tag vocabulary: every tag in use with its file count, and prefix completion.
+
+Tags are compared through a normalization policy so that spellings such as
+'Marketing' and 'marketing' count as one tag. New tags are written with the
+spelling already most used. Normalized keys are kept in a sorted array, so
+a prefix lookup is one binary search followed by a scan of the matches. Adding
+or removing a key shifts the array in a single memmove, which stays cheap
+even with tens of thousands of distinct tags.
+"""
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from drivelabels.config.settings import VOCABULARY_CONFIG
+
+# Tags differing in any way are distinct; only surrounding whitespace is dropped
+NORMALIZE_EXACT = 'exact'
+# Case and runs of whitespace are ignored
+NORMALIZE_CASEFOLD = 'casefold'
+NORMALIZATIONS = (NORMALIZE_EXACT, NORMALIZE_CASEFOLD)
+
+def clean_tag(tag: str, normalization: str = VOCABULARY_CONFIG['normalization']) -> str:
+    """
+    Tidy a typed tag without changing its case.
+
+    Args:
+        tag (str): Tag as entered
+        normalization (str): Policy, one of NORMALIZATIONS
+
+    Returns:
+        str: The tag with surrounding whitespace removed, and inner runs of
+        whitespace collapsed under the casefold policy.
+    """
+    return ' '.join(tag.split()) if normalization == NORMALIZE_CASEFOLD else tag.strip()
+
+def normalize_tag(tag: str, normalization: str = VOCABULARY_CONFIG['normalization']) -> str:
+    """
+    Key under which spellings of a tag are considered the same tag.
+
+    Args:
+        tag (str): Tag spelling
+        normalization (str): Policy, one of NORMALIZATIONS
+
+    Returns:
+        str: Normalized key.
+    """
+    tag = clean_tag(tag, normalization)
+    return tag.casefold() if normalization == NORMALIZE_CASEFOLD else tag
+
+class TagVocabulary:
+    """Thread-safe per-tag file counts with a sorted prefix index."""
+
+    def __init__(self, normalization: str = VOCABULARY_CONFIG['normalization']):
+        """
+        Initialize an empty vocabulary.
+
+        Args:
+            normalization (str): Policy deciding which spellings are one tag,
+                one of NORMALIZATIONS
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(
+                f"Unknown tag normalization '{normalization}', expected one of {', '.join(NORMALIZATIONS)}."
+            )
+        self.normalization = normalization
+        # Normalized key -> {spelling: files carrying that spelling}
+        self._spellings: Dict[str, Dict[str, int]] = {}
+        # Normalized key -> files carrying any of its spellings
+        self._files: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def key(self, tag: str) -> str:
+        """
+        Normalized key of a tag under this vocabulary's policy.
+
+        Args:
+            tag (str): Tag spelling
+
+        Returns:
+            str: Normalized key.
+        """
+        return normalize_tag(tag, self.normalization)
+
+    def load(self, tag_lists: Iterable[Iterable[str]]):
+        """
+        Replace the vocabulary with the tags of every file.
+
+        Args:
+            tag_lists (Iterable[Iterable[str]]): The tag list of each file
+        """
+        spellings: Dict[str, Dict[str, int]] = {}
+        files: Dict[str, int] = {}
+        for tags in tag_lists:
+            keys = set()
+            for tag in set(tags):
+                key = self.key(tag)
+                counts = spellings.setdefault(key, {})
+                counts[tag] = counts.get(tag, 0) + 1
+                keys.add(key)
+            for key in keys:
+                files[key] = files.get(key, 0) + 1
+        with self._lock:
+            self._spellings = spellings
+            self._files = files
+            self._keys = sorted(spellings)
+
+    def update(self, old_tags: Iterable[str], new_tags: Iterable[str]):
+        """
+        Account for one file whose tag list changed.
+
+        Args:
+            old_tags (Iterable[str]): Tags the file carried, empty for a new file
+            new_tags (Iterable[str]): Tags it carries now, empty for a removed file
+        """
+        old_tags, new_tags = set(old_tags), set(new_tags)
+        old_keys = {self.key(tag) for tag in old_tags}
+        new_keys = {self.key(tag) for tag in new_tags}
+        with self._lock:
+            for tag in old_tags - new_tags:
+                self._adjust(tag, -1)
+            for tag in new_tags - old_tags:
+                self._adjust(tag, 1)
+            for key in old_keys - new_keys:
+                self._count_file(key, -1)
+            for key in new_keys - old_keys:
+                self._count_file(key, 1)
+
+    def count(self, tag: str) -> int:
+        """
+        Number of files carrying a tag in any of its spellings.
+
+        Args:
+            tag (str): Tag spelling
+
+        Returns:
+            int: File count, 0 for unknown tags.
+        """
+        with self._lock:
+            return self._files.get(self.key(tag), 0)
+
+    def canonical(self, tag: str) -> str:
+        """
+        Spelling a tag should be written with.
+
+        Args:
+            tag (str): Tag as entered
+
+        Returns:
+            str: The most used existing spelling of the tag, or the cleaned
+            tag itself if it is new.
+        """
+        with self._lock:
+            spellings = self._spellings.get(self.key(tag))
+            if spellings:
+                return max(spellings, key=spellings.get)
+        return clean_tag(tag, self.normalization)
+
+    def spellings(self, tag: str) -> List[str]:
+        """
+        Every spelling in use of a tag.
+
+        Args:
+            tag (str): Tag spelling
+
+        Returns:
+            List[str]: Spellings sharing the tag's normalized key, most used
+            first; empty for unknown tags.
+        """
+        with self._lock:
+            spellings = self._spellings.get(self.key(tag), {})
+            return sorted(spellings, key=spellings.get, reverse=True)
+
+    def complete(self, prefix: str, limit: Optional[int] = VOCABULARY_CONFIG['suggestions']) -> List[Tuple[str, int]]:
+        """
+        Tags starting with a prefix, in alphabetical order of their keys.
+
+        Args:
+            prefix (str): Beginning of a tag, matched after normalization
+            limit (int): Maximum number of completions, None for all
+
+        Returns:
+            List[Tuple[str, int]]: (canonical spelling, file count) pairs.
+        """
+        prefix = self.key(prefix) if prefix.strip() else ''
+        matches = []
+        with self._lock:
+            position = bisect_left(self._keys, prefix)
+            while position < len(self._keys) and (limit is None or len(matches) < limit):
+                key = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                spellings = self._spellings[key]
+                matches.append((max(spellings, key=spellings.get), self._files.get(key, 0)))
+                position += 1
+        return matches
+
+    def entries(self) -> List[Dict]:
+        """
+        Every tag with its count and spellings, most used first.
+
+        Returns:
+            List[Dict]: Dictionaries with the canonical 'tag', its total
+            'files' count and the file count of each of its 'variants'.
+        """
+        with self._lock:
+            entries = [
+                {
+                    'tag': max(spellings, key=spellings.get),
+                    'files': self._files.get(key, 0),
+                    'variants': dict(spellings)
+                }
+                for key, spellings in self._spellings.items()
+            ]
+        entries.sort(key=lambda entry: (-entry['files'], self.key(entry['tag'])))
+        return entries
+
+    def summary(self, top: int = VOCABULARY_CONFIG['top']) -> Dict:
+        """
+        Statistics for the tags --stats report.
+
+        Args:
+            top (int): Number of most used tags to include
+
+        Returns:
+            Dict: 'normalization', 'tags' (distinct after normalization),
+            'spellings', 'assignments' (file/tag pairs), 'singletons' (tags
+            on one file), the 'top' entries and the 'variants' entries of
+            tags written with more than one spelling.
+        """
+        entries = self.entries()
+        return {
+            'normalization': self.normalization,
+            'tags': len(entries),
+            'spellings': sum(len(entry['variants']) for entry in entries),
+            'assignments': sum(sum(entry['variants'].values()) for entry in entries),
+            'singletons': sum(1 for entry in entries if entry['files'] == 1),
+            'top': entries[:top],
+            'variants': [entry for entry in entries if len(entry['variants']) > 1]
+        }
+
+    def _adjust(self, tag: str, delta: int):
+        key = self.key(tag)
+        spellings = self._spellings.get(key)
+        if spellings is None:
+            if delta <= 0:
+                return
+            spellings = self._spellings[key] = {}
+            insort(self._keys, key)
+        count = spellings.get(tag, 0) + delta
+        if count > 0:
+            spellings[tag] = count
+        else:
+            spellings.pop(tag, None)
+        if not spellings:
+            del self._spellings[key]
+            del self._keys[bisect_left(self._keys, key)]
+
+    def _count_file(self, key: str, delta: int):
+        count = self._files.get(key, 0) + delta
+        if count > 0:
+            self._files[key] = count
+        else:
+            self._files.pop(key, None)
+
+def edit_tags(
+    current: List[str],
+    add: Iterable[str] = (),
+    remove: Iterable[str] = (),
+    vocabulary: Optional[TagVocabulary] = None,
+    normalization: str = VOCABULARY_CONFIG['normalization'],
+    remove_spellings: Iterable[str] = ()
+) -> List[str]:
+    """
+    Compute a file's new tag list under the normalization policy.
+
+    Added tags already present in another spelling are not added again,
+    and new ones take the vocabulary's canonical spelling. Removing a tag
+    removes only that spelling; remove_spellings removes every spelling of
+    a tag. Removal wins over addition.
+
+    Args:
+        current (List[str]): Tags the file carries
+        add (Iterable[str]): Tags to add
+        remove (Iterable[str]): Tags to remove, in exactly this spelling
+        vocabulary (TagVocabulary): Known tags, used to pick spellings; its
+            policy overrides normalization
+        normalization (str): Policy used without a vocabulary
+        remove_spellings (Iterable[str]): Tags to remove in any spelling
+
+    Returns:
+        List[str]: The new tag list, in the order of current followed by additions.
+    """
+    if vocabulary is not None:
+        normalization = vocabulary.normalization
+    removed_tags = {clean_tag(tag, normalization) for tag in remove}
+    removed_keys = {normalize_tag(tag, normalization) for tag in remove_spellings}
+    tags = [
+        tag for tag in current
+        if clean_tag(tag, normalization) not in removed_tags
+        and normalize_tag(tag, normalization) not in removed_keys
+    ]
+    present = {normalize_tag(tag, normalization) for tag in tags}
+    blocked = removed_keys | {normalize_tag(tag, normalization) for tag in removed_tags}
+    for tag in add:
+        key = normalize_tag(tag, normalization)
+        if not key or key in present or key in blocked:
+            continue
+        present.add(key)
+        tags.append(vocabulary.canonical(tag) if vocabulary is not None else clean_tag(tag, normalization))
+    return tags
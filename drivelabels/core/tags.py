@@ -0,0 +1,181 @@
+"""
+Helpers for reading and writing tags stored in Drive file properties.
+
+Two storage layouts are supported:
+
+- joined: all tags in one comma-joined 'tags' property (the original layout)
+- per_tag: one 'drivelabels_tag_<name>' property per tag with value '1',
+  which Drive can filter on server-side with a 'properties has' query
+
+The read path always understands both so a migration can run incrementally.
+Writes are checked against Drive's limits on public properties (30 per file,
+124 bytes per key and value) before any request is sent; the migrating
+layout falls back to the joined property for files whose tags do not fit
+one property each.
+Files read through another storage backend carry their tags as a plain
+list under TAGS_KEY instead (see drivelabels.core.tag_backends).
+"""
+from typing import List, Dict, Optional
+
+TAGS_PROPERTY = 'tags'
+# Namespaced so properties other apps set on the same files are not read as tags
+TAG_KEY_PREFIX = 'drivelabels_tag_'
+TAG_VALUE = '1'
+# Drive limits on public custom properties
+MAX_PUBLIC_PROPERTIES = 30  # Properties on one file, set by any app
+MAX_PROPERTY_BYTES = 124    # UTF-8 bytes of one property's key and value together
+# Key of the tag list on files normalized by a non-properties backend
+TAGS_KEY = 'tags'
+
+LAYOUT_JOINED = 'joined'
+LAYOUT_PER_TAG = 'per_tag'
+# Writes use the per-tag layout while reads and searches still expect joined files
+LAYOUT_MIGRATING = 'migrating'
+LAYOUTS = (LAYOUT_JOINED, LAYOUT_MIGRATING, LAYOUT_PER_TAG)
+
+class TagLimitError(ValueError):
+    """Raised when a tag list does not fit in Drive's property limits."""
+
+def parse_tags(file: Dict) -> List[str]:
+    """
+    Extract the tag list from a file metadata dictionary.
+
+    Args:
+        file (Dict): File metadata dictionary with an optional 'properties'
+            key, or a normalized TAGS_KEY list
+
+    Returns:
+        List[str]: Tags in stored order, stripped and without empty entries.
+    """
+    if TAGS_KEY in file:
+        return list(file[TAGS_KEY])
+    properties = file.get('properties') or {}
+    tags = [tag.strip() for tag in properties.get(TAGS_PROPERTY, '').split(',')]
+    tags = [tag for tag in tags if tag]
+    for key, value in properties.items():
+        if key.startswith(TAG_KEY_PREFIX) and value == TAG_VALUE:
+            tag = key[len(TAG_KEY_PREFIX):]
+            if tag and tag not in tags:
+                tags.append(tag)
+    return tags
+
+def format_tags(tags: List[str]) -> str:
+    """
+    Serialize a tag list for the 'tags' property.
+
+    Args:
+        tags (List[str]): Tags to store
+
+    Returns:
+        str: Comma-joined tag string.
+    """
+    return ','.join(tags)
+
+def tag_key(tag_name: str) -> str:
+    """
+    Property key used for a tag in the per-tag layout.
+
+    Args:
+        tag_name (str): The tag name
+
+    Returns:
+        str: Property key such as 'drivelabels_tag_marketing'.
+    """
+    return f'{TAG_KEY_PREFIX}{tag_name}'
+
+def property_size(key: str, value: str) -> int:
+    """
+    Size of a property as Drive counts it against MAX_PROPERTY_BYTES.
+
+    Args:
+        key (str): Property key
+        value (str): Property value
+
+    Returns:
+        int: UTF-8 bytes of the key and value together.
+    """
+    return len(key.encode('utf-8')) + len(value.encode('utf-8'))
+
+def tag_properties(file: Dict, tags: List[str], layout: str) -> Dict[str, Optional[str]]:
+    """
+    Build the properties patch that stores a tag list in a layout.
+
+    Keys belonging to the other layout are set to None, which deletes them,
+    so writing a file also migrates it. In the migrating layout, tags that
+    do not fit one property each are stored joined instead.
+
+    Args:
+        file (Dict): Current file metadata dictionary (only 'properties' is read)
+        tags (List[str]): Complete tag list to store
+        layout (str): Target layout, one of LAYOUTS
+
+    Returns:
+        Dict[str, Optional[str]]: Value for the 'properties' field of files().update.
+
+    Raises:
+        TagLimitError: If the tags cannot be stored within Drive's limits.
+    """
+    properties = file.get('properties') or {}
+    old_keys = {key for key in properties if key.startswith(TAG_KEY_PREFIX)}
+
+    if layout != LAYOUT_JOINED:
+        problem = _per_tag_problem(properties, old_keys, tags)
+        if problem is None:
+            new_keys = [tag_key(tag) for tag in tags]
+            patch = {key: None for key in old_keys.difference(new_keys)}
+            patch.update({key: TAG_VALUE for key in new_keys})
+            if TAGS_PROPERTY in properties:
+                patch[TAGS_PROPERTY] = None
+            return patch
+        if layout == LAYOUT_PER_TAG:
+            # Searches filter on per-tag keys, so a joined fallback would hide the file
+            raise TagLimitError(problem)
+
+    value = format_tags(tags)
+    if property_size(TAGS_PROPERTY, value) > MAX_PROPERTY_BYTES:
+        raise TagLimitError(
+            f"The tags take {property_size(TAGS_PROPERTY, value)} bytes, more than the "
+            f"{MAX_PROPERTY_BYTES} Drive allows in one property."
+        )
+    patch = {key: None for key in old_keys}
+    patch[TAGS_PROPERTY] = value
+    return patch
+
+def _per_tag_problem(properties: Dict, old_keys: set, tags: List[str]) -> Optional[str]:
+    # Why the tags cannot be stored one property each, or None if they can
+    for tag in tags:
+        if property_size(tag_key(tag), TAG_VALUE) > MAX_PROPERTY_BYTES:
+            return f"Tag '{tag}' is too long to be stored as its own property ({MAX_PROPERTY_BYTES} bytes at most)."
+    # Properties of other apps count against the same limit
+    others = sum(1 for key in properties if key not in old_keys and key != TAGS_PROPERTY)
+    if others + len(tags) > MAX_PUBLIC_PROPERTIES:
+        return (
+            f"{len(tags)} tags do not fit in the {max(0, MAX_PUBLIC_PROPERTIES - others)} "
+            f"properties left on the file."
+        )
+    return None
+
+def escape_query_value(value: str) -> str:
+    """
+    Escape a string literal for use inside a Drive query.
+
+    Args:
+        value (str): Raw value
+
+    Returns:
+        str: Value with backslashes and single quotes escaped.
+    """
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+def tag_query(tag_name: str) -> str:
+    """
+    Drive query clause matching files tagged in the per-tag layout.
+
+    Args:
+        tag_name (str): The tag to match
+
+    Returns:
+        str: A 'properties has' clause.
+    """
+    key = escape_query_value(tag_key(tag_name))
+    return f"properties has {{ key='{key}' and value='{TAG_VALUE}' }}"
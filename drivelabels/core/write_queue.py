@@ -0,0 +1,213 @@
+"""
+Write-behind queue for tag mutations.
+
+Tag edits are appended to a durable SQLite journal and return immediately.
+A background worker periodically collapses the journal into one net tag
+change per file and flushes it with batched requests. Journal entries are
+only deleted after their flush completes, so edits left behind by a crash
+are replayed on the next start.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Callable, Optional
+
+from drivelabels.core.batch import STATUS_FAILED
+
+logger = logging.getLogger(__name__)
+
+OP_ADD = 'add'
+OP_REMOVE = 'remove'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mutations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    op TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failures (
+    file_id TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL
+);
+"""
+
+class WriteBehindQueue:
+    """Durable, coalescing queue of tag mutations flushed by a background worker."""
+
+    def __init__(
+        self,
+        path: str,
+        flush: Callable[[Dict[str, Dict[str, List[str]]]], Dict[str, Dict]],
+        max_pending: int = 500,
+        flush_interval: float = 5.0,
+        max_attempts: int = 5
+    ):
+        """
+        Open the journal.
+
+        Args:
+            path (str): Path of the SQLite journal file
+            flush (Callable): Applies {file_id: {'add': [...], 'remove': [...]}} and
+                returns per-file results with a 'status' key
+            max_pending (int): Flush early once this many mutations are queued
+            flush_interval (float): Seconds between periodic flushes
+            max_attempts (int): Flushes a failing file is retried before it is dropped
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.flush_fn = flush
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._worker: Optional[threading.Thread] = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+
+    def start(self):
+        """Start the background worker, replaying any journal left by a previous run."""
+        if self._worker is not None:
+            return
+        if self.pending():
+            logger.info(f"Replaying {self.pending()} journaled tag mutations.")
+            self._wakeup.set()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name='drive-write-behind', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Flush everything still queued and stop the worker."""
+        if self._worker is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._worker.join()
+            self._worker = None
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, file_id: str, tag_name: str, op: str):
+        """
+        Durably record a tag mutation.
+
+        Args:
+            file_id (str): The ID of the file
+            tag_name (str): The tag to add or remove
+            op (str): OP_ADD or OP_REMOVE
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO mutations (file_id, tag, op) VALUES (?, ?, ?)',
+                (file_id, tag_name, op)
+            )
+        if self.pending() >= self.max_pending:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        """
+        Count journaled mutations not yet flushed.
+
+        Returns:
+            int: Number of queued mutations.
+        """
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM mutations').fetchone()[0]
+
+    def pending_changes(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Collapse the journal into one net tag change per file.
+
+        For every (file, tag) pair only the last operation counts, so an add
+        followed by a remove of the same tag cancels out to a remove.
+
+        Returns:
+            Dict[str, Dict[str, List[str]]]: Maps file IDs to 'add' and 'remove' tag lists.
+        """
+        return self._coalesce(self._read())[0]
+
+    def flush(self) -> Dict[str, Dict]:
+        """
+        Write all queued mutations to Drive now.
+
+        Returns:
+            Dict[str, Dict]: Per-file results of the flush.
+        """
+        with self._flush_lock:
+            rows = self._read()
+            if not rows:
+                return {}
+            changes, last_seq = self._coalesce(rows)
+            results = self.flush_fn(changes)
+            self._settle(changes, results, last_seq)
+            return results
+
+    def _read(self) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT seq, file_id, tag, op FROM mutations ORDER BY seq'
+            ).fetchall()
+
+    @staticmethod
+    def _coalesce(rows: List[tuple]):
+        net: Dict[str, Dict[str, str]] = {}
+        last_seq = 0
+        for seq, file_id, tag, op in rows:
+            net.setdefault(file_id, {})[tag] = op
+            last_seq = seq
+        changes = {
+            file_id: {
+                'add': [tag for tag, op in ops.items() if op == OP_ADD],
+                'remove': [tag for tag, op in ops.items() if op == OP_REMOVE]
+            }
+            for file_id, ops in net.items()
+        }
+        return changes, last_seq
+
+    def _settle(self, changes: Dict, results: Dict[str, Dict], last_seq: int):
+        failed = [file_id for file_id in changes if results.get(file_id, {}).get('status') == STATUS_FAILED]
+        with self._lock, self._conn:
+            # Keep failed files journaled for the next flush, up to max_attempts
+            self._conn.executemany(
+                'INSERT INTO failures (file_id, attempts) VALUES (?, 1) '
+                'ON CONFLICT(file_id) DO UPDATE SET attempts = attempts + 1',
+                [(file_id,) for file_id in failed]
+            )
+            exhausted = {
+                row[0] for row in self._conn.execute(
+                    'SELECT file_id FROM failures WHERE attempts >= ?', (self.max_attempts,)
+                )
+            }
+            keep = set(failed) - exhausted
+            done = [file_id for file_id in changes if file_id not in keep]
+            self._conn.executemany(
+                'DELETE FROM mutations WHERE file_id = ? AND seq <= ?',
+                [(file_id, last_seq) for file_id in done]
+            )
+            self._conn.executemany(
+                'DELETE FROM failures WHERE file_id = ?', [(file_id,) for file_id in done]
+            )
+        for file_id in exhausted:
+            logger.error(
+                f"Dropping queued tag changes for file '{file_id}' after {self.max_attempts} "
+                f"failed flushes: {results.get(file_id, {}).get('error')}"
+            )
+        logger.info(f"Flushed tag changes for {len(changes)} files ({len(keep)} kept for retry).")
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                self.flush()
+            except Exception:
+                # Mutations stay journaled and are retried on the next cycle
+                logger.exception("Write-behind flush failed.")
@@ -0,0 +1,448 @@
+"""
+Long-running local daemon serving listings, searches and tag edits.
+
+The daemon authenticates once, builds the Drive services once and keeps
+the tag index, its vocabulary, the bitmap query index and the response
+cache warm. A background thread replays the changes feed every
+DAEMON_CONFIG['sync_interval'] seconds, so requests are answered from
+memory and the local index without waiting on Drive. Every client shares
+the daemon's rate limiter, and therefore one quota budget.
+
+Clients connect to a Unix socket (mode 0600), or to a localhost TCP socket
+guarded by a token file, and speak the JSON-lines protocol described in
+drivelabels.client.
+"""
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from drivelabels.client import DaemonClient, parse_address
+from drivelabels.config.settings import DAEMON_CONFIG, INDEX_CONFIG, TAG_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class DaemonService:
+    """Answers daemon requests on a pool of DriveManagers sharing one index and cache."""
+
+    def __init__(self, manager_factory: Callable[..., object], tag_index, stats: Optional[Callable[[], Dict]] = None):
+        """
+        Initialize the service.
+
+        Args:
+            manager_factory (Callable): Returns a new DriveManager attached to
+                tag_index; called with sync_interval=0 for the background syncer
+            tag_index (TagIndex): Index shared by every manager
+            stats (Callable): Returns extra statistics for the 'stats' method
+        """
+        self.manager_factory = manager_factory
+        self.tag_index = tag_index
+        self.extra_stats = stats
+        self.started = time.time()
+        self.requests = 0
+        self._idle: List[object] = []
+        self._managers: List[object] = []
+        self._syncer = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(DAEMON_CONFIG['max_concurrency'])
+        # (method, expression) -> (index version, encoded reply items), LRU
+        self._replies: 'OrderedDict[Tuple[str, str], Tuple[int, List[bytes]]]' = OrderedDict()
+        self._methods = {
+            'ping': self._ping,
+            'stats': self._stats,
+            'list': self._list,
+            'search': self._search,
+            'tag': self._tag,
+            'untag': self._untag,
+            'apply': self._apply
+        }
+
+    @property
+    def methods(self) -> List[str]:
+        """Names of the request methods, besides 'shutdown'."""
+        return list(self._methods)
+
+    def handle(self, method: str, params: Dict, write: Callable[[bytes], None]) -> Dict:
+        """
+        Run one request, writing its reply items as encoded lines.
+
+        Args:
+            method (str): Request method
+            params (Dict): Request parameters
+            write (Callable): Sends one encoded reply line
+
+        Returns:
+            Dict: Fields of the final reply line.
+
+        Raises:
+            KeyError: If the method is unknown.
+            ValueError: If the parameters are malformed.
+            HttpError: If a Drive request fails.
+            QuerySyntaxError: If a search expression is malformed.
+        """
+        handler = self._methods[method]
+        with self._lock:
+            self.requests += 1
+        with self._slots, self._manager() as manager:
+            return handler(manager, params, write) or {}
+
+    def sync(self):
+        """Replay the changes feed into the index, ignoring the sync interval."""
+        if self._syncer is None:
+            self._syncer = self.manager_factory(sync_interval=0.0)
+        self._syncer.sync()
+
+    def close(self):
+        """Drop every manager and cached reply; the index is closed by its owner."""
+        with self._lock:
+            self._managers, self._idle = [], []
+            self._replies.clear()
+        self._syncer = None
+
+    @contextmanager
+    def _manager(self) -> Iterator[object]:
+        # Managers hold a Drive client that must not be used by two threads
+        # at once, so each request borrows one; they keep their bitmap warm
+        with self._lock:
+            manager = self._idle.pop() if self._idle else None
+        if manager is None:
+            manager = self.manager_factory()
+            with self._lock:
+                self._managers.append(manager)
+        try:
+            yield manager
+        finally:
+            with self._lock:
+                self._idle.append(manager)
+
+    def _ping(self, manager, params: Dict, write) -> Dict:
+        write(_encode({'item': {'pid': os.getpid(), 'uptime': time.time() - self.started}}))
+        return {}
+
+    def _stats(self, manager, params: Dict, write) -> Dict:
+        from drivelabels.utils.metrics import get_metrics
+
+        metrics = get_metrics()
+        stats = {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started,
+            'requests': self.requests,
+            'managers': len(self._managers),
+            'index_age': self.tag_index.age(),
+            'tags': len(self.tag_index.vocabulary()),
+            'api_calls': metrics.total_calls(),
+            'recent_api_calls': metrics.recent_calls(),
+            'rate': manager.rate_limiter.rate
+        }
+        if manager.response_cache is not None:
+            stats['response_cache'] = manager.response_cache.stats()
+        if self.extra_stats is not None:
+            stats.update(self.extra_stats())
+        write(_encode({'item': stats}))
+        return {}
+
+    def _list(self, manager, params: Dict, write) -> Dict:
+        from drivelabels.core.models import FileRecord
+
+        manager.sync()
+        lines = self._cached_reply(('list', ''), lambda: [
+            _encode({'item': FileRecord.from_api(file).to_dict()}) for file in self.tag_index.all_files()
+        ])
+        for line in lines:
+            write(line)
+        return {'count': len(lines)}
+
+    def _search(self, manager, params: Dict, write) -> Dict:
+        from drivelabels.core.query import is_boolean_query
+
+        expr = str(params.get('expr') or '').strip()
+        if not expr:
+            raise ValueError("search needs an 'expr' parameter.")
+        refresh = bool(params.get('refresh'))
+        # Sync here so Drive errors are reported instead of giving no results
+        if refresh:
+            manager.refresh_index()
+        else:
+            manager.sync()
+
+        def search() -> List[bytes]:
+            records = manager.query(expr) if is_boolean_query(expr) else manager.search_by_tag(expr)
+            return [_encode({'item': record.to_dict()}) for record in records]
+
+        lines = search() if refresh else self._cached_reply(('search', expr), search)
+        for line in lines:
+            write(line)
+        return {'count': len(lines)}
+
+    def _cached_reply(self, key: Tuple[str, str], build: Callable[[], List[bytes]]) -> List[bytes]:
+        # Valid while the index is unchanged; every sync or write that
+        # changes a file bumps its version
+        version = self.tag_index.version
+        with self._lock:
+            cached = self._replies.get(key)
+            if cached is not None and cached[0] == version:
+                self._replies.move_to_end(key)
+                return cached[1]
+        lines = build()
+        with self._lock:
+            self._replies[key] = (version, lines)
+            self._replies.move_to_end(key)
+            while len(self._replies) > DAEMON_CONFIG['cached_replies']:
+                self._replies.popitem(last=False)
+        return lines
+
+    def _tag(self, manager, params: Dict, write) -> Dict:
+        return self._write_results(manager, 'add', params, write)
+
+    def _untag(self, manager, params: Dict, write) -> Dict:
+        return self._write_results(
+            manager, 'remove_spellings' if params.get('all_spellings') else 'remove', params, write
+        )
+
+    def _apply(self, manager, params: Dict, write) -> Dict:
+        changes = params.get('changes')
+        if not isinstance(changes, dict) or not all(
+            isinstance(change, dict) and all(isinstance(tags, list) for tags in change.values())
+            for change in changes.values()
+        ):
+            raise ValueError("apply needs a 'changes' object mapping file IDs to objects of tag lists.")
+        return self._emit_results(manager.apply_tag_changes(changes), write)
+
+    def _write_results(self, manager, operation: str, params: Dict, write) -> Dict:
+        ids, tags = params.get('ids'), params.get('tags')
+        if not isinstance(ids, list) or not isinstance(tags, list) or not tags:
+            raise ValueError(f"{operation} needs 'ids' and 'tags' lists.")
+        return self._emit_results(
+            manager.apply_tag_changes({str(file_id): {operation: tags} for file_id in ids}), write
+        )
+
+    def _emit_results(self, results: Dict[str, Dict], write) -> Dict:
+        for file_id, result in results.items():
+            write(_encode({'item': dict({'id': file_id}, **result)}))
+        return {'count': len(results)}
+
+def _encode(message: Dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n'
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Reads JSON-lines requests from one client connection."""
+
+    # Reply lines are buffered and flushed with the final line of each reply
+    wbufsize = 65536
+
+    def handle(self):
+        from googleapiclient.errors import HttpError
+        from drivelabels.core.query import QuerySyntaxError
+
+        service: DaemonService = self.server.service
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                method, params = request.get('method'), request.get('params') or {}
+                if not isinstance(params, dict):
+                    raise ValueError(params)
+            except (ValueError, AttributeError):
+                self._reply({'ok': False, 'error': "Malformed request.", 'code': 'bad_request'})
+                continue
+            if self.server.token is not None and not secrets.compare_digest(
+                str(request.get('token') or ''), self.server.token
+            ):
+                self._reply({'ok': False, 'error': "Invalid or missing token.", 'code': 'unauthorized'})
+                return
+            if method == 'shutdown':
+                self._reply({'ok': True})
+                threading.Thread(target=self.server.shutdown, name='daemon-shutdown', daemon=True).start()
+                return
+            if method not in service.methods:
+                self._reply({'ok': False, 'error': f"Unknown method '{method}'.", 'code': 'unknown_method'})
+                continue
+            started = time.perf_counter()
+            try:
+                reply = dict(service.handle(method, params, self.wfile.write), ok=True)
+            except QuerySyntaxError as error:
+                reply = {'ok': False, 'error': f"Invalid query: {error}", 'code': 'invalid_query'}
+            except ValueError as error:
+                reply = {'ok': False, 'error': str(error), 'code': 'bad_request'}
+            except HttpError as error:
+                logger.warning(f"Daemon {method} failed: {error}")
+                reply = {'ok': False, 'error': f"An error occurred: {error}", 'code': 'drive_error'}
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as error:  # Reported to the client; the daemon keeps serving
+                logger.exception(f"Daemon {method} failed")
+                reply = {'ok': False, 'error': f"{type(error).__name__}: {error}", 'code': 'internal_error'}
+            logger.debug(f"Daemon {method} answered in {(time.perf_counter() - started) * 1000:.1f} ms")
+            self._reply(reply)
+
+    def _reply(self, message: Dict):
+        try:
+            self.wfile.write(_encode(message))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def create_server(address: str, service: DaemonService) -> socketserver.BaseServer:
+    """
+    Bind the daemon socket.
+
+    A Unix socket is created with mode 0600, replacing a stale socket file
+    left by a daemon that did not shut down cleanly. A TCP socket may only
+    be bound to a loopback address, and clients must present the token
+    written to DAEMON_CONFIG['token_path'].
+
+    Args:
+        address (str): Unix socket path, or host:port for TCP
+        service (DaemonService): Answers the requests
+
+    Returns:
+        socketserver.BaseServer: The bound server, not yet serving.
+
+    Raises:
+        RuntimeError: If another daemon is already listening at the address.
+        ValueError: If a TCP address is not a loopback address.
+    """
+    family, target = parse_address(address)
+    if _is_listening(address):
+        raise RuntimeError(f"A drivelabels daemon is already listening at {address}.")
+    if family == socket.AF_UNIX:
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        if os.path.exists(target):
+            os.unlink(target)
+        previous = os.umask(0o177)
+        try:
+            server = _UnixServer(target, _Handler)
+        finally:
+            os.umask(previous)
+        server.token = None
+    else:
+        host, _ = target
+        if host not in ('127.0.0.1', 'localhost', '::1'):
+            raise ValueError(f"The daemon only listens on loopback addresses, not '{host}'.")
+        server = _TCPServer(target, _Handler)
+        server.token = secrets.token_hex(16)
+        token_path = DAEMON_CONFIG['token_path']
+        os.makedirs(os.path.dirname(os.path.abspath(token_path)), exist_ok=True)
+        descriptor = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as token_file:
+            token_file.write(server.token)
+    server.service = service
+    return server
+
+def _is_listening(address: str) -> bool:
+    try:
+        DaemonClient(address, timeout=1.0).close()
+    except OSError:
+        return False
+    return True
+
+def _sync_periodically(service: DaemonService, stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        try:
+            service.sync()
+        except Exception as error:  # Retried on the next tick; requests sync on their own meanwhile
+            logger.warning(f"Background index sync failed: {error}")
+
+def serve(address: str = DAEMON_CONFIG['address'], ready: Optional[Callable[[], None]] = None) -> int:
+    """
+    Run the daemon until it is asked to shut down or interrupted.
+
+    Args:
+        address (str): Unix socket path, or host:port for TCP
+        ready (Callable): Called once the index is warm and the socket bound
+
+    Returns:
+        int: Exit status.
+    """
+    import functools
+    import signal
+
+    from drivelabels.core.drive_manager import DriveManager
+    from drivelabels.core.label_catalog import LabelCatalog
+    from drivelabels.core.response_cache import ResponseCache
+    from drivelabels.core.tag_backends import BACKEND_LABELS, LabelsBackend, create_tag_backend
+    from drivelabels.core.tag_index import TagIndex
+    from drivelabels.utils.auth import (
+        LazyService,
+        build_drive_service,
+        build_labels_service,
+        get_credentials,
+        save_credentials
+    )
+    from drivelabels.utils.session_pool import SessionPool
+
+    creds = get_credentials()
+    # The pool only refreshes the token here; each manager holds its own clients
+    session_pool = SessionPool(creds, on_refresh=save_credentials).start()
+    tag_index = TagIndex(INDEX_CONFIG['path'])
+    response_cache = ResponseCache()
+
+    # Requests only sync themselves if the background sync has fallen behind
+    def manager_factory(sync_interval: float = 2 * DAEMON_CONFIG['sync_interval']) -> DriveManager:
+        # Neither client may be used by two threads at once, and a catalog
+        # locks out its other users while it calls the Labels API, so every
+        # manager gets its own Labels client and, for the labels backend, catalog
+        labels_service = LazyService(functools.partial(build_labels_service, creds))
+        if TAG_CONFIG['backend'] == BACKEND_LABELS:
+            tag_backend = LabelsBackend(LabelCatalog(labels_service))
+        else:
+            tag_backend = create_tag_backend()
+        return DriveManager(
+            build_drive_service(creds),
+            labels_service,
+            tag_index,
+            tag_backend=tag_backend,
+            response_cache=response_cache,
+            sync_interval=sync_interval
+        )
+
+    service = DaemonService(manager_factory, tag_index, stats=lambda: {'sessions': session_pool.stats()})
+    stop = threading.Event()
+    server = None
+    try:
+        started = time.monotonic()
+        service.sync()
+        # Warm the vocabulary as well, so the first search does not load it
+        tag_index.vocabulary()
+        server = create_server(address, service)
+        threading.Thread(
+            target=_sync_periodically,
+            args=(service, stop, DAEMON_CONFIG['sync_interval']),
+            name='daemon-sync',
+            daemon=True
+        ).start()
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+        logger.info(f"Daemon listening at {address}, warm in {time.monotonic() - started:.1f}s.")
+        if ready is not None:
+            ready()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if server is not None:
+            server.server_close()
+            family, target = parse_address(address)
+            if family == socket.AF_UNIX and os.path.exists(target):
+                os.unlink(target)
+        service.close()
+        tag_index.close()
+        session_pool.stop()
+        logger.info("Daemon stopped.")
+    return 0
@@ -0,0 +1,285 @@
+"""
+Streaming tag-change jobs shared by the headless CLI and the daemon client.
+
+Input parsing, progress reporting, NDJSON output and the ChangeRunner that
+applies changes in parallel batches through any object with an
+apply_tag_changes method. Nothing here imports the Google client
+libraries, so drivelabels.client stays thin.
+"""
+import csv
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from drivelabels.config.settings import CLI_CONFIG
+# Re-exported, so callers need no other module for the result statuses
+from drivelabels.core.status import STATUS_FAILED, STATUS_UNCHANGED, STATUS_UPDATED
+
+logger = logging.getLogger(__name__)
+
+STATUS_INVALID = 'invalid'
+# ChangeRunner operation replacing each file's tags, used by import
+OPERATION_SET = 'set'
+# ChangeRunner operation removing every spelling of the tags, used by untag --all-spellings
+OPERATION_REMOVE_SPELLINGS = 'remove_spellings'
+ID_FIELDS = ('id', 'file_id', 'fileId')
+
+class Progress:
+    """Counts results and periodically reports throughput on stderr."""
+
+    def __init__(self, label: str, interval: float = CLI_CONFIG['progress_interval'], stream: Optional[TextIO] = None):
+        """
+        Initialize the reporter.
+
+        Args:
+            label (str): Name of the operation shown in reports
+            interval (float): Seconds between reports, 0 to report only at the end
+            stream (TextIO): Where to report, defaults to stderr
+        """
+        self.label = label
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.lines = 0
+        self.counts: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self._reported = self.started
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> int:
+        """Number of results recorded so far."""
+        return sum(self.counts.values())
+
+    def record(self, status: str):
+        """
+        Count one result and report if the interval has passed.
+
+        Args:
+            status (str): Result status
+        """
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            now = time.monotonic()
+            if self.interval and now - self._reported >= self.interval:
+                self._reported = now
+                self._report(now, final=False)
+
+    def finish(self):
+        """Write the final summary."""
+        with self._lock:
+            self._report(time.monotonic(), final=True)
+
+    def _report(self, now: float, final: bool):
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        counts = ', '.join(f"{count} {status}" for status, count in sorted(self.counts.items()))
+        read = f"{self.lines} lines read, " if self.lines else ''
+        line = f"{self.label}: {read}{self.done} files done ({counts or 'none'}), {rate:.1f} files/s"
+        if final:
+            line += f" in {elapsed:.1f}s"
+        # Overwrite the line in place on a terminal, log one per report otherwise
+        if self.stream.isatty() and not final:
+            self.stream.write(f"\r{line}")
+        else:
+            self.stream.write(f"\r{line}\n" if self.stream.isatty() else f"{line}\n")
+        self.stream.flush()
+
+def parse_line(line: str, default_tags: List[str]) -> Tuple[str, List[str]]:
+    """
+    Parse one input line into a file ID and its tags.
+
+    Args:
+        line (str): A CSV line (`file_id,tag,...`) or an NDJSON object
+        default_tags (List[str]): Tags added to every line, e.g. from --tag
+
+    Returns:
+        Tuple[str, List[str]]: File ID and tags.
+
+    Raises:
+        ValueError: If the line has no file ID or no tags.
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        item = json.loads(line)
+        file_id = next((item[field] for field in ID_FIELDS if item.get(field)), None)
+        tags = item.get('tags') or ([item['tag']] if item.get('tag') else [])
+        if isinstance(tags, str):
+            tags = [tags]
+    else:
+        cells = [cell.strip() for cell in next(csv.reader([line]))]
+        file_id, tags = (cells[0] if cells else None), cells[1:]
+    tags = [tag for tag in list(default_tags) + list(tags) if tag]
+    if not file_id:
+        raise ValueError("missing file ID")
+    if not tags:
+        raise ValueError("no tags given")
+    return file_id, tags
+
+def read_restores(rows: Iterable[Tuple[int, Optional[str], List[str]]], progress: Progress, emit) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Stream (file_id, tags) pairs from snapshot rows, reporting invalid ones.
+
+    Args:
+        rows (Iterable[Tuple]): Rows from snapshot.read_snapshot
+        progress (Progress): Progress reporter
+        emit (Callable): Writes one result dictionary
+
+    Yields:
+        Tuple[str, List[str]]: File ID and the complete tags it should carry.
+    """
+    for number, file_id, tags in rows:
+        progress.lines = number
+        if file_id is None:
+            emit({'line': number, 'status': STATUS_INVALID, 'error': "missing file ID"})
+            progress.record(STATUS_INVALID)
+            continue
+        yield file_id, tags
+
+def read_changes(lines: Iterable[str], default_tags: List[str], progress: Progress, emit) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Stream (file_id, tags) pairs from input lines, reporting invalid ones.
+
+    Blank lines, '#' comments and a CSV header row are skipped.
+
+    Args:
+        lines (Iterable[str]): Input lines
+        default_tags (List[str]): Tags added to every line
+        progress (Progress): Progress reporter
+        emit (Callable): Writes one result dictionary
+
+    Yields:
+        Tuple[str, List[str]]: File ID and tags.
+    """
+    for number, line in enumerate(lines, 1):
+        progress.lines = number
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        if number == 1 and line.split(',', 1)[0].strip() in ID_FIELDS:
+            continue
+        try:
+            yield parse_line(line, default_tags)
+        except ValueError as error:
+            emit({'line': number, 'status': STATUS_INVALID, 'error': str(error)})
+            progress.record(STATUS_INVALID)
+
+class ChangeRunner:
+    """Applies a stream of tag changes in parallel batches."""
+
+    def __init__(self, manager_factory, operation: str, jobs: int = CLI_CONFIG['jobs'], chunk_size: int = CLI_CONFIG['chunk_size']):
+        """
+        Initialize the runner.
+
+        Args:
+            manager_factory (Callable): Returns a DriveManager; called once per worker
+                thread so every worker uses its own connection
+            operation (str): 'add', 'remove' (exact spellings),
+                OPERATION_REMOVE_SPELLINGS (every spelling) or OPERATION_SET
+                to replace each file's tags with the given ones
+            jobs (int): Batches in flight at once
+            chunk_size (int): Files per batch
+        """
+        self.manager_factory = manager_factory
+        self.operation = operation
+        self.jobs = jobs
+        self.chunk_size = chunk_size
+        self._local = threading.local()
+
+    def run(self, changes: Iterable[Tuple[str, List[str]]], emit, progress: Progress):
+        """
+        Apply every change and emit one result per file and batch.
+
+        Files are sharded by ID and each shard's batches run one after the
+        other, so two batches never update the same file concurrently.
+        Memory use is bounded by jobs * chunk_size pending files.
+
+        Args:
+            changes (Iterable[Tuple[str, List[str]]]): (file_id, tags) pairs
+            emit (Callable): Writes one result dictionary
+            progress (Progress): Progress reporter
+        """
+        pending: List[Dict[str, Dict[str, None]]] = [{} for _ in range(self.jobs)]
+        in_flight: List[Optional[Future]] = [None] * self.jobs
+
+        def collect(futures: Iterable[Future]):
+            for future in futures:
+                for file_id, result in future.result():
+                    emit(dict({'id': file_id}, **result))
+                    progress.record(result['status'])
+
+        def submit(shard: int):
+            if in_flight[shard] is not None:
+                wait([in_flight[shard]])
+                collect([in_flight[shard]])
+            chunk, pending[shard] = pending[shard], {}
+            in_flight[shard] = executor.submit(self._apply, chunk)
+
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='drivelabels-cli') as executor:
+            for file_id, tags in changes:
+                shard = hash(file_id) % self.jobs
+                if self.operation == OPERATION_SET:
+                    # The last row for a file wins
+                    pending[shard][file_id] = dict.fromkeys(tags)
+                else:
+                    pending[shard].setdefault(file_id, {}).update(dict.fromkeys(tags))
+                if len(pending[shard]) >= self.chunk_size:
+                    submit(shard)
+                # Report finished batches promptly instead of when their shard fills again
+                for index, future in enumerate(in_flight):
+                    if future is not None and future.done():
+                        in_flight[index] = None
+                        collect([future])
+            for shard in range(self.jobs):
+                if pending[shard]:
+                    submit(shard)
+            remaining = [future for future in in_flight if future is not None]
+            while remaining:
+                done, _ = wait(remaining, return_when=FIRST_COMPLETED)
+                collect(done)
+                remaining = [future for future in remaining if future not in done]
+
+    def _apply(self, chunk: Dict[str, Dict[str, None]]) -> List[Tuple[str, Dict]]:
+        manager = getattr(self._local, 'manager', None)
+        if manager is None:
+            manager = self._local.manager = self.manager_factory()
+        if self.operation == OPERATION_SET:
+            results = manager.restore_tags({file_id: list(tags) for file_id, tags in chunk.items()})
+        else:
+            results = manager.apply_tag_changes(
+                {file_id: {self.operation: list(tags)} for file_id, tags in chunk.items()}
+            )
+        return [
+            (file_id, dict(result, tags=list(chunk[file_id])))
+            for file_id, result in results.items()
+        ]
+
+def change_operation(args) -> str:
+    """
+    ChangeRunner operation of a parsed tag or untag command.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments with command and, for untag, all_spellings
+
+    Returns:
+        str: 'add', 'remove' or OPERATION_REMOVE_SPELLINGS.
+    """
+    if args.command == 'tag':
+        return 'add'
+    return OPERATION_REMOVE_SPELLINGS if args.all_spellings else 'remove'
+
+def open_input(path: Optional[str]) -> TextIO:
+    """Open an input file, or stdin for None or '-'."""
+    return sys.stdin if path in (None, '-') else open(path, encoding='utf-8', newline='')
+
+def line_writer(stream: TextIO) -> Callable[[Dict], None]:
+    """Return a thread-safe function writing one JSON object per line to stream."""
+    lock = threading.Lock()
+
+    def emit(item: Dict):
+        line = json.dumps(item, ensure_ascii=False)
+        with lock:
+            stream.write(line + '\n')
+    return emit
@@ -0,0 +1,392 @@
+"""
+Sharded bulk tag jobs spread over a pool of credentials.
+
+A single credential is bound by its own per-user quota, so a large tag or
+untag job is split across several service accounts or user tokens. Files
+are sharded by a stable hash of their ID, and every shard goes to one
+worker process bound to one credential. Each worker has its own connections,
+rate limiter and token refresher, and applies its batches with a ChangeRunner
+exactly as the single-credential command does. Results and per-worker
+statistics flow back to the parent, which reports aggregated progress and
+writes the NDJSON results.
+"""
+import functools
+import logging
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Set, TextIO, Tuple
+
+from drivelabels.config.settings import CLI_CONFIG, CREDENTIAL_POOL_CONFIG, RATE_LIMIT_CONFIG, TAG_CONFIG
+from drivelabels.core.batch import STATUS_FAILED
+from drivelabels.jobs import ChangeRunner, Progress
+
+logger = logging.getLogger(__name__)
+
+# Messages sent from the workers to the parent
+MESSAGE_RESULTS = 'results'
+MESSAGE_DONE = 'done'
+
+def shard_of(file_id: str, shards: int) -> int:
+    """
+    Shard a file belongs to, the same in every process.
+
+    Args:
+        file_id (str): The ID of the file
+        shards (int): Number of shards
+
+    Returns:
+        int: Shard index in range(shards).
+    """
+    return zlib.crc32(file_id.encode('utf-8')) % shards
+
+def connect_credential(path: str, subject: Optional[str] = None) -> Tuple[Callable[[], object], object]:
+    """
+    Open the Drive connections of one pooled credential.
+
+    Args:
+        path (str): Credential file, see auth.load_credentials
+        subject (str): User a service account impersonates, if any
+
+    Returns:
+        Tuple[Callable, object]: A factory returning the calling thread's
+        Drive service, and a Drive Labels service.
+    """
+    from drivelabels.utils.auth import build_service, load_credentials, save_credentials
+    from drivelabels.utils.session_pool import SessionPool
+
+    creds = load_credentials(path, subject)
+    # Refreshed user tokens are written back to their pickle file
+    on_refresh = None if path.endswith('.json') else functools.partial(save_credentials, path=path)
+    pool = SessionPool(creds, on_refresh=on_refresh).start()
+    return pool.service, build_service('labels', creds)
+
+def _labels_backend(labels_service, rate_limiter=None):
+    from drivelabels.core.label_catalog import LabelCatalog
+    from drivelabels.core.tag_backends import LabelsBackend
+
+    return LabelsBackend(LabelCatalog(labels_service, rate_limiter=rate_limiter))
+
+def _worker_main(
+    index: int,
+    credential: str,
+    subject: Optional[str],
+    operation: str,
+    tasks,
+    results,
+    jobs: int,
+    chunk_size: int,
+    quota_per_minute: float,
+    connect: Callable
+):
+    """Body of one worker process: apply every chunk received on tasks."""
+    from drivelabels.core.drive_manager import DriveManager
+    from drivelabels.core.tag_backends import BACKEND_LABELS, create_tag_backend
+    from drivelabels.utils.metrics import get_metrics
+    from drivelabels.utils.rate_limit import RateLimiter
+
+    started = time.monotonic()
+    buffer: List[Tuple[str, Dict]] = []
+    files = 0
+
+    def emit(item: Dict):
+        nonlocal files
+        files += 1
+        buffer.append((item.pop('id'), item))
+        if len(buffer) >= chunk_size:
+            flush()
+
+    def flush():
+        if buffer:
+            results.put((MESSAGE_RESULTS, index, list(buffer)))
+            buffer.clear()
+
+    def changes():
+        while True:
+            # Report what is finished before waiting for more work
+            flush()
+            chunk = tasks.get()
+            if chunk is None:
+                return
+            yield from chunk
+
+    error = None
+    try:
+        service_factory, labels_service = connect(credential, subject)
+        # Each credential has its own quota, so each worker has its own limiter
+        limiter = RateLimiter(
+            rate=quota_per_minute / 60,
+            burst=RATE_LIMIT_CONFIG['burst'],
+            min_rate=RATE_LIMIT_CONFIG['min_rate'],
+            recovery=RATE_LIMIT_CONFIG['recovery'],
+            max_retries=RATE_LIMIT_CONFIG['max_retries'],
+            base_delay=RATE_LIMIT_CONFIG['base_delay'],
+            max_delay=RATE_LIMIT_CONFIG['max_delay']
+        )
+        if TAG_CONFIG['backend'] == BACKEND_LABELS:
+            tag_backend = _labels_backend(labels_service, limiter)
+        else:
+            tag_backend = create_tag_backend()
+        runner = ChangeRunner(
+            lambda: DriveManager(
+                service_factory(), None, rate_limiter=limiter, tag_backend=tag_backend, cache_responses=False
+            ),
+            operation,
+            jobs=jobs,
+            chunk_size=chunk_size
+        )
+        runner.run(changes(), emit, Progress(credential, interval=0))
+    except Exception as exc:  # Reported per file below; the parent decides the exit status
+        logger.exception(f"Worker {index} ({credential}) failed")
+        error = f"{type(exc).__name__}: {exc}"
+        flush()
+        # Keep draining so the parent never blocks on this worker's queue
+        while True:
+            chunk = tasks.get()
+            if chunk is None:
+                break
+            for file_id, tags in chunk:
+                emit({'id': file_id, 'status': STATUS_FAILED, 'error': error, 'tags': tags})
+    flush()
+    metrics = get_metrics()
+    results.put((MESSAGE_DONE, index, {
+        'credential': credential,
+        'files': files,
+        'seconds': time.monotonic() - started,
+        'calls': metrics.total_calls(),
+        'retries': sum(method['retries'] for method in metrics.snapshot()['methods'].values()),
+        'error': error
+    }))
+
+class ShardedJobRunner:
+    """Applies a stream of tag changes across one worker process per credential."""
+
+    def __init__(
+        self,
+        credentials: List[str],
+        operation: str,
+        subject: Optional[str] = CREDENTIAL_POOL_CONFIG['subject'],
+        jobs: int = CREDENTIAL_POOL_CONFIG['jobs'],
+        chunk_size: int = CLI_CONFIG['chunk_size'],
+        quota_per_minute: float = CREDENTIAL_POOL_CONFIG['quota_per_minute'],
+        queue_size: int = CREDENTIAL_POOL_CONFIG['queue_size'],
+        connect: Callable = connect_credential
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            credentials (List[str]): Credential files, one worker process each
+            operation (str): 'add', 'remove' or 'remove_spellings', as ChangeRunner takes
+            subject (str): User the service accounts impersonate, if any
+            jobs (int): Batches in flight in each worker
+            chunk_size (int): Files per batch
+            quota_per_minute (float): Request budget of each credential
+            queue_size (int): Chunks queued per worker before the reader waits,
+                which bounds memory use
+            connect (Callable): Called in each worker with (credential,
+                subject); returns a Drive service factory and a Labels
+                service. Must be picklable, i.e. a module-level function
+
+        Raises:
+            ValueError: If no credential is given.
+        """
+        if not credentials:
+            raise ValueError("A sharded job needs at least one credential.")
+        self.credentials = list(credentials)
+        self.operation = operation
+        self.subject = subject
+        self.jobs = jobs
+        self.chunk_size = chunk_size
+        self.quota_per_minute = quota_per_minute
+        self.queue_size = queue_size
+        self.connect = connect
+        self.worker_stats: List[Optional[Dict]] = [None] * len(self.credentials)
+        self._outstanding: List[Set[str]] = [set() for _ in self.credentials]
+        self._lock = threading.Lock()
+
+    def run(self, changes: Iterable[Tuple[str, List[str]]], emit, progress: Progress):
+        """
+        Apply every change and emit one result per file and batch.
+
+        A file always goes to the same worker, so two batches never update
+        it concurrently. Files of a worker that dies are reported as failed.
+
+        Args:
+            changes (Iterable[Tuple[str, List[str]]]): (file_id, tags) pairs
+            emit (Callable): Writes one result dictionary
+            progress (Progress): Progress reporter
+        """
+        # Spawned workers start clean instead of inheriting threads and sockets
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        tasks = [context.Queue(maxsize=self.queue_size) for _ in self.credentials]
+        workers = [
+            context.Process(
+                target=_worker_main,
+                args=(
+                    index, credential, self.subject, self.operation, tasks[index], results,
+                    self.jobs, self.chunk_size, self.quota_per_minute, self.connect
+                ),
+                name=f'drivelabels-shard-{index}',
+                daemon=True
+            )
+            for index, credential in enumerate(self.credentials)
+        ]
+        for worker in workers:
+            worker.start()
+        collector = threading.Thread(
+            target=self._collect, args=(workers, results, emit, progress), name='shard-collector', daemon=True
+        )
+        collector.start()
+
+        prepare = self._tag_preparer()
+        prepared: Set[str] = set()
+        pending: List[Dict[str, Dict[str, None]]] = [{} for _ in self.credentials]
+
+        def dispatch(shard: int):
+            chunk = [(file_id, list(tags)) for file_id, tags in pending[shard].items()]
+            pending[shard] = {}
+            if prepare is not None:
+                new_tags = {tag for _, tags in chunk for tag in tags}.difference(prepared)
+                if new_tags:
+                    # Created once here so the workers do not race to create them
+                    prepare(new_tags)
+                    prepared.update(new_tags)
+            with self._lock:
+                self._outstanding[shard].update(file_id for file_id, _ in chunk)
+            self._put(workers[shard], tasks[shard], chunk, emit, progress)
+
+        try:
+            for file_id, tags in changes:
+                shard = shard_of(file_id, len(workers))
+                pending[shard].setdefault(file_id, {}).update(dict.fromkeys(tags))
+                if len(pending[shard]) >= self.chunk_size:
+                    dispatch(shard)
+            for shard in range(len(workers)):
+                if pending[shard]:
+                    dispatch(shard)
+        finally:
+            for worker, task_queue in zip(workers, tasks):
+                self._put(worker, task_queue, None, emit, progress)
+            collector.join()
+            for worker in workers:
+                worker.join()
+        self._log_summary()
+
+    def summary(self) -> List[Dict]:
+        """
+        Statistics of each worker once run() returned.
+
+        Returns:
+            List[Dict]: Per credential: 'credential', 'files', 'seconds',
+            API 'calls', 'retries' and the 'error' that stopped it, if any.
+        """
+        return [
+            stats or {'credential': credential, 'files': 0, 'seconds': 0.0, 'calls': 0, 'retries': 0,
+                      'error': 'worker exited unexpectedly'}
+            for credential, stats in zip(self.credentials, self.worker_stats)
+        ]
+
+    def write_summary(self, stream: Optional[TextIO] = None):
+        """
+        Print one throughput line per credential.
+
+        Args:
+            stream (TextIO): Where to write, defaults to stderr
+        """
+        stream = stream or sys.stderr
+        for line in self._summary_lines():
+            stream.write(line + '\n')
+        stream.flush()
+
+    def _tag_preparer(self) -> Optional[Callable[[Iterable[str]], None]]:
+        from drivelabels.core.tag_backends import BACKEND_LABELS
+
+        if self.operation != 'add' or TAG_CONFIG['backend'] != BACKEND_LABELS:
+            return None
+        backend = None
+
+        def prepare(tags: Iterable[str]):
+            nonlocal backend
+            if backend is None:
+                _, labels_service = self.connect(self.credentials[0], self.subject)
+                backend = _labels_backend(labels_service)
+            backend.prepare(tags)
+        return prepare
+
+    def _put(self, worker, task_queue, chunk, emit, progress: Progress):
+        # A dead worker would never take the chunk, so fail it instead of blocking
+        while True:
+            try:
+                task_queue.put(chunk, timeout=1.0)
+                return
+            except queue.Full:
+                if worker.is_alive():
+                    continue
+            if chunk is not None:
+                self._fail([file_id for file_id, _ in chunk], f"{worker.name} is not running", emit, progress)
+            return
+
+    def _collect(self, workers, results, emit, progress: Progress):
+        running = set(range(len(workers)))
+        while running:
+            try:
+                message = results.get(timeout=1.0)
+            except queue.Empty:
+                for index in [index for index in running if not workers[index].is_alive()]:
+                    # Take whatever it sent before exiting, then fail the rest
+                    try:
+                        while True:
+                            self._handle(results.get(timeout=0.1), running, emit, progress)
+                    except queue.Empty:
+                        pass
+                    if index in running:
+                        running.discard(index)
+                        with self._lock:
+                            lost, self._outstanding[index] = list(self._outstanding[index]), set()
+                        logger.error(f"{workers[index].name} exited with code {workers[index].exitcode}.")
+                        self._fail(lost, f"worker exited with code {workers[index].exitcode}", emit, progress)
+                continue
+            self._handle(message, running, emit, progress)
+
+    def _handle(self, message, running: Set[int], emit, progress: Progress):
+        kind, index, payload = message
+        if kind == MESSAGE_DONE:
+            self.worker_stats[index] = payload
+            running.discard(index)
+            # Files taken by a worker that stopped early never got a result
+            with self._lock:
+                lost, self._outstanding[index] = list(self._outstanding[index]), set()
+            self._fail(lost, payload['error'] or "no result from worker", emit, progress)
+            return
+        with self._lock:
+            self._outstanding[index].difference_update(file_id for file_id, _ in payload)
+        for file_id, result in payload:
+            emit(dict({'id': file_id}, **result))
+            progress.record(result['status'])
+
+    def _fail(self, file_ids: List[str], error: str, emit, progress: Progress):
+        for file_id in file_ids:
+            emit({'id': file_id, 'status': STATUS_FAILED, 'error': error})
+            progress.record(STATUS_FAILED)
+
+    def _summary_lines(self) -> List[str]:
+        lines = []
+        for stats in self.summary():
+            rate = stats['files'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+            line = (
+                f"{stats['credential']}: {stats['files']} files, {rate:.1f} files/s, "
+                f"{stats['calls']} calls, {stats['retries']} retries"
+            )
+            if stats['error']:
+                line += f", failed: {stats['error']}"
+            lines.append(line)
+        return lines
+
+    def _log_summary(self):
+        for line in self._summary_lines():
+            logger.info(f"Sharded {self.operation}: {line}")
@@ -1,19 +1,32 @@
 """
 Authentication utilities for Google Drive API.
+
+The Google client libraries are slow to import, so they are imported inside
+the functions that need them and discovery documents are loaded once per
+process from the copies bundled with googleapiclient (or a local cache)
+instead of being fetched on every start.
 """
+import functools
+import json
+import logging
 import pickle
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import threading
+import time
+import urllib.parse
+from typing import Callable, Dict, Optional
 import os
 
-from drivelabels.config.settings import SCOPES, API_CONFIG
+from drivelabels.config.settings import SCOPES, API_CONFIG, CACHE_DIR
+from drivelabels.utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_CACHE_DIR = os.path.join(CACHE_DIR, 'discovery')
 
 def get_credentials():
     """
     Get or refresh Google API credentials.
-    
+
     Returns:
         Credentials: The OAuth2 credentials object.
     """
@@ -21,40 +34,253 @@ def get_credentials():
     if os.path.exists('token.pickle'):
         with open('token.pickle', 'rb') as token:
             creds = pickle.load(token)
-    
+
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+            from google.auth.transport.requests import Request
+            with get_metrics().measure(None, 'oauth2.token.refresh'):
+                creds.refresh(Request())
         else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
             flow = InstalledAppFlow.from_client_secrets_file(
                 'credentials.json', SCOPES)
             creds = flow.run_local_server(port=0)
-        
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-    
+
+        save_credentials(creds)
+
     return creds
 
+def save_credentials(creds, path: str = 'token.pickle'):
+    """
+    Persist credentials to a pickle file, e.g. after a background refresh.
+
+    Args:
+        creds (Credentials): OAuth2 credentials object.
+        path (str): Token file, token.pickle by default
+    """
+    with open(path, 'wb') as token:
+        pickle.dump(creds, token)
+
+def load_credentials(path: str, subject: Optional[str] = None):
+    """
+    Load one credential of a credential pool.
+
+    Args:
+        path (str): A service-account key file (.json with type
+            'service_account'), an authorized-user token file (.json), or a
+            pickled token such as token.pickle
+        subject (str): User a service account impersonates through
+            domain-wide delegation; without it the service account acts as
+            itself and needs access to the folders
+
+    Returns:
+        Credentials: The credentials; user tokens are refreshed if expired.
+
+    Raises:
+        ValueError: If the file holds no usable credentials.
+    """
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as key_file:
+            info = json.load(key_file)
+        if info.get('type') == 'service_account':
+            from google.oauth2 import service_account
+            creds = service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+            return creds.with_subject(subject) if subject else creds
+        if info.get('type') == 'authorized_user':
+            from google.oauth2.credentials import Credentials
+            creds = Credentials.from_authorized_user_info(info, SCOPES)
+        else:
+            raise ValueError(f"'{path}' is neither a service-account key nor an authorized-user token.")
+    else:
+        with open(path, 'rb') as token:
+            creds = pickle.load(token)
+
+    if not creds.valid:
+        if not getattr(creds, 'refresh_token', None):
+            raise ValueError(f"The token in '{path}' has expired and cannot be refreshed.")
+        from google.auth.transport.requests import Request
+        with get_metrics().measure(None, 'oauth2.token.refresh'):
+            creds.refresh(Request())
+        if not path.endswith('.json'):
+            save_credentials(creds, path)
+    return creds
+
+@functools.lru_cache(maxsize=None)
+def discovery_document(service: str, version: str) -> Dict:
+    """
+    Load a discovery document without a network round trip when possible.
+
+    The copy bundled with googleapiclient is preferred, then one cached under
+    CACHE_DIR; only if neither exists is the document downloaded (and cached).
+    The parsed document is memoized, so later builds skip the JSON parse too.
+
+    Args:
+        service (str): API name, e.g. 'drive'
+        version (str): API version, e.g. 'v3'
+
+    Returns:
+        Dict: The parsed discovery document.
+
+    Raises:
+        HttpError: If the document has to be downloaded and the request fails.
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    content = get_static_doc(service, version)
+    if content is None:
+        path = os.path.join(DISCOVERY_CACHE_DIR, f'{service}.{version}.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as cached:
+                content = cached.read()
+        else:
+            content = _download_discovery_document(service, version)
+            os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as cached:
+                cached.write(content)
+    return json.loads(content)
+
+def _download_discovery_document(service: str, version: str) -> str:
+    import httplib2
+    from googleapiclient.discovery import V2_DISCOVERY_URI
+    from googleapiclient.errors import HttpError
+
+    uri = V2_DISCOVERY_URI.format(api=service, apiVersion=version)
+    logger.info(f"Downloading discovery document for {service} {version}.")
+    started = time.perf_counter()
+    response, content = httplib2.Http().request(uri)
+    get_metrics().observe(
+        'discovery.get', time.perf_counter() - started,
+        response.status if response.status >= 400 else None, bytes_received=len(content)
+    )
+    if response.status >= 400:
+        raise HttpError(response, content, uri=uri)
+    return content.decode('utf-8')
+
+def build_service(api: str, creds=None, http=None, api_endpoint: Optional[str] = None):
+    """
+    Build a service for one of the APIs in API_CONFIG from its cached document.
+
+    Args:
+        api (str): Key in API_CONFIG, e.g. 'drive' or 'labels'
+        creds (Credentials): OAuth2 credentials, unless http is already authorized
+        http: Optional authorized HTTP object to use instead of creds
+        api_endpoint (str): Optional base URL override, which batch requests
+            follow as well
+
+    Returns:
+        Resource: Google API service object.
+    """
+    from googleapiclient.discovery import build_from_document
+
+    config = API_CONFIG[api]
+    document = discovery_document(config['service'], config['version'])
+    if api_endpoint:
+        # Batch requests are sent to rootUrl rather than the endpoint, so move it
+        # too, on a copy as the memoized document is shared
+        document = dict(document)
+        parsed = urllib.parse.urlsplit(api_endpoint)
+        document['rootUrl'] = f'{parsed.scheme}://{parsed.netloc}/'
+    return build_from_document(
+        document,
+        http=http,
+        credentials=creds if http is None else None,
+        client_options={'api_endpoint': api_endpoint} if api_endpoint else None
+    )
+
+class LazyService:
+    """Stand-in for a service object that is only built on first use."""
+
+    def __init__(self, factory: Callable[[], object]):
+        """
+        Initialize the proxy.
+
+        Args:
+            factory (Callable): Builds the real service
+        """
+        self._factory = factory
+        self._service = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        """Whether the real service has been built yet."""
+        return self._service is not None
+
+    def warm(self) -> 'LazyService':
+        """
+        Start building the service on a background thread.
+
+        Returns:
+            LazyService: self, for chaining.
+        """
+        threading.Thread(target=self._get, name='service-warmup', daemon=True).start()
+        return self
+
+    def _get(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = self._factory()
+        return self._service
+
+    def __getattr__(self, name: str):
+        return getattr(self._get(), name)
+
 def get_services(creds):
     """
     Initialize Google API services.
-    
+
+    Both services are returned as LazyService proxies: the Drive service is
+    built on a background thread so the menu can be shown meanwhile, and the
+    labels service costs nothing unless something actually calls it.
+
     Args:
         creds (Credentials): OAuth2 credentials object.
-    
+
     Returns:
         tuple: (drive_service, labels_service) Google API service objects.
     """
-    drive_service = build(
-        API_CONFIG['drive']['service'],
-        API_CONFIG['drive']['version'],
-        credentials=creds
-    )
-    
-    labels_service = build(
-        API_CONFIG['labels']['service'],
-        API_CONFIG['labels']['version'],
-        credentials=creds
+    drive_service = LazyService(functools.partial(build_service, 'drive', creds)).warm()
+    labels_service = LazyService(functools.partial(build_service, 'labels', creds))
+    return drive_service, labels_service
+
+def build_drive_service(creds, api_endpoint: Optional[str] = None):
+    """
+    Build a Drive service with its own HTTP connection.
+
+    httplib2 connections are not thread-safe, so concurrent callers should
+    each hold a service built by this function.
+
+    Args:
+        creds (Credentials): OAuth2 credentials object.
+        api_endpoint (str): Optional base URL, e.g. a local fake Drive endpoint.
+
+    Returns:
+        Resource: Google Drive API service object.
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+
+    return build_service(
+        'drive',
+        http=AuthorizedHttp(creds, http=httplib2.Http()),
+        api_endpoint=api_endpoint
     )
-    
-    return drive_service, labels_service 
\ No newline at end of file
+
+def build_labels_service(creds):
+    """
+    Build a Drive Labels service with its own HTTP connection.
+
+    Like build_drive_service, for callers that use the Labels API from
+    several threads.
+
+    Args:
+        creds (Credentials): OAuth2 credentials object.
+
+    Returns:
+        Resource: Google Drive Labels API service object.
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+
+    return build_service('labels', http=AuthorizedHttp(creds, http=httplib2.Http()))
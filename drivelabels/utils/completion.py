@@ -0,0 +1,51 @@
+"""
+Tab completion for interactive prompts.
+
+Prompts read lines through input(), so completion is provided by the
+readline module where the platform has one; elsewhere prompts simply work
+without it.
+"""
+import contextlib
+from typing import Callable, Iterator, List
+
+try:
+    import readline
+except ImportError:  # Windows without pyreadline
+    readline = None
+
+@contextlib.contextmanager
+def completion(complete: Callable[[str], List[str]]) -> Iterator[bool]:
+    """
+    Complete the whole input line with Tab while the block runs.
+
+    Args:
+        complete (Callable): Returns the candidates for the text typed so far
+
+    Yields:
+        bool: True if completion is available on this platform.
+    """
+    if readline is None:
+        yield False
+        return
+
+    candidates: List[str] = []
+
+    def completer(text: str, state: int):
+        nonlocal candidates
+        if state == 0:
+            candidates = complete(readline.get_line_buffer())
+        return candidates[state] if state < len(candidates) else None
+
+    previous, delims = readline.get_completer(), readline.get_completer_delims()
+    readline.set_completer(completer)
+    # Tags may contain spaces and punctuation, so the line is one word
+    readline.set_completer_delims('')
+    if 'libedit' in (readline.__doc__ or ''):
+        readline.parse_and_bind('bind ^I rl_complete')
+    else:
+        readline.parse_and_bind('tab: complete')
+    try:
+        yield True
+    finally:
+        readline.set_completer(previous)
+        readline.set_completer_delims(delims)
@@ -1,53 +1,203 @@
 """
 Display utilities for formatting console output.
 """
-from typing import List, Dict
-from rich.console import Console
-from rich.table import Table
+import functools
+from typing import Dict, Iterable, Iterator, List
 
 from drivelabels.config.settings import TABLE_CONFIG
+from drivelabels.core.models import FileRecord
 
-console = Console()
+_use_stderr = False
 
-def display_files(files: List[Dict]) -> List[Dict]:
+@functools.lru_cache(maxsize=None)
+def get_console():
     """
-    Display files in a formatted table with numbers.
-    
-    Args:
-        files (List[Dict]): List of file metadata dictionaries.
-        
+    Shared rich console, created on first use.
+
+    rich is imported here rather than at module level so that importing the
+    core modules (which report errors through this module) stays cheap.
+
     Returns:
-        List[Dict]: The same list of files for further processing
+        Console: The console instance.
     """
-    table = Table(show_header=True, header_style="bold magenta", show_lines=True)
+    from rich.console import Console
+    return Console(stderr=_use_stderr)
+
+def use_stderr():
+    """Send all messages to stderr, leaving stdout free for machine-readable output."""
+    global _use_stderr
+    _use_stderr = True
+    get_console.cache_clear()
+
+def _file_table(rows: List[FileRecord], first_number: int, show_header: bool):
+    from rich.table import Table
+
+    table = Table(show_header=show_header, header_style="bold magenta", show_lines=True)
     table.add_column("No.", width=4, justify="right", style="cyan", header_style="bold cyan")
     table.add_column("ID", width=TABLE_CONFIG['id_width'], style="dim")
     table.add_column("Name", width=TABLE_CONFIG['name_width'])
     table.add_column("Type", width=TABLE_CONFIG['type_width'], style="dim")
     table.add_column("Tags", width=TABLE_CONFIG['labels_width'], style="green")
-    
-    for idx, file in enumerate(files, 1):
-        properties = file.get('properties', {})
-        tags = properties.get('tags', '').split(',')
-        tags = [tag.strip() for tag in tags if tag.strip()]
+
+    for idx, file in enumerate(rows, first_number):
+        tags = file.tags
         tag_str = ', '.join(tags) if tags else 'No tags'
         table.add_row(
             f"[cyan]{idx}[/cyan]",
-            file['id'],
-            file['name'],
-            file['mimeType'],
+            file.id,
+            file.name,
+            file.mime_type,
             tag_str
         )
-    
-    console.print(table)
-    return files
+    return table
+
+def _tsv_field(value: str) -> str:
+    return value.replace('\t', ' ').replace('\n', ' ')
+
+def _display_tsv(files: Iterable[FileRecord], console) -> List[FileRecord]:
+    out = console.file
+    out.write("No.\tID\tName\tType\tTags\n")
+    shown = []
+    for idx, file in enumerate(files, 1):
+        out.write(
+            f"{idx}\t{file.id}\t{_tsv_field(file.name)}\t{file.mime_type}\t"
+            f"{_tsv_field(','.join(file.tags))}\n"
+        )
+        shown.append(file)
+    out.flush()
+    return shown
+
+def display_files(files: Iterable[FileRecord], page_size: int = TABLE_CONFIG['page_size']) -> List[FileRecord]:
+    """
+    Display files in a formatted table with numbers.
+
+    Rows are rendered a page at a time as the iterable yields them, so the
+    first rows appear immediately however many files follow. When output is
+    not a terminal, plain tab-separated lines are written instead.
+
+    Args:
+        files (Iterable[FileRecord]): File records, e.g. a streaming listing.
+        page_size (int): Rows rendered per table.
+
+    Returns:
+        List[FileRecord]: The displayed files for further processing
+    """
+    console = get_console()
+    if not console.is_terminal:
+        return _display_tsv(files, console)
+
+    shown: List[FileRecord] = []
+    for page in _pages(files, page_size):
+        console.print(_file_table(page, len(shown) + 1, show_header=not shown))
+        shown.extend(page)
+    if not shown:
+        console.print(_file_table([], 1, show_header=True))
+    return shown
+
+def page_files(files: Iterable[FileRecord], page_size: int = TABLE_CONFIG['page_size']) -> List[FileRecord]:
+    """
+    Browse files interactively one page at a time.
+
+    Only the page on screen is rendered, and the iterable is consumed no
+    further than the pages visited so far. Falls back to display_files when
+    output is not a terminal.
+
+    Args:
+        files (Iterable[FileRecord]): File records, e.g. a streaming listing.
+        page_size (int): Rows per screen.
+
+    Returns:
+        List[FileRecord]: The files loaded while browsing.
+    """
+    console = get_console()
+    if not console.is_terminal:
+        return display_files(files, page_size)
+
+    iterator = iter(files)
+    loaded: List[FileRecord] = []
+    exhausted = False
+    page = 0
+    while True:
+        while not exhausted and len(loaded) < (page + 1) * page_size:
+            try:
+                loaded.append(next(iterator))
+            except StopIteration:
+                exhausted = True
+        # Stay on the last page once the listing is known to end there
+        last_page = max(0, (len(loaded) - 1) // page_size)
+        page = min(page, last_page) if exhausted else page
+        start = page * page_size
+        rows = loaded[start:start + page_size]
+
+        console.print(_file_table(rows, start + 1, show_header=True))
+        total = f" of {last_page + 1}" if exhausted else ''
+        console.print(f"Page {page + 1}{total}, files {start + 1 if rows else 0}-{start + len(rows)}")
+        if exhausted and last_page == 0:
+            return loaded
+
+        answer = console.input("[n]ext, [p]revious, page number or [q]uit: ").strip().lower()
+        if answer in ('q', 'quit'):
+            return loaded
+        if answer in ('', 'n', 'next'):
+            page += 1
+        elif answer in ('p', 'prev', 'previous'):
+            page = max(0, page - 1)
+        elif answer.isdigit() and int(answer) > 0:
+            page = int(answer) - 1
+        else:
+            display_error(f"Unknown command '{answer}'")
+
+def _pages(files: Iterable[FileRecord], page_size: int) -> Iterator[List[FileRecord]]:
+    page = []
+    for file in files:
+        page.append(file)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def display_tag_stats(summary: Dict, console=None):
+    """
+    Display the tag vocabulary report of the tags --stats command.
+
+    Args:
+        summary (Dict): Report from TagVocabulary.summary()
+        console (Console): Where to print, defaults to the shared console
+    """
+    from rich.table import Table
+
+    console = console or get_console()
+    console.print(
+        f"{summary['tags']} tags ({summary['spellings']} spellings, normalization "
+        f"'{summary['normalization']}') on {summary['assignments']} file/tag pairs; "
+        f"{summary['singletons']} tags are used on a single file."
+    )
+
+    top = Table(title="Most used tags", header_style="bold magenta")
+    top.add_column("Tag", style="green")
+    top.add_column("Files", justify="right")
+    for entry in summary['top']:
+        top.add_row(entry['tag'], str(entry['files']))
+    console.print(top)
+
+    if summary['variants']:
+        variants = Table(title="Tags written with several spellings", header_style="bold magenta")
+        variants.add_column("Tag", style="green")
+        variants.add_column("Files", justify="right")
+        variants.add_column("Spellings (files)", style="yellow")
+        for entry in summary['variants']:
+            spellings = ', '.join(f"{tag} ({count})" for tag, count in entry['variants'].items())
+            variants.add_row(entry['tag'], str(entry['files']), spellings)
+        console.print(variants)
 
 def display_menu():
     """Display the main menu options."""
+    console = get_console()
     console.print("\nGoogle Drive Tag Manager")
     console.print("1. List all files")
     console.print("2. Add tag to file")
-    console.print("3. Search files by tag")
+    console.print("3. Search files by tag or query")
     console.print("4. Remove tag from file")
     console.print("5. Exit")
 
@@ -58,7 +208,7 @@ def display_success(message: str):
     Args:
         message (str): The success message to display.
     """
-    console.print(f"[green]✓ {message}[/green]")
+    get_console().print(f"[green]✓ {message}[/green]")
 
 def display_error(message: str):
     """
@@ -67,7 +217,7 @@ def display_error(message: str):
     Args:
         message (str): The error message to display.
     """
-    console.print(f"[red]✗ {message}[/red]")
+    get_console().print(f"[red]✗ {message}[/red]")
 
 def display_warning(message: str):
     """
@@ -76,4 +226,4 @@ def display_warning(message: str):
     Args:
         message (str): The warning message to display.
     """
-    console.print(f"[yellow]⚠ {message}[/yellow]") 
\ No newline at end of file
+    get_console().print(f"[yellow]⚠ {message}[/yellow]") 
\ No newline at end of file
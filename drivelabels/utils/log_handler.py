@@ -0,0 +1,70 @@
+"""
+Non-blocking structured logging.
+
+Log records are put on an in-memory queue by a QueueHandler and written to
+the log file as JSON lines by a QueueListener thread, so logging never
+blocks a request thread on file I/O. Fields passed through `extra=` (for
+example the per-call fields of the metrics module) become JSON keys.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import time
+from typing import Optional
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+                    + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+def configure_logging(path: str, level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue to a JSON-lines file writer.
+
+    Calling it again has no effect; the listener is flushed and stopped at
+    interpreter exit.
+
+    Args:
+        path (str): Log file path
+        level (int): Root logger level
+
+    Returns:
+        QueueListener: The listener thread writing the file.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    file_handler = logging.FileHandler(path, encoding='utf-8', delay=True)
+    file_handler.setFormatter(JsonFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
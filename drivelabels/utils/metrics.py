@@ -0,0 +1,366 @@
+"""
+Per-API-method call instrumentation.
+
+Every request executed through the rate limiter, every batch and every
+token refresh is recorded here: call counts by outcome, a latency histogram,
+bytes sent and received, retries and errors by HTTP status. The registry can
+be exported in the Prometheus text format or as a JSON snapshot, and each
+call is also logged as a structured DEBUG record.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from drivelabels.config.settings import RATE_LIMIT_CONFIG, METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Name of the batch round trip itself; its sub-requests are recorded under
+# their own methods and are what counts against the quota
+BATCH_METHOD = 'batch'
+
+OUTCOME_OK = 'ok'
+OUTCOME_ERROR = 'error'
+
+def method_name(request) -> str:
+    """
+    Name of the API method behind a request, e.g. 'drive.files.list'.
+
+    Args:
+        request: An HttpRequest (or anything with an execute() method)
+
+    Returns:
+        str: The discovery method ID, or a best-effort fallback.
+    """
+    return (
+        getattr(request, 'methodId', None)
+        or getattr(request, 'method', None)
+        or type(request).__name__
+    )
+
+class _MethodStats:
+    __slots__ = ('calls', 'buckets', 'latency_sum', 'bytes_sent', 'bytes_received', 'retries', 'errors')
+
+    def __init__(self):
+        self.calls = {OUTCOME_OK: 0, OUTCOME_ERROR: 0}
+        # One counter per bucket plus +Inf, non-cumulative
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.errors: Dict[str, int] = {}
+
+class Metrics:
+    """Thread-safe registry of per-method API call statistics."""
+
+    def __init__(self, window: float = 60.0):
+        """
+        Initialize an empty registry.
+
+        Args:
+            window (float): Seconds covered by the recent-calls gauge used to
+                compare request volume against the per-minute quota
+        """
+        self.window = window
+        self._methods: Dict[str, _MethodStats] = {}
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        method: str,
+        seconds: float,
+        status: Optional[int] = None,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        calls: int = 1
+    ):
+        """
+        Record finished calls of one method.
+
+        Args:
+            method (str): API method name
+            seconds (float): Latency of the call
+            status (int): HTTP status of a failed call, None on success
+            bytes_sent (int): Request body size
+            bytes_received (int): Response body size
+            calls (int): Number of calls this observation stands for, e.g.
+                sub-requests sharing one batch round trip
+        """
+        now = time.monotonic()
+        outcome = OUTCOME_OK if status is None else OUTCOME_ERROR
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = _MethodStats()
+            stats.calls[outcome] += calls
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += calls
+            stats.latency_sum += seconds * calls
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            if status is not None:
+                stats.errors[str(status)] = stats.errors.get(str(status), 0) + calls
+            if method != BATCH_METHOD:
+                self._recent.extend([now] * calls)
+                self._expire(now)
+        logger.debug(
+            "api call",
+            extra={'method': method, 'seconds': round(seconds, 6), 'status': status or 200,
+                   'bytes_sent': bytes_sent, 'bytes_received': bytes_received, 'calls': calls}
+        )
+
+    def retry(self, method: str, count: int = 1):
+        """
+        Record retried calls of one method.
+
+        Args:
+            method (str): API method name
+            count (int): Number of retries
+        """
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = _MethodStats()
+            stats.retries += count
+
+    @contextmanager
+    def measure(self, request, method: Optional[str] = None) -> Iterator[None]:
+        """
+        Time one execute() of a request and record its outcome and sizes.
+
+        Args:
+            request: The request about to be executed
+            method (str): Name to record under, defaults to method_name(request)
+        """
+        method = method or method_name(request)
+        sizes = track_sizes(request)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            self.observe(method, time.perf_counter() - started, error_status(error), sizes[0], sizes[1])
+            raise
+        self.observe(method, time.perf_counter() - started, None, sizes[0], sizes[1])
+
+    def total_calls(self) -> int:
+        """
+        Number of calls recorded so far, e.g. to count the requests of one action.
+
+        Batch round trips are not counted, only their sub-requests.
+
+        Returns:
+            int: Calls of every method and outcome.
+        """
+        with self._lock:
+            return sum(
+                sum(stats.calls.values()) for method, stats in self._methods.items() if method != BATCH_METHOD
+            )
+
+    def recent_calls(self) -> int:
+        """
+        Calls recorded within the last `window` seconds.
+
+        Returns:
+            int: Recent call count.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._recent)
+
+    def snapshot(self) -> Dict:
+        """
+        Copy of every statistic as plain data, suitable for JSON.
+
+        Returns:
+            Dict: 'methods' keyed by name with calls, errors, retries, bytes and
+            cumulative latency buckets, plus quota usage over the last window.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            methods = {}
+            for method, stats in sorted(self._methods.items()):
+                count = sum(stats.buckets)
+                methods[method] = {
+                    'calls': dict(stats.calls),
+                    'errors': dict(stats.errors),
+                    'retries': stats.retries,
+                    'bytes_sent': stats.bytes_sent,
+                    'bytes_received': stats.bytes_received,
+                    'latency': {
+                        'count': count,
+                        'sum': stats.latency_sum,
+                        'mean': stats.latency_sum / count if count else 0.0,
+                        'buckets': dict(zip(
+                            [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'],
+                            _cumulative(stats.buckets)
+                        ))
+                    }
+                }
+            return {
+                'timestamp': time.time(),
+                'window_seconds': self.window,
+                'recent_calls': len(self._recent),
+                'quota_per_minute': RATE_LIMIT_CONFIG['quota_per_minute'],
+                'methods': methods
+            }
+
+    def to_json(self) -> str:
+        """
+        JSON snapshot of the registry.
+
+        Returns:
+            str: JSON document.
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = 'drivelabels') -> str:
+        """
+        Render the registry in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): Metric name prefix
+
+        Returns:
+            str: Exposition text.
+        """
+        snapshot = self.snapshot()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str, samples: List[Tuple[str, Dict[str, str], float]]):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(str(val))}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {_number(value)}" if label_text
+                             else f"{prefix}_{name}{suffix} {_number(value)}")
+
+        methods = snapshot['methods']
+        family('api_calls_total', 'counter', "API calls by method and outcome.", [
+            ('', {'method': method, 'outcome': outcome}, count)
+            for method, stats in methods.items() for outcome, count in stats['calls'].items()
+        ])
+        family('api_errors_total', 'counter', "Failed API calls by method and HTTP status.", [
+            ('', {'method': method, 'status': status}, count)
+            for method, stats in methods.items() for status, count in stats['errors'].items()
+        ])
+        family('api_retries_total', 'counter', "Retried API calls by method.", [
+            ('', {'method': method}, stats['retries']) for method, stats in methods.items()
+        ])
+        family('api_bytes_sent_total', 'counter', "Request body bytes by method.", [
+            ('', {'method': method}, stats['bytes_sent']) for method, stats in methods.items()
+        ])
+        family('api_bytes_received_total', 'counter', "Response body bytes by method.", [
+            ('', {'method': method}, stats['bytes_received']) for method, stats in methods.items()
+        ])
+        histogram = []
+        for method, stats in methods.items():
+            for bound, count in stats['latency']['buckets'].items():
+                histogram.append(('_bucket', {'method': method, 'le': bound}, count))
+            histogram.append(('_sum', {'method': method}, stats['latency']['sum']))
+            histogram.append(('_count', {'method': method}, stats['latency']['count']))
+        family('api_call_duration_seconds', 'histogram', "API call latency by method.", histogram)
+        family('api_calls_recent', 'gauge', f"API calls in the last {self.window:g} seconds.", [
+            ('', {}, snapshot['recent_calls'])
+        ])
+        family('api_quota_per_minute', 'gauge', "Configured per-user request quota per minute.", [
+            ('', {}, snapshot['quota_per_minute'])
+        ])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """
+        Write an export to a file, as JSON if the name ends in '.json'
+        and in the Prometheus text format otherwise.
+
+        Args:
+            path (str): Destination file
+        """
+        content = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as export:
+            export.write(content)
+
+    def reset(self):
+        """Forget every recorded call."""
+        with self._lock:
+            self._methods.clear()
+            self._recent.clear()
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+
+def track_sizes(request) -> List[int]:
+    """
+    Start measuring the request and response body sizes of a request.
+
+    The response size is captured by wrapping the request's postproc hook,
+    which googleapiclient calls with the raw content (also for batch
+    sub-requests).
+
+    Args:
+        request: An HttpRequest
+
+    Returns:
+        List[int]: [bytes_sent, bytes_received], filled in once the response arrives.
+    """
+    body = getattr(request, 'body', None)
+    sizes = [len(body) if body else 0, 0]
+    postproc = getattr(request, 'postproc', None)
+    if postproc is not None:
+        def counting_postproc(resp, content):
+            sizes[1] = len(content or b'')
+            return postproc(resp, content)
+        request.postproc = counting_postproc
+    return sizes
+
+def error_status(error: Exception) -> int:
+    """
+    HTTP status of a failed call, 0 for errors without a response.
+
+    Args:
+        error (Exception): The raised error
+
+    Returns:
+        int: Status code.
+    """
+    resp = getattr(error, 'resp', None)
+    return int(getattr(resp, 'status', 0) or 0)
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total, result = 0, []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+_default_metrics: Optional[Metrics] = None
+_default_lock = threading.Lock()
+
+def get_metrics() -> Metrics:
+    """
+    Return the process-wide metrics registry.
+
+    Returns:
+        Metrics: The shared registry.
+    """
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics(METRICS_CONFIG['window'])
+        return _default_metrics
@@ -0,0 +1,201 @@
+"""
+Shared rate limiting and retry policy for Google API requests.
+
+Every request goes through a token bucket sized to the Drive per-user
+quota. Throttled or transient failures are retried with exponential
+backoff and jitter, and each throttling response also halves the request
+rate, which then recovers gradually as requests succeed.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from googleapiclient.errors import HttpError
+
+from drivelabels.config.settings import RATE_LIMIT_CONFIG
+from drivelabels.utils.metrics import Metrics, get_metrics, method_name
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+def error_reason(error: HttpError) -> Optional[str]:
+    """
+    Extract the machine-readable reason of a Drive error, e.g. 'rateLimitExceeded'.
+
+    Args:
+        error (HttpError): The error raised by the client library
+
+    Returns:
+        Optional[str]: The first reason in the error details, if any.
+    """
+    details = error.error_details
+    if isinstance(details, list) and details and isinstance(details[0], dict):
+        return details[0].get('reason')
+    return None
+
+def is_retryable(error: HttpError) -> bool:
+    """
+    Check whether a failed request is worth retrying.
+
+    Args:
+        error (HttpError): The error raised by the client library
+
+    Returns:
+        bool: True for rate limiting and transient server errors.
+    """
+    status = error.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and error_reason(error) in RATE_LIMIT_REASONS
+
+class RateLimiter:
+    """Thread-safe token bucket with adaptive rate and retrying execute()."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        min_rate: float = 1.0,
+        recovery: float = 0.05,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 32.0,
+        metrics: Optional[Metrics] = None
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float): Sustained requests per second when no throttling is seen
+            burst (float): Bucket capacity, i.e. requests that may go out back to back
+            min_rate (float): Floor for the adaptive rate
+            recovery (float): Fraction of the configured rate regained per success
+            max_retries (int): Retries per request before the error is raised
+            base_delay (float): First backoff delay in seconds
+            max_delay (float): Upper bound for a single backoff delay
+            metrics (Metrics): Registry every executed request is recorded in,
+                defaults to the process-wide one
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = metrics or get_metrics()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """
+        Block until the bucket holds enough tokens, then take them.
+
+        A request for more tokens than the bucket holds, such as a large
+        batch, waits for a full bucket and takes every token it needs; the
+        balance goes negative and later callers wait until it is paid off.
+
+        Args:
+            tokens (float): Requests about to be sent, e.g. sub-requests in a batch
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                needed = min(tokens, self.burst)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        """Let the adaptive rate creep back towards the configured rate."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+    def on_throttle(self):
+        """Halve the adaptive rate after a throttling response."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+        logger.warning(f"Throttling detected, slowing down to {self.rate:.1f} requests/s.")
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before a retry, exponential in the attempt number with full jitter.
+
+        Args:
+            attempt (int): Zero-based retry attempt
+
+        Returns:
+            float: Seconds to wait.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def execute(self, request, **kwargs):
+        """
+        Execute a request under the rate limit, retrying throttled and transient failures.
+
+        Args:
+            request: An HttpRequest (anything with an execute() method)
+            **kwargs: Passed through to request.execute()
+
+        Returns:
+            The deserialized response.
+
+        Raises:
+            HttpError: If the request fails permanently or retries are exhausted.
+        """
+        attempt = 0
+        method = method_name(request)
+        while True:
+            self.acquire()
+            try:
+                with self.metrics.measure(request, method):
+                    response = request.execute(**kwargs)
+            except HttpError as error:
+                if attempt >= self.max_retries or not is_retryable(error):
+                    raise
+                self.metrics.retry(method)
+                if error.resp.status in (403, 429):
+                    self.on_throttle()
+                delay = self.backoff(attempt)
+                logger.warning(f"Request failed with {error.resp.status}, retrying in {delay:.1f}s.")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.on_success()
+            return response
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the process-wide limiter built from RATE_LIMIT_CONFIG.
+
+    Returns:
+        RateLimiter: The shared limiter instance.
+    """
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                rate=RATE_LIMIT_CONFIG['quota_per_minute'] / 60,
+                burst=RATE_LIMIT_CONFIG['burst'],
+                min_rate=RATE_LIMIT_CONFIG['min_rate'],
+                recovery=RATE_LIMIT_CONFIG['recovery'],
+                max_retries=RATE_LIMIT_CONFIG['max_retries'],
+                base_delay=RATE_LIMIT_CONFIG['base_delay'],
+                max_delay=RATE_LIMIT_CONFIG['max_delay']
+            )
+        return _default_limiter
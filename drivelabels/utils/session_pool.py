@@ -0,0 +1,212 @@
+"""
+Pool of authorized Drive sessions with proactive token refresh.
+
+httplib2 connections are not thread-safe, so each worker thread leases its
+own keep-alive connection from the pool. When the thread exits, its
+connection goes back to the pool for the next thread, so short-lived worker
+pools do not reopen TLS connections. A background thread renews the shared
+access token before it expires, so requests never wait on a refresh.
+"""
+import datetime
+import logging
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional
+
+from drivelabels.config.settings import SESSION_CONFIG
+from drivelabels.utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+class _Lease:
+    """Per-thread handle; returns its service to the pool when collected."""
+
+    __slots__ = ('service', '__weakref__')
+
+    def __init__(self, service):
+        self.service = service
+
+class SessionPool:
+    """Hands out one authorized Drive service per thread and keeps the token fresh."""
+
+    def __init__(
+        self,
+        creds,
+        api_endpoint: Optional[str] = None,
+        refresh_margin: float = SESSION_CONFIG['refresh_margin'],
+        retry_interval: float = SESSION_CONFIG['retry_interval'],
+        max_idle: int = SESSION_CONFIG['max_idle'],
+        on_refresh: Optional[Callable[[object], None]] = None
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            creds (Credentials): OAuth2 credentials shared by every session
+            api_endpoint (str): Optional base URL override
+            refresh_margin (float): Seconds before expiry at which to renew the token
+            retry_interval (float): Seconds between attempts after a failed refresh
+            max_idle (int): Connections kept for reuse after their thread exits
+            on_refresh (Callable): Called with the credentials after each refresh,
+                e.g. to persist the new token
+        """
+        self.creds = creds
+        self.api_endpoint = api_endpoint
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.max_idle = max_idle
+        self.on_refresh = on_refresh
+        self._local = threading.local()
+        self._idle: List[object] = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._stats = {
+            'opened': 0,
+            'reused': 0,
+            'released': 0,
+            'refreshes': 0,
+            'refresh_failures': 0
+        }
+
+    def service(self):
+        """
+        Return the calling thread's Drive service, leasing one if needed.
+
+        Suitable as the service_factory of DriveManager, FolderCrawler and
+        AsyncDriveManager.
+
+        Returns:
+            Resource: Google Drive API service object.
+        """
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            self._count('reused')
+            return lease.service
+
+        with self._lock:
+            service = self._idle.pop() if self._idle else None
+        if service is None:
+            service = self._open()
+            self._count('opened')
+        else:
+            self._count('reused')
+
+        lease = self._local.lease = _Lease(service)
+        # Thread-local values are dropped when the thread ends
+        weakref.finalize(lease, self._release, service)
+        return service
+
+    def start(self) -> 'SessionPool':
+        """
+        Start the background token refresher.
+
+        Does nothing for credentials that cannot be refreshed. User tokens
+        are renewed through their refresh token, service accounts by signing
+        a new assertion.
+
+        Returns:
+            SessionPool: self, for chaining.
+        """
+        renewable = getattr(self.creds, 'refresh_token', None) or hasattr(self.creds, 'signer')
+        if self._refresher is None and renewable:
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._run, name='token-refresher', daemon=True
+            )
+            self._refresher.start()
+        return self
+
+    def stop(self):
+        """Stop the background refresher and drop idle connections."""
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+        with self._lock:
+            self._idle.clear()
+
+    def refresh(self) -> bool:
+        """
+        Renew the access token now.
+
+        Returns:
+            bool: True if the token was refreshed.
+        """
+        import httplib2
+        from google_auth_httplib2 import Request
+
+        with self._refresh_lock:
+            try:
+                with get_metrics().measure(None, 'oauth2.token.refresh'):
+                    self.creds.refresh(Request(httplib2.Http()))
+            except Exception as error:
+                self._count('refresh_failures')
+                logger.warning(f"Token refresh failed: {error}")
+                return False
+            self._count('refreshes')
+        logger.info(f"Access token refreshed, valid until {self.creds.expiry}.")
+        if self.on_refresh is not None:
+            self.on_refresh(self.creds)
+        return True
+
+    def seconds_until_refresh(self) -> float:
+        """
+        Time left before the token should be renewed.
+
+        Returns:
+            float: Seconds, 0 if a refresh is due now.
+        """
+        expiry = getattr(self.creds, 'expiry', None)
+        if expiry is None:
+            return 0.0 if not self.creds.valid else self.refresh_margin
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - now).total_seconds() - self.refresh_margin)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Connection reuse and token refresh counters.
+
+        Returns:
+            Dict[str, int]: 'opened', 'reused', 'released', 'refreshes',
+            'refresh_failures' and the current number of 'idle' connections.
+        """
+        with self._lock:
+            return dict(self._stats, idle=len(self._idle))
+
+    def __enter__(self) -> 'SessionPool':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _open(self):
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from drivelabels.utils.auth import build_service
+
+        return build_service(
+            'drive',
+            http=AuthorizedHttp(self.creds, http=httplib2.Http()),
+            api_endpoint=self.api_endpoint
+        )
+
+    def _release(self, service):
+        with self._lock:
+            self._stats['released'] += 1
+            if len(self._idle) < self.max_idle and not self._stop.is_set():
+                self._idle.append(service)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _run(self):
+        delay = self.seconds_until_refresh()
+        while not self._stop.wait(delay):
+            if self.refresh():
+                delay = self.seconds_until_refresh()
+            else:
+                delay = self.retry_interval
@@ -1,34 +1,39 @@
 """
 Main entry point for the Drive Labels application.
 """
-import time
 import traceback
 import logging
 from rich.prompt import Prompt, IntPrompt
-from rich.console import Console
 
-from drivelabels.utils.auth import get_credentials, get_services
+from drivelabels.utils.auth import get_credentials, get_services, save_credentials
+from drivelabels.utils.session_pool import SessionPool
 from drivelabels.core.drive_manager import DriveManager
+from drivelabels.core.models import FileRecord
+from drivelabels.core.query import QuerySyntaxError, is_boolean_query
+from drivelabels.core.tag_index import TagIndex
+from drivelabels.config.settings import INDEX_CONFIG, METRICS_CONFIG, WRITE_BEHIND_CONFIG
+from drivelabels.utils.completion import completion
+from drivelabels.utils.metrics import get_metrics
 from drivelabels.utils.display import (
     display_menu,
     display_files,
+    page_files,
     display_success,
     display_error,
-    display_warning
+    display_warning,
+    get_console
 )
 
-console = Console()
-
-def get_file_by_number(files: list, prompt: str = "Enter file number") -> dict:
+def get_file_by_number(files: list, prompt: str = "Enter file number") -> FileRecord:
     """
     Get a file by its number in the displayed list.
     
     Args:
-        files (list): List of file dictionaries
+        files (list): List of file records
         prompt (str): Prompt message for user input
         
     Returns:
-        dict: Selected file dictionary
+        FileRecord: Selected file record
     """
     while True:
         try:
@@ -39,8 +44,34 @@ def get_file_by_number(files: list, prompt: str = "Enter file number") -> dict:
         except ValueError:
             display_error("Please enter a valid number")
 
+def ask_tag(manager: DriveManager, prompt: str = "Enter the tag to add") -> str:
+    """
+    Ask for a tag, completing known tags with Tab.
+
+    A tag matching an existing one under the normalization policy is
+    replaced by the existing spelling.
+
+    Args:
+        manager (DriveManager): Manager providing the tag vocabulary
+        prompt (str): Prompt message for user input
+
+    Returns:
+        str: The tag to use.
+    """
+    # The listing shown just before has already synced the index
+    vocabulary = manager.tag_vocabulary(sync=False)
+    with completion(lambda text: [tag for tag, _ in vocabulary.complete(text)]) as available:
+        if available and len(vocabulary):
+            get_console().print(f"[dim]Press Tab to complete one of {len(vocabulary)} known tags.[/dim]")
+        tag = Prompt.ask(prompt)
+    canonical = vocabulary.canonical(tag)
+    if canonical != tag.strip():
+        display_warning(f"Using the existing spelling '{canonical}'.")
+    return canonical
+
 def display_available_tags(tags: list):
     """Display a numbered list of available tags."""
+    console = get_console()
     console.print("\nAvailable tags:")
     for idx, tag in enumerate(tags, 1):
         console.print(f"[cyan]{idx}[/cyan]. {tag}")
@@ -53,45 +84,73 @@ def main():
         creds = get_credentials()
         drive_service, labels_service = get_services(creds)
         logger.info("Initialized Google API services.")
-        
+
+        # Worker threads lease pooled connections; the token is renewed ahead of expiry
+        session_pool = SessionPool(creds, on_refresh=save_credentials).start()
+
         # Initialize drive manager
-        manager = DriveManager(drive_service, labels_service)
+        manager = DriveManager(
+            drive_service,
+            labels_service,
+            TagIndex(INDEX_CONFIG['path']),
+            service_factory=session_pool.service
+        )
+        if WRITE_BEHIND_CONFIG['enabled']:
+            manager.enable_write_behind()
         logger.info("DriveManager initialized.")
         
+        metrics = get_metrics()
+        action, calls_before = None, 0
         while True:
             try:
+                if action is not None:
+                    # Structured record of how many API requests the last action made
+                    api_calls = metrics.total_calls() - calls_before
+                    logger.info(
+                        f"Menu option {action} made {api_calls} API calls.",
+                        extra={'action': action, 'api_calls': api_calls}
+                    )
                 display_menu()
                 choice = Prompt.ask("Choose an option", choices=["1", "2", "3", "4", "5"])
                 logger.info(f"User selected menu option: {choice}")
+                action, calls_before = choice, metrics.total_calls()
                 
                 if choice == "1":
-                    files = display_files(manager.list_files())
+                    files = page_files(manager.iter_records())
                     logger.info(f"Listed {len(files)} files.")
                     
                 elif choice == "2":
-                    files = display_files(manager.list_files())
+                    files = display_files(manager.iter_records())
                     if not files:
                         display_warning("No files found in the folder.")
                         continue
                         
                     selected_file = get_file_by_number(files, "Enter the number of the file to tag")
-                    tag = Prompt.ask("Enter the tag to add")
+                    tag = ask_tag(manager)
                     
-                    logger.info(f"Attempting to add tag '{tag}' to file '{selected_file['name']}'")
-                    if manager.add_tag(selected_file['id'], tag):
-                        display_success(f"Tag '{tag}' added successfully to '{selected_file['name']}'!")
-                        logger.info(f"Tag '{tag}' added to file '{selected_file['id']}'.")
+                    logger.info(f"Attempting to add tag '{tag}' to file '{selected_file.name}'")
+                    if manager.add_tag(selected_file.id, tag):
+                        display_success(f"Tag '{tag}' added successfully to '{selected_file.name}'!")
+                        logger.info(f"Tag '{tag}' added to file '{selected_file.id}'.")
                     else:
                         display_error(f"Failed to add tag '{tag}'.")
-                        logger.error(f"Failed to add tag '{tag}' to file '{selected_file['id']}'.")
+                        logger.error(f"Failed to add tag '{tag}' to file '{selected_file.id}'.")
                     
                 elif choice == "3":
-                    tag = Prompt.ask("Enter the tag to search for")
-                    files = display_files(manager.search_by_tag(tag))
-                    logger.info(f"Searched for files with tag '{tag}'. Found {len(files)} files.")
+                    tag = Prompt.ask("Enter the tag or query (e.g. contract AND NOT archived)")
+                    try:
+                        if is_boolean_query(tag):
+                            results = list(manager.query(tag))
+                        else:
+                            results = manager.search_by_tag(tag)
+                    except QuerySyntaxError as error:
+                        display_error(f"Invalid query: {error}")
+                        continue
+                    files = display_files(results)
+                    logger.info(f"Searched for files matching '{tag}'. Found {len(files)} files.")
                 
                 elif choice == "4":
-                    files = display_files(manager.list_files())
+                    files = display_files(manager.iter_records())
                     if not files:
                         display_warning("No files found in the folder.")
                         continue
@@ -99,12 +158,10 @@ def main():
                     selected_file = get_file_by_number(files, "Enter the number of the file to remove tag from")
                     
                     # Get current tags
-                    properties = selected_file.get('properties', {})
-                    tags = properties.get('tags', '').split(',')
-                    tags = [tag.strip() for tag in tags if tag.strip()]
+                    tags = selected_file.tags
                     
                     if not tags:
-                        display_warning(f"File '{selected_file['name']}' has no tags.")
+                        display_warning(f"File '{selected_file.name}' has no tags.")
                         continue
                     
                     # Display available tags
@@ -114,14 +171,14 @@ def main():
                     tag_num = IntPrompt.ask("Enter the number of the tag to remove", default=1)
                     if 1 <= tag_num <= len(tags):
                         tag_to_remove = tags[tag_num - 1]
-                        logger.info(f"Attempting to remove tag '{tag_to_remove}' from file '{selected_file['name']}'")
+                        logger.info(f"Attempting to remove tag '{tag_to_remove}' from file '{selected_file.name}'")
                         
-                        if manager.remove_tag(selected_file['id'], tag_to_remove):
-                            display_success(f"Tag '{tag_to_remove}' removed successfully from '{selected_file['name']}'!")
-                            logger.info(f"Tag '{tag_to_remove}' removed from file '{selected_file['id']}'.")
+                        if manager.remove_tag(selected_file.id, tag_to_remove):
+                            display_success(f"Tag '{tag_to_remove}' removed successfully from '{selected_file.name}'!")
+                            logger.info(f"Tag '{tag_to_remove}' removed from file '{selected_file.id}'.")
                         else:
                             display_error(f"Failed to remove tag '{tag_to_remove}'.")
-                            logger.error(f"Failed to remove tag '{tag_to_remove}' from file '{selected_file['id']}'.")
+                            logger.error(f"Failed to remove tag '{tag_to_remove}' from file '{selected_file.id}'.")
                     else:
                         display_error(f"Please enter a number between 1 and {len(tags)}")
                     
@@ -129,8 +186,7 @@ def main():
                     display_success("Exiting application. Goodbye!")
                     logger.info("User exited the application.")
                     break
-                
-                time.sleep(1)  # Prevent rate limiting
+
             except KeyboardInterrupt:
                 display_error("Interrupted by user. Exiting application.")
                 logger.warning("Application interrupted by user (KeyboardInterrupt).")
@@ -138,6 +194,13 @@ def main():
             except Exception as e:
                 display_error(f"Unexpected error: {e}")
                 logger.exception(f"Unexpected error: {e}")
+
+        # Flush any queued tag edits before exiting
+        manager.close()
+        session_pool.stop()
+        logger.info(f"Session pool stats: {session_pool.stats()}")
+        if METRICS_CONFIG['export_path']:
+            metrics.write(METRICS_CONFIG['export_path'])
     except Exception as e:
         display_error(f"Fatal error: {e}")
         logger.critical(f"Fatal error: {e}", exc_info=True)
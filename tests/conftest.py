@@ -0,0 +1,54 @@
+"""
+Shared fixtures for the test suite, which runs against the in-memory fake drive.
+
+The cache directory and the log file are pointed at a temporary directory
+before drivelabels is imported, so tests never touch the working tree or
+the user's cache.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TEMP_DIR = tempfile.mkdtemp(prefix='drivelabels-tests-')
+os.environ['DRIVELABELS_CACHE_DIR'] = _TEMP_DIR
+
+from drivelabels.utils.log_handler import configure_logging
+
+# Settings configure logging on import; the first call wins
+configure_logging(os.path.join(_TEMP_DIR, 'drivelabels.log'))
+
+from benchmarks.fake_drive import FakeDrive
+from drivelabels.core.drive_manager import DriveManager
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.core.tag_index import TagIndex
+from drivelabels.utils.rate_limit import RateLimiter
+
+@pytest.fixture
+def limiter() -> RateLimiter:
+    """A limiter that never waits and retries injected errors quickly."""
+    return RateLimiter(rate=1e9, burst=1e9, base_delay=0.001, max_delay=0.01)
+
+@pytest.fixture
+def drive() -> FakeDrive:
+    """An empty fake drive without latency or injected errors."""
+    return FakeDrive()
+
+@pytest.fixture
+def tag_index():
+    """A throwaway in-memory tag index."""
+    index = TagIndex(':memory:')
+    yield index
+    index.close()
+
+@pytest.fixture
+def make_manager(drive: FakeDrive, limiter: RateLimiter):
+    """Build DriveManagers on the fake drive's root folder with the joined tag layout."""
+    def make(tag_index=None, **kwargs) -> DriveManager:
+        kwargs.setdefault('tag_backend', PropertiesBackend('joined'))
+        kwargs.setdefault('folder_ids', [FakeDrive.ROOT_ID])
+        return DriveManager(drive, None, tag_index, rate_limiter=limiter, **kwargs)
+    return make
@@ -0,0 +1,92 @@
+"""
+AsyncDriveManager against real client library services talking HTTP to a local fake.
+"""
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from benchmarks.fake_drive import FakeDrive
+from benchmarks.fake_http import FakeDriveServer
+from drivelabels.core.async_drive_manager import AsyncDriveManager
+from drivelabels.core.batch import STATUS_FAILED, STATUS_UNCHANGED, STATUS_UPDATED
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.core.tags import parse_tags
+from drivelabels.utils.auth import build_drive_service
+
+@pytest.fixture
+def server(drive: FakeDrive):
+    with FakeDriveServer(drive) as server:
+        yield server
+
+@pytest.fixture
+def service_threads():
+    """Names of the threads each Drive service was built on."""
+    return []
+
+@pytest.fixture
+def async_manager(server: FakeDriveServer, limiter, service_threads):
+    def service_factory():
+        service_threads.append(threading.current_thread().name)
+        return build_drive_service(Credentials(token='test'), api_endpoint=server.url)
+
+    return AsyncDriveManager(
+        service_factory,
+        max_concurrency=4,
+        rate_limiter=limiter,
+        tag_backend=PropertiesBackend('joined')
+    )
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_iter_files_walks_every_page_on_its_own_clients(drive, async_manager, service_threads):
+    file_ids = drive.populate(2500)
+
+    async def listing():
+        async with async_manager:
+            return [file['id'] async for file in async_manager.iter_files("'root' in parents")]
+
+    assert sorted(run(listing())) == sorted(file_ids)
+    assert drive.calls['files.list'] == 3
+    # One client for the listing thread and one for its prefetch thread
+    assert [name.split('_')[0] for name in service_threads] == ['drive-async-listing', 'drive-prefetch']
+
+def test_iter_files_stopped_early_closes_the_listing(drive, async_manager):
+    drive.populate(2500)
+
+    async def first_file():
+        async with async_manager:
+            async for file in async_manager.iter_files("'root' in parents"):
+                return file
+
+    assert run(first_file()) is not None
+    assert drive.calls['files.list'] <= 2
+
+def test_bulk_tagging_is_sent_in_batches(drive, async_manager):
+    file_ids = drive.populate(250, tags=['contract'], max_tags=1)
+
+    async def tag():
+        async with async_manager:
+            return await async_manager.add_tag_bulk(file_ids + ['missing'], ['urgent'])
+
+    results = run(tag())
+    assert list(results) == file_ids + ['missing']
+    assert Counter(result['status'] for result in results.values()) == {STATUS_UPDATED: 250, STATUS_FAILED: 1}
+    assert all('urgent' in parse_tags(drive.files_by_id[file_id]) for file_id in file_ids)
+    # Three chunks of at most 100 files, each one batch of gets and one of updates
+    assert drive.calls['batch'] == 6
+
+def test_bulk_removal_retries_throttled_requests(drive, async_manager):
+    file_ids = drive.populate(50, tags=['contract'], max_tags=1)
+    drive.fail_next(5, 429)
+
+    async def untag():
+        async with async_manager:
+            return await async_manager.remove_tag_bulk(file_ids, ['contract'])
+
+    results = run(untag())
+    assert set(result['status'] for result in results.values()) <= {STATUS_UPDATED, STATUS_UNCHANGED}
+    assert not any('contract' in parse_tags(file) for file in drive.files_by_id.values())
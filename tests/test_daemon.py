@@ -0,0 +1,58 @@
+"""
+Daemon requests over a Unix socket, served from the fake drive.
+"""
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from drivelabels.client import DaemonClient, DaemonError
+from drivelabels.daemon import DaemonService, create_server
+
+@pytest.fixture
+def daemon(tmp_path, drive, tag_index, make_manager):
+    """A daemon on a temporary socket; yields its address and service."""
+    drive.add_file('a', ['contract'], file_id='a')
+    service = DaemonService(lambda sync_interval=60.0: make_manager(tag_index, sync_interval=sync_interval), tag_index)
+    service.sync()
+    address = os.path.join(str(tmp_path), 'daemon.sock')
+    server = create_server(address, service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield address, service
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+def test_malformed_changes_are_rejected(daemon):
+    address, _ = daemon
+    with DaemonClient(address) as client:
+        with pytest.raises(DaemonError) as error:
+            client.apply_tag_changes({'a': ['contract']})
+        assert error.value.code == 'bad_request'
+        assert [item['id'] for item in client.call('search', expr='contract')] == ['a']
+
+def test_unexpected_errors_are_replied_and_the_daemon_keeps_serving(daemon, monkeypatch):
+    address, service = daemon
+
+    def broken(manager, params, write):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(service._methods, 'search', broken)
+    with DaemonClient(address) as client:
+        with pytest.raises(DaemonError) as error:
+            client.call('search', expr='contract')
+        assert error.value.code == 'internal_error'
+        assert 'boom' in str(error.value)
+        assert client.call('ping')
+
+def test_client_does_not_import_the_google_libraries(tmp_path):
+    # Run from a scratch directory, as settings open the log file in the working directory
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, drivelabels.client; print(sorted({m.split('.')[0] for m in sys.modules}))"],
+        cwd=str(tmp_path), capture_output=True, text=True, check=True, env=dict(os.environ, PYTHONPATH=root)
+    ).stdout
+    assert 'googleapiclient' not in loaded and "'google'" not in loaded
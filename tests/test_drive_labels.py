@@ -0,0 +1,40 @@
+"""
+The standalone drive_labels.py label manager on the fake drive and labels services.
+"""
+import pytest
+
+from benchmarks.fake_drive import FakeDrive, FakeLabels
+from drive_labels import DriveLabelManager
+from drivelabels.core.label_catalog import LabelCatalog
+
+@pytest.fixture
+def labels(drive: FakeDrive) -> FakeLabels:
+    return FakeLabels(drive)
+
+@pytest.fixture
+def label_manager(drive, labels, limiter) -> DriveLabelManager:
+    manager = DriveLabelManager()
+    manager.folder_id = FakeDrive.ROOT_ID
+    manager.drive_service = drive
+    manager.labels_service = labels
+    manager.catalog = LabelCatalog(labels, rate_limiter=limiter)
+    return manager
+
+def test_listing_reports_applied_labels(drive, labels, label_manager):
+    drive.add_file('a', file_id='a')
+    drive.add_file('b', file_id='b')
+    label = labels.add_label('urgent', choices=['urgent'])
+    label_manager.add_label('a', 'urgent')
+
+    files = {file['id']: file for file in label_manager.list_files()}
+    assert [applied['id'] for applied in files['a']['labelInfo']['labels']] == [label['id']]
+    assert not files['b'].get('labelInfo', {}).get('labels')
+
+def test_label_without_a_matching_choice_is_not_applied(drive, labels, label_manager):
+    drive.add_file('a', file_id='a')
+    labels.add_label('urgent', choices=['soon'])
+
+    with pytest.raises(ValueError, match="no choice named 'urgent'"):
+        label_manager._label_modification(label_manager.catalog.label('urgent'), 'urgent')
+    assert label_manager.add_label_bulk(['a'], 'urgent') == {'a': "Label 'urgent' has no choice named 'urgent'."}
+    assert drive.calls['files.modifyLabels'] == 0
@@ -0,0 +1,210 @@
+"""
+DriveManager listings, searches and tag edits on the fake drive.
+"""
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from benchmarks.fake_drive import FakeDrive
+from drivelabels.config.settings import WRITE_BEHIND_CONFIG
+from drivelabels.core.batch import STATUS_FAILED, STATUS_UPDATED
+from drivelabels.core.drive_manager import DriveManager
+from drivelabels.core.drive_query import NOT_TRASHED
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.core.tags import parse_tags
+
+def test_listing_skips_trashed_files(drive, make_manager):
+    drive.add_file('kept', file_id='kept')
+    drive.add_file('binned', file_id='binned')
+    drive.files().update(fileId='binned', body={'trashed': True}).execute()
+
+    assert [record.id for record in make_manager().list_files()] == ['kept']
+    assert all(NOT_TRASHED in query for query in make_manager().folder_queries("name = 'x'"))
+
+def test_query_takes_in_index_writes_without_reloading(drive, tag_index, make_manager, monkeypatch):
+    for name, tags in (('a', ['contract']), ('b', ['contract', 'archived']), ('c', [])):
+        drive.add_file(name, tags, file_id=name)
+    manager = make_manager(tag_index)
+    assert [record.id for record in manager.query('contract AND NOT archived')] == ['a']
+
+    manager.add_tag('c', 'contract')
+    drive.delete_file('a')
+    monkeypatch.setattr(tag_index, 'all_files', lambda: pytest.fail("no reload expected"))
+
+    assert [record.id for record in manager.query('contract AND NOT archived')] == ['c']
+    assert manager._bitmap.count('contract') == 2
+
+def test_changed_since_is_unknown_after_a_rebuild(tag_index):
+    tag_index.upsert_file({'id': 'a', 'properties': {'tags': 'x'}})
+    version = tag_index.version
+    tag_index.upsert_file({'id': 'b', 'properties': {'tags': 'x'}})
+    tag_index.remove_file('a')
+
+    assert tag_index.changed_since(version) == ['b', 'a']
+    assert tag_index.changed_since(tag_index.version) == []
+    tag_index.rebuild([])
+    assert tag_index.changed_since(version) is None
+
+def test_list_files_follows_every_page(drive, make_manager):
+    file_ids = drive.populate(2500)
+
+    assert [record.id for record in make_manager().list_files()] == file_ids
+    assert drive.calls['files.list'] == 3
+
+def test_listing_is_prefetched_on_a_client_of_its_own(drive, make_manager):
+    file_ids = drive.populate(2500)
+    services = []
+
+    def service_factory():
+        services.append(drive)
+        return drive
+
+    assert [file['id'] for file in make_manager(service_factory=service_factory).iter_files()] == file_ids
+    assert len(services) == 1
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_search_by_tag(drive, tag_index, make_manager, indexed):
+    drive.add_file('a', ['contract', 'invoice'], file_id='a')
+    drive.add_file('b', ['Contract'], file_id='b')
+    drive.add_file('c', ['invoice'], file_id='c')
+    manager = make_manager(tag_index if indexed else None)
+
+    assert sorted(record.id for record in manager.search_by_tag('contract')) == ['a', 'b']
+    assert [record.id for record in manager.search_by_tag('missing')] == []
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_query_matches_every_spelling(drive, tag_index, make_manager, indexed):
+    drive.add_file('a', ['Contract'], file_id='a')
+    drive.add_file('b', ['contract', 'Archived'], file_id='b')
+    drive.add_file('c', ['CONTRACT '], file_id='c')
+    manager = make_manager(tag_index if indexed else None)
+
+    assert sorted(record.id for record in manager.query('contract AND NOT archived')) == ['a', 'c']
+
+def test_add_and_remove_tag(drive, make_manager):
+    drive.add_file('a', ['contract'], file_id='a')
+    manager = make_manager()
+
+    assert manager.add_tag('a', 'invoice')
+    assert parse_tags(drive.files_by_id['a']) == ['contract', 'invoice']
+    assert not manager.add_tag('a', 'invoice')
+    assert manager.remove_tag('a', 'contract')
+    assert parse_tags(drive.files_by_id['a']) == ['invoice']
+    assert not manager.remove_tag('a', 'contract')
+
+def test_remove_tag_keeps_other_spellings_unless_asked(drive, make_manager):
+    drive.add_file('a', ['Marketing', 'marketing', 'q3'], file_id='a')
+    manager = make_manager()
+
+    assert manager.remove_tag('a', 'Marketing')
+    assert parse_tags(drive.files_by_id['a']) == ['marketing', 'q3']
+    assert not manager.remove_tag('a', 'MARKETING')
+
+    drive.add_file('b', ['Marketing', 'marketing', 'q3'], file_id='b')
+    manager.remove_tag_bulk(['b'], ['MARKETING'], all_spellings=True)
+    assert parse_tags(drive.files_by_id['b']) == ['q3']
+
+def test_tag_edits_are_seen_by_the_next_search(drive, make_manager):
+    drive.add_file('a', file_id='a')
+    manager = make_manager()
+    assert manager.search_by_tag('fresh') == []
+
+    manager.add_tag('a', 'fresh')
+    assert [record.id for record in manager.search_by_tag('fresh')] == ['a']
+
+def test_add_tag_to_a_missing_file_fails(make_manager):
+    assert not make_manager().add_tag('missing', 'contract')
+
+def test_bulk_edits_are_batched(drive, make_manager):
+    file_ids = drive.populate(250, tags=['contract'], max_tags=1)
+    manager = make_manager(cache_responses=False)
+
+    results = manager.add_tag_bulk(file_ids, ['urgent'])
+    assert {result['status'] for result in results.values()} == {STATUS_UPDATED}
+    # Three batches of gets and three of updates, no single requests
+    assert drive.calls['batch'] == 6
+    assert drive.calls['files.get'] == drive.calls['files.update'] == 250
+
+    results = manager.remove_tag_bulk(file_ids + ['missing'], ['urgent'])
+    assert Counter(result['status'] for result in results.values()) == {STATUS_UPDATED: 250, STATUS_FAILED: 1}
+    assert not any('urgent' in parse_tags(drive.files_by_id[file_id]) for file_id in file_ids)
+
+def test_bulk_edits_retry_throttled_requests(drive, make_manager):
+    file_ids = drive.populate(120)
+    manager = make_manager(cache_responses=False)
+    drive.fail_next(30, 429)
+
+    results = manager.add_tag_bulk(file_ids, ['urgent'])
+    assert {result['status'] for result in results.values()} == {STATUS_UPDATED}
+    assert all('urgent' in parse_tags(drive.files_by_id[file_id]) for file_id in file_ids)
+    assert drive.calls['files.get'] + drive.calls['files.update'] == 2 * len(file_ids) + 30
+
+def test_bulk_edits_report_files_still_throttled_after_all_retries(drive, make_manager):
+    file_ids = drive.populate(3)
+    manager = make_manager(cache_responses=False)
+    drive.fail_next(100, 429)
+
+    results = manager.add_tag_bulk(file_ids, ['urgent'])
+    assert {result['status'] for result in results.values()} == {STATUS_FAILED}
+    assert all('429' in result['error'] for result in results.values())
+
+def test_tag_edits_keep_tags_written_since_the_last_listing(drive, make_manager):
+    drive.add_file('a', ['contract'], file_id='a')
+    drive.add_file('b', ['contract'], file_id='b')
+    manager = make_manager()
+    manager.list_files()
+    for file_id in ('a', 'b'):
+        drive.files().update(fileId=file_id, body={'properties': {'tags': 'contract,elsewhere'}}).execute()
+
+    assert manager.add_tag('a', 'new')
+    assert manager.add_tag_bulk(['b'], ['new'])['b']['status'] == STATUS_UPDATED
+    assert parse_tags(drive.files_by_id['a']) == parse_tags(drive.files_by_id['b']) == ['contract', 'elsewhere', 'new']
+    assert {record.id: record.tags for record in manager.list_files()}['a'] == ['contract', 'elsewhere', 'new']
+
+class ThreadRecorder:
+    """Delegates to a service and records the threads that use it."""
+
+    def __init__(self, service):
+        self.service = service
+        self.threads = set()
+
+    def __getattr__(self, name):
+        self.threads.add(threading.current_thread().name)
+        return getattr(self.service, name)
+
+def test_write_behind_flushes_on_a_service_of_its_own(drive, tag_index, limiter, tmp_path, monkeypatch):
+    monkeypatch.setitem(WRITE_BEHIND_CONFIG, 'flush_interval', 0.05)
+    drive.add_file('a', file_id='a')
+    caller, flusher = ThreadRecorder(drive), ThreadRecorder(drive)
+    manager = DriveManager(
+        caller, None, tag_index, rate_limiter=limiter,
+        service_factory=lambda: flusher, tag_backend=PropertiesBackend('joined'), folder_ids=[FakeDrive.ROOT_ID]
+    )
+    manager.list_files()
+    queue = manager.enable_write_behind(str(tmp_path / 'journal.sqlite3'))
+    try:
+        assert manager.add_tag('a', 'queued')
+        deadline = time.monotonic() + 5
+        while queue.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert parse_tags(drive.files_by_id['a']) == ['queued']
+        assert 'drive-write-behind' in flusher.threads
+        assert 'drive-write-behind' not in caller.threads
+    finally:
+        manager.close()
+
+def test_write_behind_needs_a_service_factory(make_manager, tmp_path):
+    with pytest.raises(ValueError):
+        make_manager().enable_write_behind(str(tmp_path / 'journal.sqlite3'))
+
+def test_restore_syncs_the_index_before_skipping_files(drive, tag_index, make_manager):
+    drive.add_file('a', ['contract'], file_id='a')
+    manager = make_manager(tag_index, sync_interval=3600)
+    manager.sync()
+    # Edited elsewhere after the index was synced
+    make_manager().add_tag('a', 'draft')
+
+    assert manager.restore_tags({'a': ['contract']}) == {'a': {'status': STATUS_UPDATED}}
+    assert parse_tags(drive.files_by_id['a']) == ['contract']
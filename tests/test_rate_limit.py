@@ -0,0 +1,24 @@
+"""
+Token bucket accounting of the shared rate limiter.
+"""
+import time
+
+from drivelabels.utils.rate_limit import RateLimiter
+
+def test_batches_larger_than_the_burst_are_charged_in_full():
+    limiter = RateLimiter(rate=100, burst=5)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire(20)
+    # The first batch takes the full bucket and leaves a debt of 15 tokens,
+    # which each following batch waits off before taking its own 20
+    assert time.monotonic() - started >= 0.3
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.45
+
+def test_requests_within_the_burst_do_not_wait():
+    limiter = RateLimiter(rate=1, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,174 @@
+"""
+ChangeSync replaying the fake drive's changes feed into a tag index.
+"""
+from typing import Dict, Iterator
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_drive import FakeDrive
+from drivelabels.config.settings import LISTING_CONFIG
+from drivelabels.core.crawler import FOLDER_MIME_TYPE, SHORTCUT_MIME_TYPE
+from drivelabels.core.sync import ChangeSync
+from drivelabels.core.tags import parse_tags
+
+LIST_FIELDS = 'nextPageToken, files(id, name, mimeType, parents, properties)'
+
+def listing(drive: FakeDrive, folder_id: str = FakeDrive.ROOT_ID) -> Iterator[Dict]:
+    """Every file directly in a folder, following all pages."""
+    page_token = None
+    while True:
+        results = drive.files().list(
+            q=f"'{folder_id}' in parents and trashed = false", pageSize=100, pageToken=page_token, fields=LIST_FIELDS
+        ).execute()
+        yield from results['files']
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return
+
+@pytest.fixture
+def change_sync(drive, tag_index, limiter) -> ChangeSync:
+    """A sync engine on the root folder, already filled by a full sync of three files."""
+    for name, tags in (('a', ['contract']), ('b', ['invoice']), ('c', [])):
+        drive.add_file(name, tags, file_id=name)
+    engine = ChangeSync(drive, tag_index, [FakeDrive.ROOT_ID], page_size=2, rate_limiter=limiter)
+    assert engine.sync(lambda: listing(drive)) == 3
+    drive.calls.clear()
+    return engine
+
+def names(tag_index, tag: str):
+    return sorted(file['name'] for file in tag_index.search(tag))
+
+def test_first_sync_is_a_full_listing(drive, tag_index, limiter):
+    drive.populate(250)
+    engine = ChangeSync(drive, tag_index, [FakeDrive.ROOT_ID], rate_limiter=limiter)
+
+    assert engine.cursor is None
+    assert engine.sync(lambda: listing(drive)) == 250
+    assert engine.cursor == str(len(drive.change_log))
+    assert len(tag_index.all_files()) == 250
+
+def test_incremental_add_reads_only_the_changes_feed(drive, tag_index, change_sync):
+    drive.add_file('d', ['contract'], file_id='d')
+
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+    assert names(tag_index, 'contract') == ['a', 'd']
+    assert set(drive.calls) == {'changes.list'}
+
+def test_modified_tags_are_reindexed(drive, tag_index, change_sync):
+    drive.files().update(fileId='b', body={'properties': {'tags': 'invoice,paid'}}).execute()
+
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+    assert parse_tags(tag_index.get_file('b')) == ['invoice', 'paid']
+    assert names(tag_index, 'paid') == ['b']
+
+def test_trashed_and_removed_files_leave_the_index(drive, tag_index, change_sync):
+    drive.files().update(fileId='a', body={'trashed': True}).execute()
+    drive.delete_file('b')
+
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 2
+    assert tag_index.get_file('a') is None
+    assert tag_index.get_file('b') is None
+    assert names(tag_index, 'contract') == []
+    assert tag_index.vocabulary().count('invoice') == 0
+
+def test_file_moved_out_of_scope_leaves_the_index(drive, tag_index, change_sync):
+    drive.files().update(fileId='a', addParents='elsewhere', removeParents=FakeDrive.ROOT_ID).execute()
+
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+    assert tag_index.get_file('a') is None
+
+def test_changes_outside_the_folder_are_ignored(drive, tag_index, change_sync):
+    drive.add_file('outside', ['contract'], parents=['elsewhere'])
+
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 0
+    assert names(tag_index, 'contract') == ['a']
+
+def test_file_moved_into_scope_is_indexed(drive, tag_index, change_sync):
+    drive.add_file('outside', ['contract'], parents=['elsewhere'], file_id='outside')
+    change_sync.sync(lambda: pytest.fail("no listing expected"))
+    drive.files().update(fileId='outside', addParents=FakeDrive.ROOT_ID, removeParents='elsewhere').execute()
+
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+    assert names(tag_index, 'contract') == ['a', 'outside']
+
+def test_expired_cursor_falls_back_to_a_rebuild(drive, tag_index, change_sync):
+    drive.add_file('d', ['contract'], file_id='d')
+    drive.expire_changes()
+    version = tag_index.version
+
+    assert change_sync.sync(lambda: listing(drive)) == 4
+    assert names(tag_index, 'contract') == ['a', 'd']
+    assert tag_index.version > version
+    assert drive.calls['changes.getStartPageToken'] == 1
+    # The new cursor replays later edits again
+    drive.add_file('e', ['contract'], file_id='e')
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+
+def test_cursor_is_kept_when_the_feed_fails(drive, tag_index, change_sync):
+    cursor = change_sync.cursor
+    drive.add_file('d', ['contract'], file_id='d')
+    # One more failure than the limiter retries
+    drive.fail_next(change_sync.rate_limiter.max_retries + 1, status=500)
+
+    with pytest.raises(HttpError):
+        change_sync.sync(lambda: pytest.fail("no listing expected"))
+    assert change_sync.cursor == cursor
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+
+def test_min_interval_skips_syncs_that_come_too_soon(drive, tag_index, limiter, change_sync):
+    throttled = ChangeSync(drive, tag_index, [FakeDrive.ROOT_ID], rate_limiter=limiter, min_interval=60)
+    drive.add_file('d', ['contract'], file_id='d')
+
+    assert throttled.sync(lambda: pytest.fail("no listing expected")) == 0
+    assert change_sync.sync(lambda: pytest.fail("no listing expected")) == 1
+
+def test_recursive_scope_follows_indexed_subfolders(drive, tag_index, limiter):
+    drive.add_file('sub', mime_type='application/vnd.google-apps.folder', file_id='sub')
+    engine = ChangeSync(drive, tag_index, [FakeDrive.ROOT_ID], rate_limiter=limiter, recursive=True)
+    engine.sync(lambda: listing(drive))
+    drive.add_file('deep', ['contract'], parents=['sub'], file_id='deep')
+
+    assert engine.sync(lambda: pytest.fail("no listing expected")) == 1
+    assert names(tag_index, 'contract') == ['deep']
+
+def test_files_under_shortcut_targets_stay_in_scope(drive, tag_index, make_manager, monkeypatch):
+    monkeypatch.setitem(LISTING_CONFIG, 'recursive', True)
+    drive.add_file('elsewhere', mime_type=FOLDER_MIME_TYPE, parents=['other'], file_id='elsewhere')
+    drive.add_file('linked', ['contract'], parents=['elsewhere'], file_id='linked')
+    shortcut = drive.add_file('shortcut', mime_type=SHORTCUT_MIME_TYPE, file_id='shortcut')
+    drive.files_by_id[shortcut['id']]['shortcutDetails'] = {'targetId': 'elsewhere', 'targetMimeType': FOLDER_MIME_TYPE}
+    manager = make_manager(tag_index)
+    manager.sync()
+    drive.add_file('new', ['contract'], parents=['elsewhere'], file_id='new')
+
+    assert manager.sync() == 1
+    assert names(tag_index, 'contract') == ['linked', 'new']
+
+def test_shared_drive_feed_is_followed_and_switching_feeds_rebuilds(drive, tag_index, limiter, change_sync,
+                                                                    monkeypatch):
+    requests = []
+    changes = drive.changes
+
+    def recorder(method, call):
+        def record(**kwargs):
+            requests.append((method, kwargs))
+            return call(**kwargs)
+        return record
+
+    def recording_changes():
+        resource = changes()
+        resource.getStartPageToken = recorder('getStartPageToken', resource.getStartPageToken)
+        resource.list = recorder('list', resource.list)
+        return resource
+
+    monkeypatch.setattr(drive, 'changes', recording_changes)
+    shared = ChangeSync(drive, tag_index, [FakeDrive.ROOT_ID], rate_limiter=limiter, drive_id='shared')
+
+    assert shared.sync(lambda: listing(drive)) == 3
+    assert shared.sync(lambda: pytest.fail("no listing expected")) == 0
+    assert [(method, kwargs.get('driveId'), kwargs.get('supportsAllDrives')) for method, kwargs in requests] == [
+        ('getStartPageToken', 'shared', True), ('list', 'shared', True)
+    ]
+    assert requests[1][1]['includeItemsFromAllDrives'] is True
+    assert change_sync.sync(lambda: listing(drive)) == 3
@@ -0,0 +1,61 @@
+"""
+Tag property layouts and Drive's property limits.
+"""
+import pytest
+
+from drivelabels.core.batch import STATUS_FAILED, STATUS_UPDATED
+from drivelabels.core.tag_backends import PropertiesBackend
+from drivelabels.core.tags import (
+    LAYOUT_JOINED,
+    LAYOUT_MIGRATING,
+    LAYOUT_PER_TAG,
+    MAX_PROPERTY_BYTES,
+    MAX_PUBLIC_PROPERTIES,
+    TagLimitError,
+    parse_tags,
+    tag_key,
+    tag_properties
+)
+
+def test_both_layouts_are_read():
+    file = {'properties': {'tags': 'a, b', tag_key('c'): '1'}}
+    assert parse_tags(file) == ['a', 'b', 'c']
+
+def test_properties_of_other_apps_are_not_tags():
+    file = {'properties': {'tag_color': '1', 'tags': 'a'}}
+    assert parse_tags(file) == ['a']
+
+def test_per_tag_patch_migrates_and_keeps_other_properties():
+    file = {'properties': {'tags': 'a', tag_key('old'): '1', 'owner': 'x'}}
+    patch = tag_properties(file, ['a', 'b'], LAYOUT_PER_TAG)
+    assert patch == {'tags': None, tag_key('old'): None, tag_key('a'): '1', tag_key('b'): '1'}
+
+def test_joined_value_over_the_size_limit_is_rejected():
+    with pytest.raises(TagLimitError):
+        tag_properties({}, ['x' * MAX_PROPERTY_BYTES], LAYOUT_JOINED)
+
+@pytest.mark.parametrize('tags', [
+    ['é' * MAX_PROPERTY_BYTES],
+    [f't{index}' for index in range(MAX_PUBLIC_PROPERTIES)]
+])
+def test_tags_over_the_per_tag_limits(tags):
+    # Two other properties leave fewer slots for tags
+    file = {'properties': {'a': '1', 'b': '2'}}
+    if len(''.join(tags)) <= MAX_PROPERTY_BYTES - len('tags'):
+        assert tag_properties(file, tags, LAYOUT_MIGRATING) == {'tags': ','.join(tags)}
+    with pytest.raises(TagLimitError):
+        tag_properties(file, tags, LAYOUT_PER_TAG)
+
+def test_bulk_write_reports_files_over_the_limits(drive, make_manager):
+    fits = drive.add_file('fits')['id']
+    crowded = drive.add_file('crowded')['id']
+    drive.files_by_id[crowded]['properties'] = {f'other{index}': '1' for index in range(MAX_PUBLIC_PROPERTIES)}
+    manager = make_manager(tag_backend=PropertiesBackend(LAYOUT_PER_TAG))
+
+    results = manager.add_tag_bulk([fits, crowded], ['contract'])
+
+    assert results[fits]['status'] == STATUS_UPDATED
+    assert results[crowded]['status'] == STATUS_FAILED
+    assert 'properties left' in results[crowded]['error']
+    assert drive.calls['files.update'] == 1
+    assert manager.add_tag(crowded, 'contract') is False